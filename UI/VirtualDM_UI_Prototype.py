@@ -1,13 +1,18 @@
 import os
 import sys
 import json
+import copy
 import random
 import re
 import time
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+from types import MappingProxyType
 from typing import Tuple, Dict, Any, List
 
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 
 import tracemalloc
 tracemalloc.start()
@@ -74,6 +79,12 @@ try:
 except ImportError:
     MULTICLASS_AVAILABLE = False
 
+# Class feature catalogs (static data shipped with the app, so no fallback)
+from src.class_catalogs import (
+    WARLOCK_INVOCATIONS, WIZARD_SCHOOLS, MARSHAL_MANEUVERS, PALADIN_DIVINE_VOWS,
+    BARBARIAN_PRIMAL_TALENTS, SORCERER_METAMAGIC, FIGHTER_MANEUVERS, KNIGHT_MANEUVERS
+)
+
 # Import XP awards calculator
 try:
     from src.xp_awards import (
@@ -163,19 +174,32 @@ def clear_perf_timings():
 # These use st.cache_data to avoid re-parsing JSON files on every Streamlit rerun.
 # The cached functions return pure data; session_state is updated by wrapper functions.
 
+def _read_json_file(file_path: str):
+    """Parse a JSON file; None if it is missing or unreadable."""
+    if not file_path or not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, "r", encoding="utf-8-sig") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
 @st.cache_data(show_spinner=False)
 def _cached_load_json(file_path: str) -> tuple:
     """
     Cached JSON file loader. Returns (data, path) tuple.
     Cache key is the file path - data is reloaded if file changes.
     """
-    if not file_path or not os.path.exists(file_path):
-        return None, file_path
-    try:
-        with open(file_path, "r", encoding="utf-8-sig") as f:
-            return json.load(f), file_path
-    except Exception:
-        return None, file_path
+    return _read_json_file(file_path), file_path
+
+@st.cache_resource(show_spinner=False)
+def _shared_load_json(file_path: str, mtime: float):
+    """
+    Process-wide JSON loader for read-only SRD tables. Unlike _cached_load_json,
+    every session gets the same object back (no per-session copy), so callers
+    must copy records before mutating them.
+    """
+    return _read_json_file(file_path)
 
 def _find_data_file(candidates: list) -> str | None:
     """Find first existing file from candidates list."""
@@ -2065,13 +2089,34 @@ def _cached_normalize_monsters(raw_json_tuple: tuple, _version: int = 3) -> list
 
     return normalized
 
+@st.cache_resource(show_spinner=False)
+def _cached_srd_monsters_file(path: str, mtime: float) -> list:
+    """
+    Normalized SRD monsters keyed on file path + mtime, shared across sessions.
+    The per-record JSON dump for _cached_normalize_monsters only happens on a
+    miss. Records are read-only; enemies are deep-copied before they join combat.
+    """
+    raw, _ = _cached_load_json(path)
+    if raw is None:
+        return []
+
+    # Handle wrapped data
+    if isinstance(raw, dict):
+        raw = raw.get("monsters") or raw.get("data") or raw.get("results") or list(raw.values())
+
+    if not isinstance(raw, list):
+        return []
+
+    # _version=3: Added range and attack_type to action parsing
+    return _cached_normalize_monsters(tuple(json.dumps(m) for m in raw), _version=3)
+
 def load_srd_monsters():
     """
     Load SRD monsters from JSON and normalize into ONE consistent schema our app uses.
     Uses caching to avoid re-parsing on every Streamlit rerun.
     """
     with perf_timer("load_srd_monsters"):
-        if "srd_enemies" in st.session_state and st.session_state.srd_enemies:
+        if st.session_state.get("srd_enemies") and "srd_enemy_by_name" in st.session_state:
             return st.session_state.srd_enemies
         
     base_dir = os.path.dirname(__file__)
@@ -2087,31 +2132,28 @@ def load_srd_monsters():
 
     if not path:
         st.session_state.srd_enemies = []
+        st.session_state.srd_enemy_names = []
+        st.session_state.srd_enemy_by_name = {}
         return []
     
-    # Use cached JSON loader
-    raw, _ = _cached_load_json(path)
-    if raw is None:
-        st.session_state.srd_enemies = []
-        return []
-    
-    # Handle wrapped data
-    if isinstance(raw, dict):
-        raw = raw.get("monsters") or raw.get("data") or raw.get("results") or list(raw.values())
-    
-    if not isinstance(raw, list):
-        st.session_state.srd_enemies = []
-        return []
-    
-    # Use cached normalization (convert to tuple for hashability)
-    # _version=3: Added range and attack_type to action parsing
-    normalized = _cached_normalize_monsters(tuple(json.dumps(m) for m in raw), _version=3)
+    # Cached load + normalization keyed on the file
+    normalized = _cached_srd_monsters_file(path, os.path.getmtime(path))
         
     st.session_state.srd_enemies = normalized
+    # Derived picker list + name lookup, built once per load instead of per rerun
+    by_name = {}
+    for m in normalized:
+        if m.get("name"):
+            by_name.setdefault(m["name"], m)
+    st.session_state.srd_enemy_names = [m.get("name", "") for m in normalized if m.get("name")]
+    st.session_state.srd_enemy_by_name = by_name
     return normalized
 
 # ============== COMPANION & WILD SHAPE SYSTEM ==============
 
+# Leading number of an SRD "Hit Points" / "Armor Class" string, e.g. "15 (2d8 + 6)"
+_LEADING_INT_RE = re.compile(r"(\d+)")
+
 def parse_cr_to_float(cr_string: str) -> float:
     """Convert CR string like '1/4 (50 XP)' or '2 (450 XP)' to float."""
     if not cr_string:
@@ -2126,9 +2168,21 @@ def parse_cr_to_float(cr_string: str) -> float:
     except:
         return 0.0
 
+def _srd_beast_memo(monsters: list) -> dict:
+    """Per-session memo for the beast filters below, reset when the SRD list is reloaded."""
+    cached = st.session_state.get("_srd_beast_memo")
+    if cached is None or cached[0] is not monsters:
+        cached = (monsters, {})
+        st.session_state["_srd_beast_memo"] = cached
+    return cached[1]
+
 def get_beasts_by_cr(max_cr: float, allow_fly: bool = True, allow_swim: bool = True) -> list:
-    """Get all beasts up to a certain CR, optionally filtering by movement."""
+    """Get all beasts up to a certain CR, optionally filtering by movement. Treat the result as read-only."""
     monsters = load_srd_monsters()
+    memo = _srd_beast_memo(monsters)
+    key = ("beasts", max_cr, allow_fly, allow_swim)
+    if key in memo:
+        return memo[key]
     beasts = []
     
     for m in monsters:
@@ -2148,11 +2202,15 @@ def get_beasts_by_cr(max_cr: float, allow_fly: bool = True, allow_swim: bool = T
         
         beasts.append(m)
     
-    return sorted(beasts, key=lambda x: (parse_cr_to_float(x.get("challenge", x.get("Challenge", "0"))), x.get("name", "")))
+    memo[key] = sorted(beasts, key=lambda x: (parse_cr_to_float(x.get("challenge", x.get("Challenge", "0"))), x.get("name", "")))
+    return memo[key]
 
 def get_familiar_options() -> list:
-    """Get valid familiar options (CR 0 beasts, typically small/tiny)."""
+    """Get valid familiar options (CR 0 beasts, typically small/tiny). Treat the result as read-only."""
     monsters = load_srd_monsters()
+    memo = _srd_beast_memo(monsters)
+    if "familiars" in memo:
+        return memo["familiars"]
     familiars = []
     
     # Standard familiar options
@@ -2163,6 +2221,7 @@ def get_familiar_options() -> list:
         if m.get("name") in familiar_names:
             familiars.append(m)
     
+    memo["familiars"] = familiars
     return familiars
 
 def monster_to_companion(monster: dict, owner_name: str, companion_type: str = "companion", bonus_hp: int = 0) -> dict:
@@ -2170,13 +2229,13 @@ def monster_to_companion(monster: dict, owner_name: str, companion_type: str = "
     
     # Parse HP
     hp_str = monster.get("hp", monster.get("Hit Points", "10"))
-    hp_match = re.match(r"(\d+)", str(hp_str))
+    hp_match = _LEADING_INT_RE.match(str(hp_str))
     base_hp = int(hp_match.group(1)) if hp_match else 10
     total_hp = base_hp + bonus_hp
     
     # Parse AC
     ac_str = monster.get("ac", monster.get("Armor Class", "10"))
-    ac_match = re.match(r"(\d+)", str(ac_str))
+    ac_match = _LEADING_INT_RE.match(str(ac_str))
     ac = int(ac_match.group(1)) if ac_match else 10
     
     # Parse speed
@@ -2213,8 +2272,9 @@ def monster_to_companion(monster: dict, owner_name: str, companion_type: str = "
             "CHA": get_stat("CHA"),
         },
         "attacks": [],
-        "traits": monster.get("Traits", monster.get("traits", "")),
-        "actions_text": monster.get("Actions", monster.get("actions", "")),
+        # Copied: monster is the shared cached SRD record
+        "traits": copy.deepcopy(monster.get("Traits", monster.get("traits", ""))),
+        "actions_text": copy.deepcopy(monster.get("Actions", monster.get("actions", ""))),
         "senses": monster.get("Senses", monster.get("senses", "")),
         "pos": None,  # Will be set when added to map
     }
@@ -2369,11 +2429,11 @@ def apply_wild_shape(druid: dict, beast_name: str) -> dict:
     
     # Parse beast stats
     hp_str = beast.get("hp", beast.get("Hit Points", "10"))
-    hp_match = re.match(r"(\d+)", str(hp_str))
+    hp_match = _LEADING_INT_RE.match(str(hp_str))
     beast_hp = int(hp_match.group(1)) if hp_match else 10
     
     ac_str = beast.get("ac", beast.get("Armor Class", "10"))
-    ac_match = re.match(r"(\d+)", str(ac_str))
+    ac_match = _LEADING_INT_RE.match(str(ac_str))
     beast_ac = int(ac_match.group(1)) if ac_match else 10
     
     speed_str = beast.get("speed", beast.get("Speed", "30 ft."))
@@ -2761,9 +2821,15 @@ def normalize_spell(raw: dict) -> dict:
     }
 
 @st.cache_data(show_spinner=False)
-def _cached_normalize_spells(spells_json_tuple: tuple) -> list:
-    """Cached spell normalization. Pure function."""
-    return [normalize_spell(json.loads(s)) for s in spells_json_tuple]
+def _cached_srd_spells_file(path: str, mtime: float) -> list:
+    """
+    Normalized SRD spells keyed on file path + mtime, so new sessions skip
+    re-serializing every spell just to build a cache key.
+    """
+    data, _ = _cached_load_json(path)
+    if not isinstance(data, list):
+        return []
+    return [normalize_spell(s) for s in data]
 
 def load_srd_spells() -> list:
     """
@@ -2774,18 +2840,22 @@ def load_srd_spells() -> list:
         if "srd_spells" in st.session_state:
             return st.session_state["srd_spells"]
         
-        data, path = _load_json_from_candidates(DATA_DIR, ["SRD_Spells.json"])
+        path = _find_data_file([os.path.join(DATA_DIR, "SRD_Spells.json")])
         st.session_state["srd_spells_path"] = path
         
-        if not isinstance(data, list):
+        if not path:
             st.session_state["srd_spells"] = []
             return []
         
-        # Use cached normalization
-        normalized = _cached_normalize_spells(tuple(json.dumps(s) for s in data))
+        # Use cached normalization (keyed on the file, not its contents)
+        normalized = _cached_srd_spells_file(path, os.path.getmtime(path))
         st.session_state["srd_spells"] = normalized
         return normalized
 
+def load_srd_spell_index() -> dict:
+    """Name -> normalized SRD spell, built once per loaded spell list."""
+    return _index_by_name(load_srd_spells(), "_spell_index")
+
 def get_spells_for_class(class_name: str, max_level: int = 1) -> tuple:
     """
     Get cantrips and leveled spells available to a class.
@@ -2799,6 +2869,56 @@ def get_spells_for_class(class_name: str, max_level: int = 1) -> tuple:
     
     return cantrips, level_1
 
+def _with_short_desc(spell: dict) -> dict:
+    """Copy of a spell with a pre-truncated "_short_desc" for the builder's detail lists."""
+    d = spell.get("description", "")
+    return {**spell, "_short_desc": (d[:200] + "...") if len(d) > 200 else d}
+
+def _spells_for_class_cached(class_name: str, max_level: int = 1) -> tuple:
+    """
+    get_spells_for_class() memoized per session; the SRD spell list doesn't change.
+    Spells are returned as copies carrying "_short_desc".
+    """
+    cache = st.session_state.setdefault("_class_spells_cache", {})
+    key = (class_name, max_level)
+    if key not in cache:
+        cantrips, leveled = get_spells_for_class(class_name, max_level)
+        cache[key] = ([_with_short_desc(s) for s in cantrips], [_with_short_desc(s) for s in leveled])
+    return cache[key]
+
+def _spells_by_name_for_class(class_name: str, max_level: int = 1) -> tuple:
+    """(cantrips_by_name, leveled_by_name) for the builder pickers, built once per class."""
+    cache = st.session_state.setdefault("_class_spells_by_name", {})
+    key = (class_name, max_level)
+    if key not in cache:
+        cantrips, leveled = _spells_for_class_cached(class_name, max_level)
+        cache[key] = ({s["name"]: s for s in cantrips}, {s["name"]: s for s in leveled})
+    return cache[key]
+
+def _class_spell_names(class_ids: tuple, max_level: int = 1) -> tuple:
+    """
+    Sorted (cantrip_names, spell_names) any of `class_ids` can learn, spells
+    capped at `max_level`. Memoized per session for the level-up pending choices;
+    reset when a different spell list is loaded.
+    """
+    spells = load_srd_spells()
+    cached = st.session_state.get("_class_spell_names")
+    if cached is None or cached[0] is not spells:
+        cached = (spells, {})
+        st.session_state["_class_spell_names"] = cached
+    cache = cached[1]
+    key = (class_ids, max_level)
+    if key not in cache:
+        wanted = frozenset(class_ids)
+        cantrips, leveled = [], []
+        for s in spells:
+            lvl = s.get("level", 0)
+            if lvl > max_level or wanted.isdisjoint(sc.lower() for sc in s.get("classes", [])):
+                continue
+            (cantrips if lvl == 0 else leveled).append(s.get("name", ""))
+        cache[key] = (tuple(sorted(cantrips)), tuple(sorted(leveled)))
+    return cache[key]
+
 def spell_to_action(spell: dict, caster: dict) -> dict:
     """
     Convert a normalized spell into an action that can be added to char['actions'].
@@ -4518,6 +4638,19 @@ def get_srd_condition_names() -> list:
     return []
 
 
+def get_condition_options() -> tuple:
+    """
+    SRD condition names plus "(Custom)" as a tuple for the Add Condition pickers.
+    Memoized on the loaded conditions dict so party/enemy cards share one build.
+    """
+    srd_conds = st.session_state.get("srd_conditions", {})
+    memo = st.session_state.get("_cond_options")
+    if memo is None or memo[0] is not srd_conds:
+        memo = (srd_conds, (*get_srd_condition_names(), "(Custom)"))
+        st.session_state["_cond_options"] = memo
+    return memo[1]
+
+
 # ==============
 # RANGE BAND POSITIONING
 # ==============
@@ -5878,12 +6011,18 @@ def resolve_skill_check(text: str) -> str | None:
 # ==== SRD mini-loaders for Builder (accept .json or .txt) ====
 # These use the cached JSON loader for performance.
 
-def _load_json_from_candidates(dir_path, names):
-    """Load JSON from first existing file in candidates. Uses caching."""
+def _load_json_from_candidates(dir_path, names, shared: bool = False):
+    """
+    Load JSON from first existing file in candidates. Uses caching; shared=True
+    returns the process-wide object from _shared_load_json.
+    """
     for nm in names:
         p = os.path.join(dir_path, nm)
         if os.path.exists(p):
-            data, _ = _cached_load_json(p)
+            if shared:
+                data = _shared_load_json(p, os.path.getmtime(p))
+            else:
+                data, _ = _cached_load_json(p)
             if data is not None:
                 return data, p
                 return [], p
@@ -5913,7 +6052,7 @@ def load_srd_classes():
     with perf_timer("load_srd_classes"):
         if "srd_classes" in st.session_state:
             return st.session_state["srd_classes"]
-        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Classes.json", "SRD_Classes.txt"])
+        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Classes.json", "SRD_Classes.txt"], shared=True)
         st.session_state["srd_classes_path"] = p
         
         if isinstance(data, dict) and "classes" in data:
@@ -5923,40 +6062,529 @@ def load_srd_classes():
         st.session_state["srd_classes"] = result
         return result
 
+def _db_names(items: list) -> tuple:
+    """Display names for an SRD list whose entries may be dicts or plain strings."""
+    return tuple(i.get("name", "") if isinstance(i, dict) else str(i) for i in items)
+
 def load_srd_feats():
     with perf_timer("load_srd_feats"):
         if "srd_feats" in st.session_state:
             return st.session_state["srd_feats"]
-        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Feats.json", "SRD_Feats.txt"])
+        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Feats.json", "SRD_Feats.txt"], shared=True)
         st.session_state["srd_feats_path"] = p
         result = data if isinstance(data, list) else []
         st.session_state["srd_feats"] = result
+        # Picker names, built once per load for the builder's Step 6
+        st.session_state["_feat_names"] = _db_names(result)
+        st.session_state["_feat_names_sorted"] = tuple(sorted(st.session_state["_feat_names"]))
         return result
 
 def load_srd_equipment():
     with perf_timer("load_srd_equipment"):
         if "srd_equipment" in st.session_state:
             return st.session_state["srd_equipment"]
-        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Equipment.json", "SRD_Equipment.txt"])
+        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Equipment.json", "SRD_Equipment.txt"], shared=True)
         st.session_state["srd_equipment_path"] = p
 
         if isinstance(data, list):
             st.session_state["srd_equipment"] = data
-            return data
         else:
-            st.session_state["srd_equipment"] = []
-            return []
+            st.session_state["srd_equipment"] = data = []
+        # Picker names, built once per load for the builder's Step 7
+        st.session_state["_item_names"] = _db_names(data)
+        return data
 
 def load_srd_skills():
     """Load skills from SRD_Skills.json."""
     with perf_timer("load_srd_skills"):
         if "srd_skills" in st.session_state:
             return st.session_state["srd_skills"]
-        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Skills.json", "SRD_Skills.txt"])
+        data, p = _load_json_from_candidates(DATA_DIR, ["SRD_Skills.json", "SRD_Skills.txt"], shared=True)
         st.session_state["srd_skills_path"] = p
         result = data if isinstance(data, list) else []
         st.session_state["srd_skills"] = result
+        st.session_state["_skill_names"] = _db_names(result)
         return result
+
+_ABILITIES = ("STR", "DEX", "CON", "INT", "WIS", "CHA")
+
+def _ability_preview(options, scores: dict, amount: int) -> dict:
+    """Option -> "STR (14 → 16)" label for the ability increase pickers (capped at 20)."""
+    return {ab: f"{ab} ({scores.get(ab, 10)} → {min(20, scores.get(ab, 10) + amount)})" for ab in options}
+
+# (effect key, caption format) pairs for the level-up feat / fighting style panels
+FEAT_EFFECT_FORMATS = (
+    ("initiative_bonus", "+{} Initiative"),
+    ("speed_bonus", "+{} ft. Speed"),
+    ("hp_bonus_per_level", "+{} HP/level"),
+    ("ac_bonus", "+{} AC"),
+)
+STYLE_EFFECT_FORMATS = (
+    ("ranged_attack_bonus", "+{} ranged attack"),
+    ("armor_ac_bonus", "+{} AC (in armor)"),
+    ("one_handed_damage_bonus", "+{} damage (one-handed)"),
+    ("thrown_damage_bonus", "+{} thrown damage"),
+)
+
+def _index_by_name(items, slot):
+    """
+    Name -> record dict for an SRD list, memoized in session state under `slot`.
+    Rebuilt only when a different list object is passed in; first match wins.
+    """
+    cached = st.session_state.get(slot)
+    if cached is None or cached[0] is not items:
+        idx = {}
+        for x in items:
+            if isinstance(x, dict):
+                idx.setdefault(x.get("name"), x)
+        cached = (items, idx)
+        st.session_state[slot] = cached
+    return cached[1]
+
+def _feat_prereq_keys(feats):
+    """Feat name -> hashable prerequisite key for meets_prereqs(), built once per feat list."""
+    from src.leveling import feat_prereq_key
+    cached = st.session_state.get("_feat_prereq_keys")
+    if cached is None or cached[0] is not feats:
+        keys = {}
+        for f in feats:
+            if isinstance(f, dict):
+                keys.setdefault(f.get("name"), feat_prereq_key(f))
+        cached = (feats, keys)
+        st.session_state["_feat_prereq_keys"] = cached
+    return cached[1]
+
+def _race_index(races):
+    """Name -> race dict for the builder."""
+    return _index_by_name(races, "_race_index")
+
+def get_srd_class_index() -> dict:
+    """Lowercased class name -> SRD class dict, for case-insensitive class_id lookups."""
+    classes = load_srd_classes()
+    cached = st.session_state.get("_srd_class_index_lc")
+    if cached is None or cached[0] is not classes:
+        idx = {}
+        for cls in classes:
+            if isinstance(cls, dict):
+                idx.setdefault(cls.get("name", "").lower(), cls)
+        cached = (classes, idx)
+        st.session_state["_srd_class_index_lc"] = cached
+    return cached[1]
+
+@st.cache_data(show_spinner=False)
+def _compute_race_bonus(race_name: str, subrace_name: str, _race_blob: dict, _subrace_data: dict) -> dict:
+    """
+    Racial ability bonuses (race + subrace) for the Step 2 totals preview.
+    Cached by race/subrace name; the underscored records are what those names select and are not hashed.
+    """
+    race_blob = _race_blob or {}
+    subrace_data = _subrace_data or {}
+    race_bonus = dict.fromkeys(_ABILITIES, 0)
+
+    ab = race_blob.get("ability_bonuses") or {}
+    fast_done = False
+    # Fast path for the uniform SRD shape; anything unexpected falls through to the defensive walk
+    if isinstance(ab, list) and ab and isinstance(ab[0], dict) and "ability_score" in ab[0] and "name" not in ab[0]:
+        fast = dict(race_bonus)
+        try:
+            for e in ab:
+                fast[e["ability_score"]["name"].upper()] += int(e["bonus"])
+            race_bonus, fast_done = fast, True
+        except (KeyError, TypeError, AttributeError, ValueError):
+            pass
+
+    # 5e SRD style: list of {"ability_score": {"index": "con", "name": "CON"}, "bonus": 2}
+    if fast_done:
+        pass
+    elif isinstance(ab, list):
+        for entry in ab:
+            if not isinstance(entry, dict):
+                continue
+            key = None
+            if "name" in entry:
+                key = str(entry["name"]).upper()
+            if not key and isinstance(entry.get("ability_score"), dict):
+                as_obj = entry["ability_score"]
+                key = (as_obj.get("name") or as_obj.get("index") or "").upper()
+            bonus = int(entry.get("bonus", 0))
+            if key in race_bonus:
+                race_bonus[key] += bonus
+    # simple dict style: {"STR": 2, "CON": 2}
+    elif isinstance(ab, dict):
+        for k, v in ab.items():
+            key = str(k).upper()
+            if key in race_bonus:
+                race_bonus[key] += int(v)
+
+    # Also add subrace bonuses to preview
+    if subrace_data:
+        sub_ab = subrace_data.get("ability_bonuses") or []
+        for entry in sub_ab:
+            if isinstance(entry, dict):
+                # Handle nested format: {"ability_score": {"name": "STR"}, "bonus": 1}
+                if "ability_score" in entry and isinstance(entry["ability_score"], dict):
+                    key = entry["ability_score"].get("name", "").upper()
+                else:
+                    # Handle simple format: {"name": "STR", "bonus": 1}
+                    key = str(entry.get("name", "")).upper()
+                bonus = int(entry.get("bonus", 0))
+                if key in race_bonus:
+                    race_bonus[key] += bonus
+
+    return race_bonus
+
+@st.cache_data(show_spinner=False)
+def _race_choice_options(race_name: str, _ab_options: dict) -> tuple:
+    """
+    Parse a race's ability_bonus_options into (option_names, option_bonuses, choose_count).
+    Names keep their SRD order, de-duplicated. Cached by race name; _ab_options is not hashed.
+    """
+    ab_options = _ab_options or {}
+    options_list = ab_options.get("from", [])
+    option_names = list(dict.fromkeys(opt.get("name", "") for opt in options_list))
+    option_bonuses = {opt.get("name", ""): opt.get("bonus", 1) for opt in options_list}
+    return option_names, option_bonuses, ab_options.get("choose", 0) or 0
+
+def _render_traits(traits, race_traits, title="Racial Traits", max_desc=400, compact=False, cache_key=None, name_limit=50):
+    """
+    Render a race/subrace trait list, taking descriptions from race_traits.
+    Traits named only in race_traits are shown after the listed ones, with their own text.
+    Names of name_limit chars or more are lore paragraphs and skipped (None keeps all).
+    The markdown is memoized per (title, cache_key); pass the race/subrace names so it stays bounded.
+    """
+    cache = st.session_state.setdefault("_traits_md_cache", {})
+    key = (title, cache_key) if cache_key else None
+    md = cache.get(key) if key else None
+    if md is None:
+        def _keep(name):
+            return bool(name) and (name_limit is None or len(name) < name_limit)
+
+        def _desc(rt):
+            return rt.get("desc", "") or rt.get("description", "") or ""
+
+        desc_lookup = {}
+        for rt in race_traits or []:
+            if isinstance(rt, dict) and _keep(rt.get("name", "")):
+                desc_lookup[rt["name"]] = _desc(rt)
+
+        entries = []
+        shown = set()
+        for t in traits or []:
+            name = t.get("name", "") if isinstance(t, dict) else str(t)
+            if _keep(name) and name not in shown:
+                shown.add(name)
+                entries.append((name, desc_lookup.get(name, "")))
+        for rt in race_traits or []:
+            if isinstance(rt, dict):
+                name = rt.get("name", "")
+                if _keep(name) and name not in shown:
+                    shown.add(name)
+                    entries.append((name, _desc(rt)))
+
+        parts = []
+        for name, desc in entries:
+            # Keep the first line only - lore sometimes got mixed in
+            desc, _, _ = desc.partition("\n")
+            if len(desc) > max_desc:
+                desc = desc[:max_desc] + "..."
+            if compact:
+                parts.append(f"- **{name}**: {desc}" if desc else f"- **{name}**")
+            else:
+                parts.append(f"**{name}**\n\n> {desc}" if desc else f"**{name}**")
+
+        if not parts:
+            md = ""
+        elif compact:
+            md = f"**{title}:**\n\n" + "\n".join(parts)
+        else:
+            md = f"---\n\n### {title}\n\n" + "\n\n".join(parts)
+        if key:
+            cache[key] = md
+    if md:
+        st.markdown(md)
+
+@st.fragment
+def _builder_spellcasting_fragment(c_pick, cantrips_known, spells_known, level_1_data):
+    """
+    Step 4 spell pickers. Runs as a fragment so toggling a spell only reruns
+    this section; selections live in session state for Apply Class.
+    """
+    # Spells for this class are fetched once per session; reruns only do dict lookups
+    cantrips_by_name, spells_l1_by_name = _spells_by_name_for_class(c_pick, 1)
+
+    # Initialize spell selection state
+    st.session_state.setdefault("builder_cantrips", [])
+    st.session_state.setdefault("builder_spells_l1", [])
+
+    # Cantrip selection
+    if cantrips_known > 0 and cantrips_by_name:
+        st.markdown(f"**Cantrips Known:** {cantrips_known}")
+        cantrip_names = list(cantrips_by_name)
+        selected_cantrips = st.multiselect(
+            "Select Cantrips",
+            cantrip_names,
+            default=st.session_state.builder_cantrips[:cantrips_known],
+            max_selections=cantrips_known,
+            key="builder_cantrips_select",
+        )
+        st.session_state.builder_cantrips = selected_cantrips
+
+        # Show cantrip details
+        if selected_cantrips:
+            with st.expander("Cantrip Details", expanded=False):
+                # One markdown element for all selected cantrips
+                parts = []
+                for name in selected_cantrips:
+                    spell = cantrips_by_name.get(name)
+                    if spell:
+                        dmg_info = f" | **Damage:** {spell['damage']} {spell.get('damage_type', '')}" if spell.get('damage') else ""
+                        save_info = f" | **Save:** {spell['save']}" if spell.get('save') else ""
+                        atk_info = " | **Spell Attack**" if spell.get('type') == 'spell_attack' else ""
+                        parts.append(f"**{name}** ({spell['school']}){dmg_info}{save_info}{atk_info}\n\n{spell['_short_desc']}")
+                st.markdown("\n\n---\n\n".join(parts))
+
+    # Level 1 spell selection
+    if spells_known > 0 and spells_l1_by_name:
+        st.markdown(f"**Level 1 Spells Known:** {spells_known}")
+        spell_l1_names = list(spells_l1_by_name)
+        selected_spells = st.multiselect(
+            "Select Level 1 Spells",
+            spell_l1_names,
+            default=st.session_state.builder_spells_l1[:spells_known],
+            max_selections=spells_known,
+            key="builder_spells_l1_select",
+        )
+        st.session_state.builder_spells_l1 = selected_spells
+
+        # Show spell details
+        if selected_spells:
+            with st.expander("Spell Details", expanded=False):
+                # One markdown element for all selected spells
+                parts = []
+                for name in selected_spells:
+                    spell = spells_l1_by_name.get(name)
+                    if spell:
+                        dmg_info = f" | **Damage:** {spell['damage']} {spell.get('damage_type', '')}" if spell.get('damage') else ""
+                        save_info = f" | **Save:** {spell['save']}" if spell.get('save') else ""
+                        atk_info = " | **Spell Attack**" if spell.get('type') == 'spell_attack' else ""
+                        conc_info = " | ⚡ Concentration" if spell.get('concentration') else ""
+                        parts.append(f"**{name}** ({spell['school']}){dmg_info}{save_info}{atk_info}{conc_info}\n\n{spell['_short_desc']}")
+                st.markdown("\n\n---\n\n".join(parts))
+
+    # Spell slots info
+    spell_slots = level_1_data.get("spell_slots_by_level", {})
+    if spell_slots:
+        slots_str = ", ".join(f"Level {k}: {v} slots" for k, v in spell_slots.items())
+        st.info(f"**Spell Slots at Level 1:** {slots_str}")
+
+# ==== Builder Step 4: class-specific options ====
+
+_ARTIFICER_INVENTIONS = {
+    "armor": "⚔️ Personal Suit of Armor - AC = 10 + INT mod, damage reduction",
+    "servant": "🤖 Mechanical Servant - Autonomous companion, HP = level",
+    "cannon": "💥 Cannon Weapon - 1d6 damage, 120 ft range, uses INT"
+}
+_CANNON_DAMAGE_TYPES = ("force", "piercing", "thunder", "fire", "cold", "lightning")
+
+_BLOODLINE_DESCRIPTIONS = {
+    "Dragon": "Draconic ancestry grants elemental resistance, breath weapon, and scales.",
+    "Fey": "Fey heritage grants charm resistance, Misty Step, and enchantment mastery.",
+    "Fiendish": "Infernal blood grants fire resistance, hellfire empowerment, and dark power."
+}
+
+_DRAGON_DAMAGE = {
+    "Red": "Fire", "Gold": "Fire", "Brass": "Fire",
+    "Blue": "Lightning", "Bronze": "Lightning",
+    "Black": "Acid", "Copper": "Acid",
+    "Green": "Poison",
+    "White": "Cold", "Silver": "Cold",
+}
+_SORCERER_DRAGON_TYPES = ("Red", "Gold", "Brass", "Blue", "Bronze", "Black", "Copper", "Green", "White", "Silver")
+_FIEND_TYPES = ("Devil", "Demon", "Yugoloth")
+
+_PATRON_DESCRIPTIONS = {
+    "Fiend": "Devils, Demons - Fire resistance, dark bargains, infernal power.",
+    "Great Old One": "Eldritch horrors - Telepathy, psychic resistance, madness.",
+    "Archfey": "Powerful fey - Misty Step, charm, illusion magic.",
+    "Celestial": "Divine beings - Healing light, radiant resistance.",
+    "Shadow": "Death and darkness - Speak with dead, necrotic resistance.",
+    "Draconic": "Elder dragons - Breath weapon, draconic presence."
+}
+_WARLOCK_DRAGON_TYPES = ("Fire", "Cold", "Lightning", "Acid", "Poison")
+
+_PACTS = ("Blade", "Chain", "Tome", "Talisman")
+_PACT_PREVIEW_LABELS = {
+    "Blade": "⚔️ Pact of the Blade - Create magical pact weapons",
+    "Chain": "🐉 Pact of the Chain - Powerful familiar (imp, pseudodragon, etc.)",
+    "Tome": "📖 Pact of the Tome - Book of Shadows with 3 cantrips from any class",
+    "Talisman": "🔮 Pact of the Talisman - Amulet that aids ability checks"
+}
+# Level-up pact boon picker wording (party card)
+_PACT_BOON_LABELS = {
+    "Blade": "⚔️ Pact of the Blade - Create magical pact weapons",
+    "Chain": "🐉 Pact of the Chain - Enhanced familiar (imp, pseudodragon, etc.)",
+    "Tome": "📖 Pact of the Tome - Book with 3 cantrips from any class",
+    "Talisman": "🔮 Pact of the Talisman - Amulet that aids ability checks"
+}
+
+_INVOCATION_PREVIEWS = (
+    ("Agonizing Blast", "Add CHA mod to Eldritch Blast damage (requires Eldritch Blast)"),
+    ("Armor of Shadows", "Cast Mage Armor on yourself at will"),
+    ("Devil's Sight", "See in magical/nonmagical darkness to 120 ft"),
+    ("Eldritch Sight", "Cast Detect Magic at will"),
+    ("Mask of Many Faces", "Cast Disguise Self at will"),
+    ("Repelling Blast", "Eldritch Blast pushes target 10 ft (requires Eldritch Blast)"),
+    ("Fiendish Vigor", "Cast False Life on yourself at will"),
+    ("Beast Speech", "Cast Speak with Animals at will"),
+)
+
+def _render_artificer_options(c_blob):
+    """Step 4 Artificer choices; selections are stored via widget keys."""
+    st.markdown("---")
+    st.markdown("### ⚙️ Artificer Options")
+    st.info("Artificers use **Crafting Points** instead of spell slots. Your inventions are technology, not magic!")
+
+    # Note about Signature Invention (level 3 feature)
+    st.caption("At level 3, you'll choose your **Signature Invention**: Personal Armor, Mechanical Servant, or Cannon Weapon.")
+
+    # For now, let them pre-select if they want (stored for later)
+    with st.expander("Preview Signature Invention (Level 3)", expanded=False):
+        invention_choice = st.radio(
+            "Choose your invention path:",
+            tuple(_ARTIFICER_INVENTIONS),
+            format_func=lambda x: _ARTIFICER_INVENTIONS.get(x, x),
+            key="builder_artificer_invention",
+            horizontal=False,
+        )
+        # Note: widget key already stores value in session_state
+
+        if invention_choice == "cannon":
+            st.selectbox(
+                "Cannon damage type:",
+                _CANNON_DAMAGE_TYPES,
+                key="builder_cannon_type"
+            )
+            # Note: widget key already stores value in session_state
+
+def _render_cleric_options(c_blob):
+    """Step 4 Cleric choices; selections are stored via widget keys."""
+    st.markdown("---")
+    st.markdown("### ⛪ Cleric Options")
+
+    # Domain Selection
+    st.markdown("**Choose Your Divine Domain:**")
+    domain_choice = st.selectbox(
+        "Divine Domain",
+        list(CLERIC_DOMAINS.keys()),
+        key="builder_cleric_domain",
+        help="Your domain grants bonus spells and special abilities."
+    )
+
+    domain_data = CLERIC_DOMAINS.get(domain_choice, {})
+    st.caption(domain_data.get("description", ""))
+
+    # Show domain spells
+    with st.expander("Domain Spells (always prepared)", expanded=False):
+        domain_spells = domain_data.get("domain_spells", {})
+        for level, spells in sorted(domain_spells.items()):
+            st.caption(f"**Level {level}:** {', '.join(spells)}")
+
+    # Show bonus proficiencies
+    bonus_profs = domain_data.get("bonus_proficiencies", [])
+    if bonus_profs:
+        st.caption(f"**Bonus Proficiencies:** {', '.join(bonus_profs)}")
+
+def _render_sorcerer_options(c_blob):
+    """Step 4 Sorcerer choices; selections are stored via widget keys."""
+    st.markdown("---")
+    st.markdown("### 🔥 Sorcerer Options")
+
+    # Bloodline Selection
+    st.markdown("**Choose Your Bloodline:**")
+    bloodline_choice = st.selectbox(
+        "Sorcerous Bloodline",
+        tuple(_BLOODLINE_DESCRIPTIONS),
+        key="builder_sorcerer_bloodline",
+        help="Your bloodline shapes your magical abilities and grants unique features."
+    )
+
+    st.caption(_BLOODLINE_DESCRIPTIONS.get(bloodline_choice, ""))
+
+    # Dragon type selection for Dragon bloodline
+    if bloodline_choice == "Dragon":
+        dragon_type = st.selectbox(
+            "Dragon Type (determines damage type):",
+            _SORCERER_DRAGON_TYPES,
+            key="builder_sorcerer_dragon_type"
+        )
+        st.caption(f"Damage type: {_DRAGON_DAMAGE.get(dragon_type, 'Fire')}")
+
+    # Fiend type selection for Fiendish bloodline
+    if bloodline_choice == "Fiendish":
+        fiend_type = st.selectbox(
+            "Fiend Type:",
+            _FIEND_TYPES,
+            key="builder_sorcerer_fiend_type"
+        )
+
+    # Preview Metamagic (Level 3)
+    with st.expander("Preview Metamagic (Level 3)", expanded=False):
+        st.caption("At level 3, you'll choose 1 Metamagic option:")
+        for meta_name, meta_data in SORCERER_METAMAGIC.items():
+            cost = meta_data.get("cost", 1)
+            cost_str = f"{cost} SP" if isinstance(cost, int) else "Spell level SP"
+            st.markdown(f"- **{meta_name}** ({cost_str}): {meta_data['description']}")
+
+def _render_warlock_options(c_blob):
+    """Step 4 Warlock choices; selections are stored via widget keys."""
+    st.markdown("---")
+    st.markdown("### 🌙 Warlock Options")
+
+    # Patron Selection (Level 1)
+    st.markdown("**Choose Your Patron:**")
+    patron_choice = st.selectbox(
+        "Eldritch Patron",
+        tuple(_PATRON_DESCRIPTIONS),
+        key="builder_warlock_patron",
+        help="Your patron grants you power and shapes your abilities."
+    )
+
+    st.caption(_PATRON_DESCRIPTIONS.get(patron_choice, ""))
+
+    # Dragon type selection for Draconic patron
+    if patron_choice == "Draconic":
+        dragon_type = st.selectbox(
+            "Dragon Type (determines breath damage):",
+            _WARLOCK_DRAGON_TYPES,
+            key="builder_warlock_dragon_type"
+        )
+
+    # Preview of Pact Boon (Level 3)
+    with st.expander("Preview Pact Boon (Level 3)", expanded=False):
+        st.caption("At level 3, you'll choose a Pact Boon:")
+        pact_boon = st.radio(
+            "Pact Boon:",
+            _PACTS,
+            format_func=lambda x: _PACT_PREVIEW_LABELS.get(x, x),
+            key="builder_warlock_pact_boon",
+            horizontal=False,
+        )
+
+    # Preview of Invocations (Level 2)
+    with st.expander("Preview Eldritch Invocations (Level 2)", expanded=False):
+        st.caption("At level 2, you'll choose 2 Eldritch Invocations. Here are some options:")
+
+        # Show available invocations
+        for inv_name, inv_desc in _INVOCATION_PREVIEWS:
+            st.markdown(f"- **{inv_name}**: {inv_desc}")
+
+# Class name -> Step 4 options renderer
+CLASS_SELECTORS = {
+    "Artificer": _render_artificer_options,
+    "Cleric": _render_cleric_options,
+    "Sorcerer": _render_sorcerer_options,
+    "Warlock": _render_warlock_options,
+}
     
 # ==== Character Builder ====
 
@@ -5967,6 +6595,38 @@ def _ability_mod(score: int) -> int:
         return 0
 
 
+# ==== Builder Step 5: skill budget ====
+_SKILL_POINTS_RE = re.compile(r"(\d+)")
+_SKILL_LIST_KEYS = ("skill_list", "skills", "class_skills", "trained_skills")
+
+
+def _class_skill_meta(c_pick: str, cls_blob: dict):
+    """(skill_list, base_points) for a class, memoized per class in session state."""
+    meta = st.session_state.get("_skill_meta")
+    if meta and meta[0] == c_pick:
+        return meta[1], meta[2]
+    # Try several possible keys so we work with different JSON formats
+    skill_list = []
+    for key in _SKILL_LIST_KEYS:
+        val = cls_blob.get(key)
+        if isinstance(val, list) and val:
+            skill_list = [str(s) for s in val]
+            break
+    raw_sp = str(cls_blob.get("skill_points_per_level", "") or cls_blob.get("skill_points", "0"))
+    m = _SKILL_POINTS_RE.search(raw_sp)
+    # If the class JSON doesn't have skill points, fall back to 2 + INT
+    base_points = (int(m.group(1)) if m else 0) or 2
+    st.session_state["_skill_meta"] = (c_pick, skill_list, base_points)
+    return skill_list, base_points
+
+
+def _compute_skill_budget(c: dict, cls_blob: dict):
+    """(skill_list, base_points, int_mod, total_points) for the builder's Step 5."""
+    skill_list, base_points = _class_skill_meta(st.session_state.get("builder_class_pick", ""), cls_blob)
+    int_mod = _ability_mod(c.get("abilities", {}).get("INT", 10))
+    return skill_list, base_points, int_mod, max(1, base_points + int_mod)
+
+
 def get_effective_ability_score(char: dict, ability: str) -> int:
     """
     Get the effective ability score including all bonuses like Primal Champion.
@@ -6560,10 +7220,10 @@ def sync_attacks_from_equipment(char: dict):
 
     char["attacks"] = non_weapon_attacks + weapon_attacks
 
-def apply_race(char: dict, race: dict):
+def apply_race(char: dict, race: dict, apply_ability_bonuses: bool = True):
     """
     Apply a race to a character, including:
-    - Ability bonuses
+    - Ability bonuses (skipped when apply_ability_bonuses is False)
     - Speed
     - Size
     - Darkvision
@@ -6579,7 +7239,7 @@ def apply_race(char: dict, race: dict):
         char["abilities"] = {"STR": 10, "DEX": 10, "CON": 10, "INT": 10, "WIS": 10, "CHA": 10}
 
     # --- Ability bonuses: handle both dict and 5e-API-style list ---
-    ab = race.get("ability_bonuses") or {}
+    ab = (race.get("ability_bonuses") or {}) if apply_ability_bonuses else {}
     if isinstance(ab, list):
         # 5e API style:
         # "ability_bonuses": [{"name":"CON","bonus":2}, ...]
@@ -7157,10 +7817,10 @@ def apply_racial_trait_mechanics(char: dict, race: dict):
         char["dazed_by_light"] = True  # -2 in bright light
 
 
-def apply_subrace(char: dict, subrace: dict):
+def apply_subrace(char: dict, subrace: dict, apply_ability_bonuses: bool = True):
     """
     Apply a subrace to a character, including:
-    - Additional ability bonuses
+    - Additional ability bonuses (skipped when apply_ability_bonuses is False)
     - Additional traits/features
     - Speed modifications
     - Additional proficiencies
@@ -7175,7 +7835,7 @@ def apply_subrace(char: dict, subrace: dict):
         char["abilities"] = {"STR": 10, "DEX": 10, "CON": 10, "INT": 10, "WIS": 10, "CHA": 10}
     
     # --- Subrace ability bonuses ---
-    ab = subrace.get("ability_bonuses") or []
+    ab = (subrace.get("ability_bonuses") or []) if apply_ability_bonuses else []
     for entry in ab:
         if not isinstance(entry, dict):
             continue
@@ -7472,7 +8132,7 @@ def apply_class_level1(char: dict, cls: dict, kit_idx: int = 0):
     feats = char.setdefault("features", [])
     for f in (cls.get("level_1_features") or []):
         if f not in feats:
-            feats.append(f)
+            feats.append(copy.deepcopy(f))  # cls is the shared cached SRD record
 
     # HP for level 1
     hp = compute_hp_level1(char, cls)
@@ -7543,39 +8203,6 @@ def ensure_resource(char: dict, name: str, a: int, b: int | None = None, recharg
 
 # ============== WARLOCK HELPER FUNCTIONS ==============
 
-# Eldritch Invocations data
-WARLOCK_INVOCATIONS = {
-    "Agonizing Blast": {"prereq": "Eldritch Blast cantrip", "level": 1, "description": "Add CHA mod to Eldritch Blast damage."},
-    "Armor of Shadows": {"prereq": None, "level": 1, "description": "Cast Mage Armor on yourself at will without slot."},
-    "Beast Speech": {"prereq": None, "level": 1, "description": "Cast Speak with Animals at will."},
-    "Beguiling Influence": {"prereq": None, "level": 1, "description": "Gain proficiency in Deception and Persuasion."},
-    "Devil's Sight": {"prereq": None, "level": 1, "description": "See normally in darkness (magical/nonmagical) to 120 feet."},
-    "Eldritch Sight": {"prereq": None, "level": 1, "description": "Cast Detect Magic at will."},
-    "Eldritch Spear": {"prereq": "Eldritch Blast cantrip", "level": 1, "description": "Eldritch Blast range becomes 300 feet."},
-    "Eyes of the Rune Keeper": {"prereq": None, "level": 1, "description": "Read all writing."},
-    "Fiendish Vigor": {"prereq": None, "level": 1, "description": "Cast False Life on yourself at will as 1st-level."},
-    "Mask of Many Faces": {"prereq": None, "level": 1, "description": "Cast Disguise Self at will."},
-    "Misty Visions": {"prereq": None, "level": 1, "description": "Cast Silent Image at will."},
-    "Repelling Blast": {"prereq": "Eldritch Blast cantrip", "level": 1, "description": "Eldritch Blast hits push target 10 feet."},
-    "Thief of Five Fates": {"prereq": None, "level": 1, "description": "Cast Bane once using a warlock spell slot; regain after long rest."},
-    "Mire the Mind": {"prereq": None, "level": 5, "description": "Cast Slow once using a warlock spell slot; regain after long rest."},
-    "One with Shadows": {"prereq": None, "level": 5, "description": "In dim light/darkness, become invisible until you move/act."},
-    "Sign of Ill Omen": {"prereq": None, "level": 5, "description": "Cast Bestow Curse once using a warlock spell slot; regain after long rest."},
-    "Thirsting Blade": {"prereq": "Pact of the Blade", "level": 5, "description": "Attack twice with pact weapon when you take Attack action."},
-    "Bewitching Whispers": {"prereq": None, "level": 7, "description": "Cast Compulsion once using a warlock spell slot; regain after long rest."},
-    "Dreadful Word": {"prereq": None, "level": 7, "description": "Cast Confusion once using a warlock spell slot; regain after long rest."},
-    "Sculptor of Flesh": {"prereq": None, "level": 7, "description": "Cast Polymorph once using a warlock spell slot; regain after long rest."},
-    "Ascendant Step": {"prereq": None, "level": 9, "description": "Cast Levitate on yourself at will without slot."},
-    "Minions of Chaos": {"prereq": None, "level": 9, "description": "Cast Conjure Elemental once using a warlock spell slot; regain after long rest."},
-    "Otherworldly Leap": {"prereq": None, "level": 9, "description": "Cast Jump on yourself at will."},
-    "Whispers of the Grave": {"prereq": None, "level": 9, "description": "Cast Speak with Dead at will."},
-    "Lifedrinker": {"prereq": "Pact of the Blade", "level": 12, "description": "Pact weapon hits deal extra necrotic damage equal to CHA mod."},
-    "Chains of Carceri": {"prereq": "Pact of the Chain", "level": 15, "description": "Cast Hold Monster at will on celestials, fiends, or elementals."},
-    "Master of Myriad Forms": {"prereq": None, "level": 15, "description": "Cast Alter Self at will."},
-    "Visions of Distant Realms": {"prereq": None, "level": 15, "description": "Cast Arcane Eye at will."},
-    "Witch Sight": {"prereq": None, "level": 15, "description": "See true form of shapechangers/illusioned creatures within 30 feet."},
-}
-
 def _apply_warlock_invocations(char: dict, invocations: list, cha_mod: int, bab: int, lvl: int, features: list, actions: list):
     """Apply selected Warlock invocations to character."""
     for inv_name in invocations:
@@ -7765,18 +8392,6 @@ def _apply_warlock_patron_feature(char: dict, patron: str, lvl: int, tier: str,
 
 # ============== WIZARD SCHOOLS ==============
 
-WIZARD_SCHOOLS = {
-    "General": {"description": "Broad magical study. Learn extra spells."},
-    "Abjuration": {"description": "Protective magic. Boost AC from abjuration spells."},
-    "Conjuration": {"description": "Summoning and teleportation. Reaction teleport."},
-    "Divination": {"description": "Knowledge and foresight. Fate-twisting dice."},
-    "Enchantment": {"description": "Mind control. Daze attackers."},
-    "Evocation": {"description": "Elemental destruction. Force attacks."},
-    "Illusion": {"description": "Deception and trickery. Bonus illusion cantrips."},
-    "Necromancy": {"description": "Death magic. Undead familiar."},
-    "Transmutation": {"description": "Transformation. Gain temp HP."},
-}
-
 def _apply_wizard_school_feature(char: dict, school: str, lvl: int, int_mod: int, spell_dc: int, features: list, actions: list, tier: str = "specialization"):
     """Apply Wizard school-specific features."""
     
@@ -7890,74 +8505,41 @@ def _apply_wizard_school_feature(char: dict, school: str, lvl: int, int_mod: int
 
 # ============== MARSHAL MANEUVERS ==============
 
-MARSHAL_MANEUVERS = {
-    "Covering Advance": {
-        "type": "bonus",
-        "effect": "ally_movement",
-        "targets": "all_allies",
-        "description": "Allies in aura move 10 ft without provoking OA."
-    },
-    "Strike in Formation": {
-        "type": "reaction",
-        "timing": "on_hit",
-        "effect": "ally_attack",
-        "targets": "single_ally",
-        "description": "Ally makes reaction attack on your hit target. Add martial die to their damage."
-    },
-    "Banner of Defiance": {
-        "type": "bonus",
-        "effect": "temp_hp",
-        "targets": "all_allies",
-        "description": "Allies in aura gain temp HP = CHA mod + martial die."
-    },
-    "Shield the Line": {
-        "type": "reaction",
-        "timing": "ally_attacked",
-        "effect": "attack_penalty",
-        "targets": "single_ally",
-        "description": "Impose -CHA mod penalty on attack vs ally in aura."
-    },
-    "Break the Line": {
-        "type": "action",
-        "effect": "charge_and_prone",
-        "targets": "multiple_allies",
-        "save": "STR",
-        "description": "Allies move in straight line. Enemies adjacent at end must STR save or prone."
-    },
-    "Phalanx Reposition": {
-        "type": "reaction",
-        "timing": "enemy_approach",
-        "effect": "ally_shift",
-        "targets": "single_ally",
-        "description": "When enemy moves near ally, shift ally 5 ft without provoking."
-    },
-    "Mobile Defense": {
-        "type": "reaction",
-        "timing": "ally_moves",
-        "effect": "ac_bonus",
-        "targets": "single_ally",
-        "description": "Ally gains +martial die AC while moving."
-    },
-    "Suppressive Volley": {
-        "type": "action",
-        "effect": "no_reactions",
-        "targets": "single_enemy",
-        "save": "WIS",
-        "description": "Target WIS save or can't take Reactions until next turn."
-    },
-    "Inspiring Rally": {
-        "type": "bonus",
-        "effect": "save_reroll",
-        "targets": "single_ally",
-        "description": "Ally can reroll a failed saving throw, adding martial die to the new roll."
-    },
-    "Coordinated Strike": {
-        "type": "reaction",
-        "timing": "ally_hits",
-        "effect": "bonus_damage",
-        "targets": "single_ally",
-        "description": "When ally hits, add martial die to their damage."
-    },
+
+def marshal_maneuver_flags(maneuver_data: dict) -> dict:
+    """Scan a maneuver description once for the targeting and effect checks."""
+    desc = maneuver_data.get("description", "")
+    desc_l = desc.lower()
+    return {
+        "allies": "allies" in desc_l,
+        "temp_hp": "temp HP" in desc,
+        "move": "move" in desc_l,
+        "ac": "AC" in desc,
+    }
+
+def _maneuver_temp_hp(char: dict, roll: int, target_allies: list, party: list) -> str:
+    cha_mod = (char.get("abilities", {}).get("CHA", 10) - 10) // 2
+    temp_hp = cha_mod + roll
+    # Apply temp HP to targets; members sharing a name all get it, as targets are picked by name
+    name_to_members = {}
+    for p in party:
+        name_to_members.setdefault(p.get("name"), []).append(p)
+    for ally_name in target_allies:
+        for p in name_to_members.get(ally_name, ()):
+            p["temp_hp"] = p.get("temp_hp", 0) + temp_hp
+    return f" Allies gain {temp_hp} temp HP."
+
+def _maneuver_move(char: dict, roll: int, target_allies: list, party: list) -> str:
+    return " Allies can move up to 10 ft without provoking."
+
+def _maneuver_ac(char: dict, roll: int, target_allies: list, party: list) -> str:
+    return f" Target gains +{roll} AC until next turn."
+
+# Checked in order; the first flag set on a maneuver picks its effect.
+MANEUVER_EFFECTS = {
+    "temp_hp": _maneuver_temp_hp,
+    "move": _maneuver_move,
+    "ac": _maneuver_ac,
 }
 
 def _apply_marshal_maneuvers(char: dict, maneuvers: list, die_size: str, cha_mod: int, lvl: int, aura_range: int, actions: list):
@@ -8006,41 +8588,6 @@ def _apply_marshal_maneuvers(char: dict, maneuvers: list, die_size: str, cha_mod
 
 # ============== PALADIN DIVINE VOWS ==============
 
-PALADIN_DIVINE_VOWS = {
-    "Conservation": {
-        "description": "Sworn to preserve the natural world and uphold the natural order.",
-        "features": [
-            "Lay on Hands heals plants and fey.",
-            "Speak with Animals at will.",
-            "Divine Smite works on aberrations.",
-        ],
-    },
-    "Protection": {
-        "description": "Sworn to safeguard others, especially the weak and vulnerable.",
-        "features": [
-            "Reaction: Reduce ally damage within 30 ft by CHA mod + level (uses Divine Smite).",
-            "+1 AC bonus.",
-            "Divine Smite works on any creature that harmed an ally in the last minute.",
-        ],
-    },
-    "Devotion": {
-        "description": "Sworn to purity, justice, and protection of the innocent.",
-        "features": [
-            "Bonus to saves vs Illusion and Enchantment.",
-            "Resistance to necrotic damage.",
-            "Divine Smite works on chaotic creatures.",
-        ],
-    },
-    "Vengeance": {
-        "description": "Sworn to retribution and swift justice against evildoers.",
-        "features": [
-            "+CHA mod to attack rolls against evil creatures.",
-            "Heal CHA mod HP when killing an evil creature.",
-            "Divine Smite works on any creature that harms you.",
-        ],
-    },
-}
-
 def _apply_paladin_divine_vow(char: dict, vow: str, cha_mod: int, lvl: int, spell_dc: int, features: list, actions: list):
     """Apply Divine Vow-specific features."""
     vow_data = PALADIN_DIVINE_VOWS.get(vow, {})
@@ -8076,23 +8623,6 @@ def _apply_paladin_divine_vow(char: dict, vow: str, cha_mod: int, lvl: int, spel
 
 # ============== BARBARIAN PRIMAL TALENTS ==============
 
-BARBARIAN_PRIMAL_TALENTS = {
-    "Savage Leap": {"description": "Long jump without running start. +2 attack after 10 ft jump toward target."},
-    "Beast Strike": {"description": "While raging, Shove attempt as part of melee attack."},
-    "Ferocious Tenacity": {"description": "1/day while raging, CON save (DC 10 + half damage) to drop to 1 HP instead of 0."},
-    "Brutal Roar": {"description": "1/day, bonus action roar. Enemies within 10 ft WIS save or Frightened until end of next turn."},
-    "Scent": {"description": "Detect creatures within 30 ft by smell. Know direction of hidden creatures."},
-    "Resilient Hide": {"description": "While raging and unarmored, add CON mod to AC."},
-    "Deadly Momentum": {"description": "On kill, move half speed and make one attack. 1/turn."},
-    "Quick Temper": {"description": "Enter rage as immediate action CON mod times per day."},
-    "Improved Beast Strike": {"prerequisite": "Beast Strike", "description": "Beast Strike can knock prone AND push 5 ft."},
-    "Steel Gut": {"description": "Eat spoiled/toxic food safely. +CON mod to saves vs ingested poison."},
-    "Wound Rend": {"description": "While raging, crits cause bleeding (CON mod damage/turn until healed)."},
-    "Terrifying Glare": {"description": "1/day while raging, action to frighten one creature for 1 minute."},
-    "Raging Vitality": {"description": "While raging, gain level temp HP at start of each turn."},
-    "Grasping Strike": {"description": "While raging, bonus action grapple after melee hit."},
-}
-
 def _apply_barbarian_primal_talents(char: dict, talents: list, str_mod: int, con_mod: int, lvl: int, features: list, actions: list):
     """Apply selected Barbarian primal talents."""
     save_dc = 8 + str_mod + con_mod
@@ -8335,17 +8865,6 @@ def _apply_cleric_domain_feature(char: dict, domain: str, lvl: int, wis_mod: int
 
 # ============== SORCERER BLOODLINES & METAMAGIC ==============
 
-SORCERER_METAMAGIC = {
-    "Quickened Spell": {"cost": 2, "description": "Cast a spell with casting time of 1 action as a bonus action instead."},
-    "Twinned Spell": {"cost": "spell_level", "description": "Target a second creature with a single-target spell. Cost = spell level (1 SP for cantrips)."},
-    "Empowered Spell": {"cost": 1, "description": "Reroll up to CHA mod damage dice. Must use new rolls."},
-    "Subtle Spell": {"cost": 1, "description": "Cast without verbal or somatic components."},
-    "Distant Spell": {"cost": 1, "description": "Double the range of a spell (touch becomes 30 ft)."},
-    "Extended Spell": {"cost": 1, "description": "Double the duration of a spell (max 24 hours)."},
-    "Heightened Spell": {"cost": 3, "description": "One target has -2 penalty on first save against the spell."},
-    "Careful Spell": {"cost": 1, "description": "Choose CHA mod creatures to auto-succeed on the spell's save."},
-}
-
 def _apply_sorcerer_metamagic(char: dict, metamagic_list: list, actions: list):
     """Apply selected Sorcerer metamagic options."""
     for meta_name in metamagic_list:
@@ -8516,237 +9035,8 @@ def _apply_sorcerer_bloodline_feature(char: dict, bloodline: str, lvl: int, tier
                 char["damage_resistances"].append("necrotic")
 
 
-# ============== FIGHTER MANEUVERS ==============
-
-FIGHTER_MANEUVERS = {
-    "Focused Strike": {
-        "type": "attack_modifier",
-        "timing": "before_attack",
-        "effect": "to_hit_bonus",
-        "description": "Add martial die to an attack roll."
-    },
-    "Ambusher's Edge": {
-        "type": "utility",
-        "timing": "check",
-        "skills": ["Stealth", "Initiative"],
-        "description": "Add martial die to Stealth or Initiative check."
-    },
-    "Guarded Step": {
-        "type": "defensive",
-        "timing": "action",
-        "effect": "swap_and_ac",
-        "description": "Switch places with ally within 5ft. One gains AC = martial die until next turn."
-    },
-    "Brace for Impact": {
-        "type": "reaction",
-        "timing": "enemy_approach",
-        "effect": "opportunity_attack_bonus",
-        "description": "When creature moves into reach, attack and add die to damage."
-    },
-    "Tactical Command": {
-        "type": "bonus",
-        "timing": "bonus_action",
-        "effect": "ally_attack",
-        "description": "Direct ally to attack using reaction. Add die to their damage."
-    },
-    "Forceful Disarm": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_disarm",
-        "save": "STR",
-        "description": "Add die to damage. Target drops item on failed STR save."
-    },
-    "Trip Technique": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_prone",
-        "save": "STR",
-        "description": "Add die to damage. Large or smaller creature prone on failed STR save."
-    },
-    "Distracting Blow": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_debuff",
-        "description": "Add die to damage. Next attacker gains +2 vs target."
-    },
-    "Sweeping Motion": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "cleave",
-        "description": "On hit, deal martial die to another creature within 5ft if roll would hit."
-    },
-    "Lunging Attack": {
-        "type": "attack_modifier",
-        "timing": "before_attack",
-        "effect": "reach_and_damage",
-        "reach_bonus": 5,
-        "description": "Extend reach 5ft for one attack. Add die to damage."
-    },
-    "Parry Response": {
-        "type": "reaction",
-        "timing": "when_hit_melee",
-        "effect": "damage_reduction",
-        "description": "When hit by melee, reduce damage by die + DEX mod."
-    },
-    "Riposte Counter": {
-        "type": "reaction",
-        "timing": "when_missed_melee",
-        "effect": "counterattack",
-        "description": "When missed by melee, make attack and add die to damage."
-    },
-    "Commanding Presence": {
-        "type": "utility",
-        "timing": "check",
-        "skills": ["Intimidation", "Persuasion", "Performance"],
-        "description": "Add martial die to Intimidation, Persuasion, or Performance."
-    },
-    "Rallying Shout": {
-        "type": "bonus",
-        "timing": "bonus_action",
-        "effect": "temp_hp",
-        "description": "Give ally temp HP = die + CHA mod."
-    },
-    "Tactical Insight": {
-        "type": "utility",
-        "timing": "check",
-        "skills": ["History", "Investigation", "Insight"],
-        "description": "Add martial die to History, Investigation, or Insight check."
-    },
-    "Grappling Strike": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "grapple_bonus",
-        "description": "After melee hit, add die to Athletics check to grapple target."
-    },
-    "Precision Attack": {
-        "type": "attack_modifier",
-        "timing": "after_roll",
-        "effect": "reroll_to_hit",
-        "description": "After missing, add martial die to the attack roll (may turn miss into hit)."
-    },
-    "Menacing Attack": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_frighten",
-        "save": "WIS",
-        "description": "Add die to damage. Target frightened on failed WIS save until end of next turn."
-    },
-    "Pushing Attack": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_push",
-        "save": "STR",
-        "push_distance": 15,
-        "description": "Add die to damage. Large or smaller pushed 15ft on failed STR save."
-    },
-}
-
 # ============== KNIGHT MANEUVERS ==============
 
-KNIGHT_MANEUVERS = {
-    "Stalwart Wall": {
-        "type": "attack_modifier",
-        "timing": "on_opportunity_attack",
-        "effect": "prevent_movement",
-        "description": "On opportunity attack hit, target can't move until start of their next turn."
-    },
-    "Shield Bash": {
-        "type": "bonus",
-        "timing": "after_melee_attack",
-        "effect": "shove_and_damage",
-        "save": "STR",
-        "extra_damage": "1d6",
-        "damage_type": "bludgeoning",
-        "description": "Bonus action after melee attack: shove creature within 5ft, deal 1d6 bludgeoning. STR save or prone."
-    },
-    "Zone of Defense": {
-        "type": "action",
-        "timing": "action",
-        "effect": "difficult_terrain_aura",
-        "area": 10,
-        "description": "10ft radius around you becomes difficult terrain. Enemies provoke OA when leaving until your next turn."
-    },
-    "Brace": {
-        "type": "reaction",
-        "timing": "enemy_approach",
-        "effect": "opportunity_attack_bonus",
-        "description": "When creature moves into reach, make attack and add martial die to damage."
-    },
-    "Commander's Strike": {
-        "type": "bonus",
-        "timing": "on_attack_action",
-        "effect": "ally_attack",
-        "description": "Forgo one attack. Ally uses reaction to attack, adding martial die to damage."
-    },
-    "Commanding Presence": {
-        "type": "utility",
-        "timing": "check",
-        "skills": ["Intimidation", "Performance", "Persuasion"],
-        "description": "Add martial die to Intimidation, Performance, or Persuasion check."
-    },
-    "Jousting Charge": {
-        "type": "attack_modifier",
-        "timing": "on_charge",
-        "effect": "damage_and_prone",
-        "save": "STR",
-        "requires_mounted": True,
-        "min_move": 20,
-        "description": "While mounted, move 20ft+ and hit: add martial die to damage. STR save or prone."
-    },
-    "Spirited Leap": {
-        "type": "free",
-        "timing": "on_mount_jump",
-        "effect": "avoid_opportunity_attacks",
-        "requires_mounted": True,
-        "description": "When mount jumps/moves over obstacle, you and mount avoid OA for the turn."
-    },
-    "Trample the Fallen": {
-        "type": "free",
-        "timing": "on_knock_prone",
-        "effect": "mount_attack",
-        "requires_mounted": True,
-        "description": "When you knock a creature prone while mounted, mount makes hoof attack adding martial die."
-    },
-    "Goading Attack": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_goad",
-        "save": "WIS",
-        "description": "Add martial die to damage. WIS save or target has -2 penalty vs others until your next turn."
-    },
-    "Lunging Attack": {
-        "type": "attack_modifier",
-        "timing": "before_attack",
-        "effect": "reach_and_damage",
-        "reach_bonus": 5,
-        "description": "Extend reach 5ft for one attack. Add martial die to damage."
-    },
-    "Maneuvering Attack": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "damage_and_ally_move",
-        "description": "Add martial die to damage. Ally can use reaction to move half speed without OA."
-    },
-    "Rally": {
-        "type": "bonus",
-        "timing": "bonus_action",
-        "effect": "temp_hp",
-        "description": "Give ally temp HP = martial die + CHA mod."
-    },
-    "Sweeping Attack": {
-        "type": "attack_modifier",
-        "timing": "on_hit",
-        "effect": "cleave",
-        "description": "On hit, deal martial die to another creature within 5ft if roll would hit."
-    },
-    "Tactical Assessment": {
-        "type": "utility",
-        "timing": "check",
-        "skills": ["Investigation", "History", "Insight"],
-        "description": "Add martial die to Investigation, History, or Insight check."
-    },
-}
-
 def _apply_knight_maneuvers(char: dict, maneuvers: list, die_size: str, dc: int, actions: list):
     """Apply selected Knight maneuvers as actions."""
     for maneuver_name in maneuvers:
@@ -8897,6 +9187,71 @@ def grant_fighting_style(char: dict, style_number: int = 1):
             char["pending_fighting_style"] = pending_styles
 
 
+# Option names for the level-up pickers, fixed at import (table order)
+_WARLOCK_INVOCATION_NAMES = tuple(WARLOCK_INVOCATIONS)
+_FIGHTER_MANEUVER_NAMES = tuple(FIGHTER_MANEUVERS)
+_SORCERER_METAMAGIC_NAMES = tuple(SORCERER_METAMAGIC)
+_PRIMAL_TALENT_NAMES = tuple(BARBARIAN_PRIMAL_TALENTS)
+_MARSHAL_MANEUVER_NAMES = tuple(MARSHAL_MANEUVERS)
+_KNIGHT_MANEUVER_NAMES = tuple(KNIGHT_MANEUVERS)
+_WIZARD_SCHOOL_NAMES = tuple(WIZARD_SCHOOLS)
+_DIVINE_VOW_NAMES = tuple(PALADIN_DIVINE_VOWS)
+
+# Weapon Expertise choices when the character has no weapon attacks yet
+_DEFAULT_EXPERTISE_WEAPONS = (
+    "Longsword", "Greatsword", "Battleaxe", "Greataxe",
+    "Warhammer", "Maul", "Rapier", "Scimitar", "Shortsword",
+    "Longbow", "Shortbow", "Crossbow", "Halberd", "Glaive",
+    "Pike", "Lance", "Flail", "Morningstar", "Trident",
+)
+
+# Invocation prereq text -> pact boon it requires
+_INVOCATION_PACT_PREREQS = {
+    "Pact of the Blade": "Blade",
+    "Pact of the Chain": "Chain",
+    "Pact of the Tome": "Tome",
+}
+
+def _unlearned(names: tuple, known) -> list:
+    """Option names the character doesn't have yet, in table order."""
+    known = set(known)
+    return [n for n in names if n not in known]
+
+# Primal talents open from the start, and prerequisite talent -> talents it unlocks
+_TALENT_ROOTS = frozenset(t for t, d in BARBARIAN_PRIMAL_TALENTS.items() if d.get("prerequisite") is None)
+_TALENT_DEPENDENTS = {}
+for _t, _d in BARBARIAN_PRIMAL_TALENTS.items():
+    if _d.get("prerequisite") is not None:
+        _TALENT_DEPENDENTS.setdefault(_d["prerequisite"], []).append(_t)
+
+def _unlocked_talents(known: set) -> list:
+    """Primal talents whose prerequisite is met and that aren't learned yet, in table order."""
+    unlocked = set(_TALENT_ROOTS)
+    for t in known:
+        unlocked.update(_TALENT_DEPENDENTS.get(t, ()))
+    unlocked -= known
+    return [t for t in _PRIMAL_TALENT_NAMES if t in unlocked]
+
+_PICKER_LIMIT = 200  # most options a level-up multiselect renders at once
+
+def _picker_options(names: list, key: str) -> list:
+    """
+    Options for a level-up multiselect. Short lists pass through untouched;
+    longer ones get a text filter and are capped at _PICKER_LIMIT.
+    """
+    if len(names) <= _PICKER_LIMIT:
+        return names
+    q = st.text_input("Filter", key=key, placeholder="Type to narrow the list").strip().lower()
+    if q:
+        names = [n for n in names if q in n.lower()]
+    return names[:_PICKER_LIMIT]
+
+
+# Barbarian illiteracy feature text (shared with the running-session literacy button)
+ILLITERACY = "Illiteracy"
+ILLITERACY_REMOVED = "Illiteracy (Removed): You spent 2 skill points to learn to read and write."
+
+
 def add_level1_class_resources_and_actions(char: dict):
     """
     For now: handle Barbarian, Bard, and Artificer level 1.
@@ -8980,9 +9335,9 @@ def add_level1_class_resources_and_actions(char: dict):
         # Illiteracy (Level 1)
         if "is_literate" not in char:
             char["is_literate"] = False  # Default illiterate
-        if not any("Illiteracy" in f for f in features):
+        if not any(ILLITERACY in f for f in features):
             if char.get("is_literate"):
-                features.append("Illiteracy (Removed): You spent 2 skill points to learn to read and write.")
+                features.append(ILLITERACY_REMOVED)
             else:
                 features.append("Illiteracy: Cannot read/write unless you spend 2 skill points. Gain +1 skill point/level while illiterate.")
                 char["illiteracy_skill_bonus"] = 1  # Extra skill point per level
@@ -14003,14 +14358,16 @@ if st.session_state.boot_mode == "new":
         st.markdown("### Build Character (Step-by-Step)")
         # reminder: these loaders already exist above; they accept .json or .txt
 
-        races = load_srd_races()
-        bgs = load_srd_backgrounds()
-        classes = load_srd_classes()
-        feats_db = load_srd_feats()
-        equip_db = load_srd_equipment()
-
         c = st.session_state.builder_char
         step = st.session_state.builder_step
+
+        # Only load the SRD data the active step actually reads
+        races = load_srd_races() if step in (1, 2) else []
+        bgs = load_srd_backgrounds() if step == 3 else []
+        classes = load_srd_classes() if step in (4, 5) else []
+        feats_db = load_srd_feats() if step == 6 else []
+        # Always loaded: AC, movement and attack helpers read srd_equipment from session state
+        equip_db = load_srd_equipment()
         total_steps = 7
         st.progress(step / float(total_steps), text=f"Step {step} of {total_steps}")
 
@@ -14024,8 +14381,7 @@ if st.session_state.boot_mode == "new":
             r_pick = st.session_state.get("builder_race_pick", "")
             if not r_pick:
                 return None, ""
-            rb = next((r for r in races if r.get("name") == r_pick), None)
-            return rb, r_pick
+            return _race_index(races).get(r_pick), r_pick
 
         # ------------------------------------------------------
         # STEP 1: Race
@@ -14045,7 +14401,8 @@ if st.session_state.boot_mode == "new":
             r_pick = st.selectbox("Race", race_names, key="builder_race_pick")
 
             if r_pick:
-                race_data = next((r for r in races if r.get("name") == r_pick), {})
+                race_idx = _race_index(races)
+                race_data = race_idx.get(r_pick) or {}
                 
                 # Check if this race has subraces
                 subraces_list = race_data.get("subraces", [])
@@ -14059,15 +14416,14 @@ if st.session_state.boot_mode == "new":
                     
                     if subrace_pick:
                         # Find the full subrace data from the races list
-                        subrace_data = next((r for r in races if r.get("name") == subrace_pick), None)
+                        subrace_data = race_idx.get(subrace_pick)
                         if subrace_data:
                             st.success(f"Selected: {r_pick} ({subrace_pick})")
                         else:
                             st.warning(f"Subrace '{subrace_pick}' data not found in races list.")
                 else:
                     # Clear subrace pick if base race has no subraces
-                    if "builder_subrace_pick" in st.session_state:
-                        del st.session_state["builder_subrace_pick"]
+                    st.session_state.pop("builder_subrace_pick", None)
                 
                 # Show race details
                 with st.expander("Race Details", expanded=True):
@@ -14231,67 +14587,11 @@ if st.session_state.boot_mode == "new":
                             st.markdown(f"**Condition Resistances:** {', '.join(cond_res)}")
                     
                     # ========== RACIAL TRAITS SECTION ==========
-                    race_traits = race_data.get("race_traits", [])
-                    traits = race_data.get("traits", [])
-                    
-                    # Build a lookup from race_traits for descriptions
-                    trait_desc_lookup = {}
-                    for rt in race_traits:
-                        if isinstance(rt, dict):
-                            name = rt.get('name', '')
-                            desc = rt.get('desc', '') or rt.get('description', '')
-                            if name and len(name) < 50:  # Filter out lore paragraphs
-                                trait_desc_lookup[name] = desc
-                    
-                    # Get trait names from traits list
-                    trait_names_to_show = []
-                    for t in traits:
-                        if isinstance(t, dict):
-                            name = t.get('name', '')
-                        else:
-                            name = str(t)
-                        if name and len(name) < 50:  # Filter out lore paragraphs
-                            trait_names_to_show.append(name)
-                    
-                    if trait_names_to_show or trait_desc_lookup:
-                        st.markdown("---")
-                        st.markdown("### Racial Traits")
-                        
-                        # Show traits from the traits list with descriptions from race_traits
-                        shown_traits = set()
-                        for trait_name in trait_names_to_show:
-                            if trait_name in shown_traits:
-                                continue
-                            shown_traits.add(trait_name)
-                            
-                            trait_desc = trait_desc_lookup.get(trait_name, '')
-                            if trait_desc:
-                                # Clean up description - remove lore that got mixed in
-                                if "\n" in trait_desc:
-                                    trait_desc = trait_desc.split("\n")[0]
-                                if len(trait_desc) > 400:
-                                    trait_desc = trait_desc[:400] + "..."
-                                st.markdown(f"**{trait_name}**")
-                                st.markdown(f"> {trait_desc}")
-                            else:
-                                st.markdown(f"**{trait_name}**")
-                        
-                        # Also show any race_traits that weren't in traits list
-                        for rt in race_traits:
-                            if isinstance(rt, dict):
-                                name = rt.get('name', '')
-                                if name and name not in shown_traits and len(name) < 50:
-                                    shown_traits.add(name)
-                                    desc = rt.get('desc', '') or rt.get('description', '')
-                                    if desc:
-                                        if "\n" in desc:
-                                            desc = desc.split("\n")[0]
-                                        if len(desc) > 400:
-                                            desc = desc[:400] + "..."
-                                        st.markdown(f"**{name}**")
-                                        st.markdown(f"> {desc}")
-                                    else:
-                                        st.markdown(f"**{name}**")
+                    _render_traits(
+                        race_data.get("traits", []),
+                        race_data.get("race_traits", []),
+                        cache_key=r_pick,
+                    )
                 
                 # Show subrace details if a subrace is selected
                 if subrace_data:
@@ -14316,47 +14616,15 @@ if st.session_state.boot_mode == "new":
                                 st.markdown("**Ability Bonuses:** " + ", ".join(bonus_parts))
                         
                         # Subrace traits
-                        sub_traits = subrace_data.get("traits", [])
-                        sub_race_traits = subrace_data.get("race_traits", [])
-                        
-                        if sub_traits or sub_race_traits:
-                            st.markdown("**Subrace Traits:**")
-                            
-                            # Build trait description lookup
-                            sub_trait_desc = {}
-                            for rt in sub_race_traits:
-                                if isinstance(rt, dict):
-                                    name = rt.get('name', '')
-                                    desc = rt.get('desc', '') or rt.get('description', '')
-                                    if name:
-                                        sub_trait_desc[name] = desc
-                            
-                            shown = set()
-                            for t in sub_traits:
-                                name = t.get('name', '') if isinstance(t, dict) else str(t)
-                                if name and name not in shown:
-                                    shown.add(name)
-                                    desc = sub_trait_desc.get(name, '')
-                                    if desc and len(desc) > 300:
-                                        desc = desc[:300] + "..."
-                                    if desc:
-                                        st.markdown(f"- **{name}**: {desc}")
-                                    else:
-                                        st.markdown(f"- **{name}**")
-                            
-                            # Show any race_traits not in traits
-                            for rt in sub_race_traits:
-                                if isinstance(rt, dict):
-                                    name = rt.get('name', '')
-                                    if name and name not in shown:
-                                        shown.add(name)
-                                        desc = rt.get('desc', '') or rt.get('description', '')
-                                        if desc and len(desc) > 300:
-                                            desc = desc[:300] + "..."
-                                        if desc:
-                                            st.markdown(f"- **{name}**: {desc}")
-                                        else:
-                                            st.markdown(f"- **{name}**")
+                        _render_traits(
+                            subrace_data.get("traits", []),
+                            subrace_data.get("race_traits", []),
+                            title="Subrace Traits",
+                            max_desc=300,
+                            compact=True,
+                            cache_key=(r_pick, subrace_pick),
+                            name_limit=None,
+                        )
                         
                         # Store subrace data in session state for later use
                         st.session_state.builder_subrace_data = subrace_data
@@ -14373,7 +14641,12 @@ if st.session_state.boot_mode == "new":
                 else:
                     st.warning("Please choose a race before continuing.")
 
-            st.caption("SRD races source: " + str(st.session_state.get("srd_races_path", "(not found)")))
+            # Only rebuild the caption string when the source path changes
+            _races_path = st.session_state.get("srd_races_path")
+            if "_races_src_caption" not in st.session_state or _races_path != st.session_state.get("_races_src_caption_key"):
+                st.session_state["_races_src_caption"] = "SRD races source: " + str(_races_path or "(not found)")
+                st.session_state["_races_src_caption_key"] = _races_path
+            st.caption(st.session_state["_races_src_caption"])
 
         # ------------------------------------------------------
         # STEP 2: Ability Scores (4d6, plus racial totals preview)
@@ -14382,6 +14655,8 @@ if st.session_state.boot_mode == "new":
             st.subheader("Step 2: Ability Scores")
 
             race_blob, r_pick = _get_picked_race()
+            # Shared by the choice preview and the Apply handler below
+            ab_options = (race_blob or {}).get("ability_bonus_options") or {}
 
             with st.expander("Ability Scores (4d6 drop lowest)", expanded=True):
                 abilities = c.setdefault(
@@ -14391,82 +14666,51 @@ if st.session_state.boot_mode == "new":
 
                 if st.button("Roll 4d6 (drop lowest)", key="builder_roll_4d6"):
                     scores = roll_ability_scores_4d6_drop_lowest()
-                    for key, val in zip(["STR", "DEX", "CON", "INT", "WIS", "CHA"], scores):
+                    for key, val in zip(_ABILITIES, scores):
                         abilities[key] = val
+                    # Drop pending editor edits so the rolled values show
+                    st.session_state.pop("builder_abilities_editor", None)
                     st.toast(f"Rolled scores: {scores}")
 
-                # BASE editable scores
-                col1, col2, col3 = st.columns(3)
-                abilities["STR"] = int(col1.number_input("STR (Base)", 3, 20, int(abilities.get("STR", 10)), key="builder_STR_base"))
-                abilities["DEX"] = int(col2.number_input("DEX (Base)", 3, 20, int(abilities.get("DEX", 10)), key="builder_DEX_base"))
-                abilities["CON"] = int(col3.number_input("CON (Base)", 3, 20, int(abilities.get("CON", 10)), key="builder_CON_base"))
+                # BASE editable scores - one editor row, batched in a form so typing doesn't rerun per cell
+                with st.form("builder_abilities_form"):
+                    base_row = {k: int(abilities.get(k, 10)) for k in _ABILITIES}
+                    edited = st.data_editor(
+                        [base_row],
+                        num_rows="fixed",
+                        hide_index=True,
+                        column_config={
+                            k: st.column_config.NumberColumn(f"{k} (Base)", min_value=3, max_value=20, step=1, required=True)
+                            for k in base_row
+                        },
+                        key="builder_abilities_editor",
+                    )
+                    for k, v in (edited[0] if edited else base_row).items():
+                        if v is not None:
+                            abilities[k] = int(v)
 
-                col4, col5, col6 = st.columns(3)
-                abilities["INT"] = int(col4.number_input("INT (Base)", 3, 20, int(abilities.get("INT", 10)), key="builder_INT_base"))
-                abilities["WIS"] = int(col5.number_input("WIS (Base)", 3, 20, int(abilities.get("WIS", 10)), key="builder_WIS_base"))
-                abilities["CHA"] = int(col6.number_input("CHA (Base)", 3, 20, int(abilities.get("CHA", 10)), key="builder_CHA_base"))
+                    st.form_submit_button("Recompute Totals")
 
                 # --- compute racial bonuses without mutating the character ---
-                race_bonus = {k: 0 for k in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]}
+                race_bonus = dict.fromkeys(_ABILITIES, 0)
             
             if race_blob:
-                ab = race_blob.get("ability_bonuses") or {}
-                # 5e SRD style: list of {"ability_score": {"index": "con", "name": "CON"}, "bonus": 2}
-                if isinstance(ab, list):
-                    for entry in ab:
-                        if not isinstance(entry, dict):
-                            continue
-                        key = None
-                        if "name" in entry:
-                            key = str(entry["name"]).upper()
-                        if not key and isinstance(entry.get("ability_score"), dict):
-                            as_obj = entry["ability_score"]
-                            key = (as_obj.get("name") or as_obj.get("index") or "").upper()
-                        bonus = int(entry.get("bonus", 0))
-                        if key in race_bonus:
-                            race_bonus[key] += bonus
-                # simple dict style: {"STR": 2, "CON": 2}
-                elif isinstance(ab, dict):
-                    for k, v in ab.items():
-                        key = str(k).upper()
-                        if key in race_bonus:
-                            race_bonus[key] += int(v)
-                
-                # Also add subrace bonuses to preview
-                subrace_data = st.session_state.get("builder_subrace_data")
-                if subrace_data:
-                    sub_ab = subrace_data.get("ability_bonuses") or []
-                    for entry in sub_ab:
-                        if isinstance(entry, dict):
-                            # Handle nested format: {"ability_score": {"name": "STR"}, "bonus": 1}
-                            if "ability_score" in entry and isinstance(entry["ability_score"], dict):
-                                key = entry["ability_score"].get("name", "").upper()
-                            else:
-                                # Handle simple format: {"name": "STR", "bonus": 1}
-                                key = str(entry.get("name", "")).upper()
-                            bonus = int(entry.get("bonus", 0))
-                            if key in race_bonus:
-                                race_bonus[key] += bonus
+                subrace_data = st.session_state.get("builder_subrace_data") or {}
+                race_bonus = _compute_race_bonus(r_pick, subrace_data.get("name", ""), race_blob, subrace_data)
 
             # Check for ability choice options (e.g., "+1 to STR or WIS")
-            ability_choice_bonus = {k: 0 for k in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]}
-            if race_blob:
-                ab_options = race_blob.get("ability_bonus_options", {})
-                if ab_options and ab_options.get("choose", 0) > 0:
-                    choose_count = ab_options.get("choose", 1)
-                    options_list = ab_options.get("from", [])
-                    
-                    # Get unique ability names from options
-                    option_names = list(set([opt.get("name", "") for opt in options_list]))
-                    option_bonuses = {opt.get("name", ""): opt.get("bonus", 1) for opt in options_list}
-                    
+            ability_choice_bonus = dict.fromkeys(_ABILITIES, 0)
+            option_names, option_bonuses, choose_count = [], {}, 0
+            has_ability_choice = False
+            if ab_options:
+                option_names, option_bonuses, choose_count = _race_choice_options(r_pick, ab_options)
+                if choose_count > 0:
                     st.markdown("---")
                     st.markdown(f"**Racial Ability Choice:** Choose {choose_count} ability/abilities to increase")
                     
                     # Store choices in session state
                     choice_key = "builder_ability_choices"
-                    if choice_key not in st.session_state:
-                        st.session_state[choice_key] = []
+                    st.session_state.setdefault(choice_key, [])
                     
                     if choose_count == 1:
                         # Single choice - use radio or selectbox
@@ -14478,6 +14722,7 @@ if st.session_state.boot_mode == "new":
                         st.session_state[choice_key] = [choice] if choice else []
                         if choice:
                             ability_choice_bonus[choice] = option_bonuses.get(choice, 1)
+                            has_ability_choice = True
                     else:
                         # Multiple choices - use multiselect
                         choices = st.multiselect(
@@ -14489,33 +14734,30 @@ if st.session_state.boot_mode == "new":
                         st.session_state[choice_key] = choices
                         for ch in choices:
                             ability_choice_bonus[ch] = option_bonuses.get(ch, 1)
+                            has_ability_choice = True
                         
                         if len(choices) < choose_count:
                             st.warning(f"Please select {choose_count} abilities. ({len(choices)} selected)")
 
             # build totals for all six abilities first
-            totals = {}
-            for abbr in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]:
-                base = int(abilities.get(abbr, 10))
-                totals[abbr] = base + int(race_bonus.get(abbr, 0)) + int(ability_choice_bonus.get(abbr, 0))
+            totals = {a: int(abilities.get(a, 10)) + race_bonus[a] + ability_choice_bonus[a] for a in _ABILITIES}
 
             # now it's safe to reference all of them in the UI
             subrace_label = ""
             if st.session_state.get("builder_subrace_data"):
                 subrace_label = " & Subrace"
-            choice_label = ""
-            if any(v > 0 for v in ability_choice_bonus.values()):
-                choice_label = " + Choice"
+            choice_label = " + Choice" if has_ability_choice else ""
             st.markdown(f"**Final Ability Totals (with Race{subrace_label}{choice_label})**")
+            # Display-only, so metrics rather than disabled inputs (no widget state)
             t1, t2, t3 = st.columns(3)
-            t1.number_input("STR (Total)", 1, 30, totals["STR"], key="builder_STR_total", disabled=True)
-            t2.number_input("DEX (Total)", 1, 30, totals["DEX"], key="builder_DEX_total", disabled=True)
-            t3.number_input("CON (Total)", 1, 30, totals["CON"], key="builder_CON_total", disabled=True)
+            t1.metric("STR (Total)", totals["STR"], delta=totals["STR"] - int(abilities.get("STR", 10)) or None)
+            t2.metric("DEX (Total)", totals["DEX"], delta=totals["DEX"] - int(abilities.get("DEX", 10)) or None)
+            t3.metric("CON (Total)", totals["CON"], delta=totals["CON"] - int(abilities.get("CON", 10)) or None)
 
             t4, t5, t6 = st.columns(3)
-            t4.number_input("INT (Total)", 1, 30, totals["INT"], key="builder_INT_total", disabled=True)
-            t5.number_input("WIS (Total)", 1, 30, totals["WIS"], key="builder_WIS_total", disabled=True)
-            t6.number_input("CHA (Total)", 1, 30, totals["CHA"], key="builder_CHA_total", disabled=True)
+            t4.metric("INT (Total)", totals["INT"], delta=totals["INT"] - int(abilities.get("INT", 10)) or None)
+            t5.metric("WIS (Total)", totals["WIS"], delta=totals["WIS"] - int(abilities.get("WIS", 10)) or None)
+            t6.metric("CHA (Total)", totals["CHA"], delta=totals["CHA"] - int(abilities.get("CHA", 10)) or None)
 
             # Navigation buttons
             col = st.columns([1, 1])
@@ -14528,22 +14770,23 @@ if st.session_state.boot_mode == "new":
                     st.warning("Please choose a race in Step 1 first.")
                 else:
                     # Check if ability choices are required and made
-                    ab_options = race_blob.get("ability_bonus_options", {})
-                    if ab_options and ab_options.get("choose", 0) > 0:
+                    if choose_count > 0:
                         choices = st.session_state.get("builder_ability_choices", [])
-                        required = ab_options.get("choose", 1)
-                        if len(choices) < required:
-                            st.warning(f"Please select {required} ability/abilities for your racial bonus.")
+                        if len(choices) < choose_count:
+                            st.warning(f"Please select {choose_count} ability/abilities for your racial bonus.")
                             st.stop()
                     
-                    # apply_race mutates c["abilities"] to include these racial bonuses
-                    apply_race(c, race_blob)
+                    # Racial (and subrace) bonuses were already parsed for the preview;
+                    # add them directly and let apply_race/apply_subrace skip the re-parse
+                    abilities = c.setdefault("abilities", {})
+                    for k, v in race_bonus.items():
+                        if v:
+                            abilities[k] = int(abilities.get(k, 10)) + v
+                    apply_race(c, race_blob, apply_ability_bonuses=False)
                     
                     # Apply ability choices
                     ability_choices = st.session_state.get("builder_ability_choices", [])
-                    if ability_choices and race_blob.get("ability_bonus_options"):
-                        options_list = race_blob["ability_bonus_options"].get("from", [])
-                        option_bonuses = {opt.get("name", ""): opt.get("bonus", 1) for opt in options_list}
+                    if ability_choices and ab_options:
                         for choice in ability_choices:
                             if choice in c["abilities"]:
                                 c["abilities"][choice] += option_bonuses.get(choice, 1)
@@ -14554,7 +14797,7 @@ if st.session_state.boot_mode == "new":
                     # Apply subrace if selected
                     subrace_data = st.session_state.get("builder_subrace_data")
                     if subrace_data:
-                        apply_subrace(c, subrace_data)
+                        apply_subrace(c, subrace_data, apply_ability_bonuses=False)
                     
                     st.session_state.builder_step = 3
                     st.toast("Ability scores applied and race bonuses added.")
@@ -14570,7 +14813,7 @@ if st.session_state.boot_mode == "new":
 
             bg_ability_choices = []
             if b_pick:
-                bg_blob = next((b for b in bgs if b.get("name") == b_pick), {})
+                bg_blob = _index_by_name(bgs, "_bg_index").get(b_pick) or {}
                 
                 # Show background details
                 with st.expander("Background Details", expanded=True):
@@ -14620,22 +14863,24 @@ if st.session_state.boot_mode == "new":
                     st.markdown("---")
                     num_choices = ab_options.get("choose", 1)
                     opts = ab_options.get("from", [])
-                    opt_names = [o.get("name", "") for o in opts]
+                    opt_names_sorted = sorted(o.get("name", "") for o in opts)
                     
                     st.markdown(f"**Choose {num_choices} Ability Score(s) to increase (from Background):**")
                     
                     cols = st.columns(num_choices)
+                    taken = set()
                     for j in range(num_choices):
                         with cols[j]:
                             # Filter to prevent selecting same ability twice
-                            available = [n for n in opt_names if n not in bg_ability_choices]
+                            available = [n for n in opt_names_sorted if n not in taken]
                             choice = st.selectbox(
                                 f"Choice {j+1}",
-                                [""] + sorted(available),
+                                [""] + available,
                                 key=f"bg_ability_choice_{j}"
                             )
                             if choice:
                                 bg_ability_choices.append(choice)
+                                taken.add(choice)
 
             col = st.columns([1, 1])
             if col[0].button("Back", key="bg_back"):
@@ -14643,7 +14888,7 @@ if st.session_state.boot_mode == "new":
                 st.rerun()
 
             # Validate choices before allowing apply
-            bg_blob = next((b for b in bgs if b.get("name") == b_pick), {}) if b_pick else {}
+            bg_blob = (_index_by_name(bgs, "_bg_index").get(b_pick) or {}) if b_pick else {}
             ab_options = bg_blob.get("ability_bonus_options", {})
             needs_choice = ab_options.get("choose", 0) if ab_options else 0
             
@@ -14669,7 +14914,7 @@ if st.session_state.boot_mode == "new":
             kit_idx = 0
 
             if c_pick:
-                c_blob = next((x for x in classes if x.get("name") == c_pick), None)
+                c_blob = _index_by_name(classes, "_class_index").get(c_pick)
                 kits = (c_blob or {}).get("starting_equipment_kits") or []
                 if kits:
                     kit_labels = [k.get("name", f"Kit {i+1}") for i, k in enumerate(kits)]
@@ -14694,254 +14939,14 @@ if st.session_state.boot_mode == "new":
                     st.markdown("---")
                     st.markdown(f"### 🔮 Spellcasting (Ability: **{spell_ability}**)")
                     
-                    # Load spells for this class
-                    available_cantrips, available_level1 = get_spells_for_class(c_pick, max_level=1)
-                    
-                    # Initialize spell selection state
-                    if "builder_cantrips" not in st.session_state:
-                        st.session_state.builder_cantrips = []
-                    if "builder_spells_l1" not in st.session_state:
-                        st.session_state.builder_spells_l1 = []
-                    
-                    # Cantrip selection
-                    if cantrips_known > 0 and available_cantrips:
-                        st.markdown(f"**Cantrips Known:** {cantrips_known}")
-                        cantrip_names = [s["name"] for s in available_cantrips]
-                        selected_cantrips = st.multiselect(
-                            "Select Cantrips",
-                            cantrip_names,
-                            default=st.session_state.builder_cantrips[:cantrips_known],
-                            max_selections=cantrips_known,
-                            key="builder_cantrips_select",
-                        )
-                        st.session_state.builder_cantrips = selected_cantrips
-                        
-                        # Show cantrip details
-                        if selected_cantrips:
-                            with st.expander("Cantrip Details", expanded=False):
-                                for name in selected_cantrips:
-                                    spell = next((s for s in available_cantrips if s["name"] == name), None)
-                                    if spell:
-                                        dmg_info = f" | **Damage:** {spell['damage']} {spell.get('damage_type', '')}" if spell.get('damage') else ""
-                                        save_info = f" | **Save:** {spell['save']}" if spell.get('save') else ""
-                                        atk_info = " | **Spell Attack**" if spell.get('type') == 'spell_attack' else ""
-                                        st.markdown(f"**{name}** ({spell['school']}){dmg_info}{save_info}{atk_info}")
-                                        st.caption(spell.get('description', '')[:200] + "..." if len(spell.get('description', '')) > 200 else spell.get('description', ''))
-                    
-                    # Level 1 spell selection
-                    if spells_known > 0 and available_level1:
-                        st.markdown(f"**Level 1 Spells Known:** {spells_known}")
-                        spell_l1_names = [s["name"] for s in available_level1]
-                        selected_spells = st.multiselect(
-                            "Select Level 1 Spells",
-                            spell_l1_names,
-                            default=st.session_state.builder_spells_l1[:spells_known],
-                            max_selections=spells_known,
-                            key="builder_spells_l1_select",
-                        )
-                        st.session_state.builder_spells_l1 = selected_spells
-                        
-                        # Show spell details
-                        if selected_spells:
-                            with st.expander("Spell Details", expanded=False):
-                                for name in selected_spells:
-                                    spell = next((s for s in available_level1 if s["name"] == name), None)
-                                    if spell:
-                                        dmg_info = f" | **Damage:** {spell['damage']} {spell.get('damage_type', '')}" if spell.get('damage') else ""
-                                        save_info = f" | **Save:** {spell['save']}" if spell.get('save') else ""
-                                        atk_info = " | **Spell Attack**" if spell.get('type') == 'spell_attack' else ""
-                                        conc_info = " | ⚡ Concentration" if spell.get('concentration') else ""
-                                        st.markdown(f"**{name}** ({spell['school']}){dmg_info}{save_info}{atk_info}{conc_info}")
-                                        st.caption(spell.get('description', '')[:200] + "..." if len(spell.get('description', '')) > 200 else spell.get('description', ''))
-                    
-                    # Spell slots info
-                    spell_slots = level_1_data.get("spell_slots_by_level", {})
-                    if spell_slots:
-                        slots_str = ", ".join(f"Level {k}: {v} slots" for k, v in spell_slots.items())
-                        st.info(f"**Spell Slots at Level 1:** {slots_str}")
-                
-                with st.expander("Class Details", expanded=False):
-                    st.write(c_blob or {})
-                
-                # ---- Artificer-specific options ----
-                if c_pick == "Artificer":
-                    st.markdown("---")
-                    st.markdown("### ⚙️ Artificer Options")
-                    st.info("Artificers use **Crafting Points** instead of spell slots. Your inventions are technology, not magic!")
-                    
-                    # Note about Signature Invention (level 3 feature)
-                    st.caption("At level 3, you'll choose your **Signature Invention**: Personal Armor, Mechanical Servant, or Cannon Weapon.")
-                    
-                    # For now, let them pre-select if they want (stored for later)
-                    with st.expander("Preview Signature Invention (Level 3)", expanded=False):
-                        invention_choice = st.radio(
-                            "Choose your invention path:",
-                            ["armor", "servant", "cannon"],
-                            format_func=lambda x: {
-                                "armor": "⚔️ Personal Suit of Armor - AC = 10 + INT mod, damage reduction",
-                                "servant": "🤖 Mechanical Servant - Autonomous companion, HP = level",
-                                "cannon": "💥 Cannon Weapon - 1d6 damage, 120 ft range, uses INT"
-                            }.get(x, x),
-                            key="builder_artificer_invention",
-                            horizontal=False,
-                        )
-                        # Note: widget key already stores value in session_state
-                        
-                        if invention_choice == "cannon":
-                            st.selectbox(
-                                "Cannon damage type:",
-                                ["force", "piercing", "thunder", "fire", "cold", "lightning"],
-                                key="builder_cannon_type"
-                            )
-                            # Note: widget key already stores value in session_state
-                
-                # ---- Cleric-specific options ----
-                if c_pick == "Cleric":
-                    st.markdown("---")
-                    st.markdown("### ⛪ Cleric Options")
-                    
-                    # Domain Selection
-                    st.markdown("**Choose Your Divine Domain:**")
-                    domain_choice = st.selectbox(
-                        "Divine Domain",
-                        list(CLERIC_DOMAINS.keys()),
-                        key="builder_cleric_domain",
-                        help="Your domain grants bonus spells and special abilities."
-                    )
-                    
-                    domain_data = CLERIC_DOMAINS.get(domain_choice, {})
-                    st.caption(domain_data.get("description", ""))
-                    
-                    # Show domain spells
-                    with st.expander("Domain Spells (always prepared)", expanded=False):
-                        domain_spells = domain_data.get("domain_spells", {})
-                        for level, spells in sorted(domain_spells.items()):
-                            st.caption(f"**Level {level}:** {', '.join(spells)}")
-                    
-                    # Show bonus proficiencies
-                    bonus_profs = domain_data.get("bonus_proficiencies", [])
-                    if bonus_profs:
-                        st.caption(f"**Bonus Proficiencies:** {', '.join(bonus_profs)}")
+                    _builder_spellcasting_fragment(c_pick, cantrips_known, spells_known, level_1_data)
                 
-                # ---- Sorcerer-specific options ----
-                if c_pick == "Sorcerer":
-                    st.markdown("---")
-                    st.markdown("### 🔥 Sorcerer Options")
-                    
-                    # Bloodline Selection
-                    st.markdown("**Choose Your Bloodline:**")
-                    bloodline_choice = st.selectbox(
-                        "Sorcerous Bloodline",
-                        ["Dragon", "Fey", "Fiendish"],
-                        key="builder_sorcerer_bloodline",
-                        help="Your bloodline shapes your magical abilities and grants unique features."
-                    )
-                    
-                    bloodline_descriptions = {
-                        "Dragon": "Draconic ancestry grants elemental resistance, breath weapon, and scales.",
-                        "Fey": "Fey heritage grants charm resistance, Misty Step, and enchantment mastery.",
-                        "Fiendish": "Infernal blood grants fire resistance, hellfire empowerment, and dark power."
-                    }
-                    st.caption(bloodline_descriptions.get(bloodline_choice, ""))
-                    
-                    # Dragon type selection for Dragon bloodline
-                    if bloodline_choice == "Dragon":
-                        dragon_type = st.selectbox(
-                            "Dragon Type (determines damage type):",
-                            ["Red", "Gold", "Brass", "Blue", "Bronze", "Black", "Copper", "Green", "White", "Silver"],
-                            key="builder_sorcerer_dragon_type"
-                        )
-                        dragon_damage = {
-                            "Red": "Fire", "Gold": "Fire", "Brass": "Fire",
-                            "Blue": "Lightning", "Bronze": "Lightning",
-                            "Black": "Acid", "Copper": "Acid",
-                            "Green": "Poison",
-                            "White": "Cold", "Silver": "Cold",
-                        }
-                        st.caption(f"Damage type: {dragon_damage.get(dragon_type, 'Fire')}")
-                    
-                    # Fiend type selection for Fiendish bloodline
-                    if bloodline_choice == "Fiendish":
-                        fiend_type = st.selectbox(
-                            "Fiend Type:",
-                            ["Devil", "Demon", "Yugoloth"],
-                            key="builder_sorcerer_fiend_type"
-                        )
-                    
-                    # Preview Metamagic (Level 3)
-                    with st.expander("Preview Metamagic (Level 3)", expanded=False):
-                        st.caption("At level 3, you'll choose 1 Metamagic option:")
-                        for meta_name, meta_data in SORCERER_METAMAGIC.items():
-                            cost = meta_data.get("cost", 1)
-                            cost_str = f"{cost} SP" if isinstance(cost, int) else "Spell level SP"
-                            st.markdown(f"- **{meta_name}** ({cost_str}): {meta_data['description']}")
+                # Raw class data is only serialized when asked for
+                if st.checkbox("Show raw class data", key="show_class_details"):
+                    st.json(c_blob or {}, expanded=False)
                 
-                # ---- Warlock-specific options ----
-                if c_pick == "Warlock":
-                    st.markdown("---")
-                    st.markdown("### 🌙 Warlock Options")
-                    
-                    # Patron Selection (Level 1)
-                    st.markdown("**Choose Your Patron:**")
-                    patron_choice = st.selectbox(
-                        "Eldritch Patron",
-                        ["Fiend", "Great Old One", "Archfey", "Celestial", "Shadow", "Draconic"],
-                        key="builder_warlock_patron",
-                        help="Your patron grants you power and shapes your abilities."
-                    )
-                    
-                    patron_descriptions = {
-                        "Fiend": "Devils, Demons - Fire resistance, dark bargains, infernal power.",
-                        "Great Old One": "Eldritch horrors - Telepathy, psychic resistance, madness.",
-                        "Archfey": "Powerful fey - Misty Step, charm, illusion magic.",
-                        "Celestial": "Divine beings - Healing light, radiant resistance.",
-                        "Shadow": "Death and darkness - Speak with dead, necrotic resistance.",
-                        "Draconic": "Elder dragons - Breath weapon, draconic presence."
-                    }
-                    st.caption(patron_descriptions.get(patron_choice, ""))
-                    
-                    # Dragon type selection for Draconic patron
-                    if patron_choice == "Draconic":
-                        dragon_type = st.selectbox(
-                            "Dragon Type (determines breath damage):",
-                            ["Fire", "Cold", "Lightning", "Acid", "Poison"],
-                            key="builder_warlock_dragon_type"
-                        )
-                    
-                    # Preview of Pact Boon (Level 3)
-                    with st.expander("Preview Pact Boon (Level 3)", expanded=False):
-                        st.caption("At level 3, you'll choose a Pact Boon:")
-                        pact_boon = st.radio(
-                            "Pact Boon:",
-                            ["Blade", "Chain", "Tome", "Talisman"],
-                            format_func=lambda x: {
-                                "Blade": "⚔️ Pact of the Blade - Create magical pact weapons",
-                                "Chain": "🐉 Pact of the Chain - Powerful familiar (imp, pseudodragon, etc.)",
-                                "Tome": "📖 Pact of the Tome - Book of Shadows with 3 cantrips from any class",
-                                "Talisman": "🔮 Pact of the Talisman - Amulet that aids ability checks"
-                            }.get(x, x),
-                            key="builder_warlock_pact_boon",
-                            horizontal=False,
-                        )
-                    
-                    # Preview of Invocations (Level 2)
-                    with st.expander("Preview Eldritch Invocations (Level 2)", expanded=False):
-                        st.caption("At level 2, you'll choose 2 Eldritch Invocations. Here are some options:")
-                        
-                        # Show available invocations
-                        invocation_options = [
-                            ("Agonizing Blast", "Add CHA mod to Eldritch Blast damage (requires Eldritch Blast)"),
-                            ("Armor of Shadows", "Cast Mage Armor on yourself at will"),
-                            ("Devil's Sight", "See in magical/nonmagical darkness to 120 ft"),
-                            ("Eldritch Sight", "Cast Detect Magic at will"),
-                            ("Mask of Many Faces", "Cast Disguise Self at will"),
-                            ("Repelling Blast", "Eldritch Blast pushes target 10 ft (requires Eldritch Blast)"),
-                            ("Fiendish Vigor", "Cast False Life on yourself at will"),
-                            ("Beast Speech", "Cast Speak with Animals at will"),
-                        ]
-                        
-                        for inv_name, inv_desc in invocation_options:
-                            st.markdown(f"- **{inv_name}**: {inv_desc}")
+                # ---- Class-specific options ----
+                CLASS_SELECTORS.get(c_pick, lambda blob: None)(c_blob)
 
             col = st.columns([1, 1])
             if col[0].button("Back  ", key="class_back"):
@@ -14950,7 +14955,7 @@ if st.session_state.boot_mode == "new":
 
             if col[1].button("Apply Class", type="primary"):
                 if c_pick:
-                    cls_blob = next(x for x in classes if x.get("name") == c_pick)
+                    cls_blob = _index_by_name(classes, "_class_index")[c_pick]
                     apply_class_level1(
                         c,
                         cls_blob,
@@ -14994,27 +14999,20 @@ if st.session_state.boot_mode == "new":
                         selected_spells_l1 = st.session_state.get("builder_spells_l1", [])
                         
                         # Load spell data
-                        all_spells = load_srd_spells()
-                        actions = c.setdefault("actions", [])
+                        spell_by_name = load_srd_spell_index()
+                        actions_append = c.setdefault("actions", []).append
                         spells_list = c.setdefault("spells", [])
+                        get_spell = spell_by_name.get
                         
-                        # Add cantrips as actions (at-will)
-                        for spell_name in selected_cantrips:
-                            spell_data = next((s for s in all_spells if s["name"] == spell_name), None)
-                            if spell_data:
-                                spells_list.append(spell_name)
-                                action = spell_to_action(spell_data, c)
-                                action["at_will"] = True  # Cantrips are at-will
-                                actions.append(action)
-                        
-                        # Add level 1 spells as actions (use spell slots)
-                        for spell_name in selected_spells_l1:
-                            spell_data = next((s for s in all_spells if s["name"] == spell_name), None)
-                            if spell_data:
-                                spells_list.append(spell_name)
-                                action = spell_to_action(spell_data, c)
-                                action["at_will"] = False  # Level 1+ spells use slots
-                                actions.append(action)
+                        # Cantrips are at-will; level 1+ spells use slots
+                        for picks, at_will in ((selected_cantrips, True), (selected_spells_l1, False)):
+                            for spell_name in picks:
+                                spell_data = get_spell(spell_name)
+                                if spell_data:
+                                    spells_list.append(spell_name)
+                                    action = spell_to_action(spell_data, c)
+                                    action["at_will"] = at_will
+                                    actions_append(action)
                         
                         # Store spell slots
                         levels_data = cls_blob.get("levels", {})
@@ -15041,38 +15039,19 @@ if st.session_state.boot_mode == "new":
             st.subheader("Step 5: Assign Skills")
 
             c_pick = st.session_state.get("builder_class_pick", "")
-            cls_blob = next((x for x in classes if x.get("name") == c_pick), None) if c_pick else None
+            cls_blob = _index_by_name(classes, "_class_index").get(c_pick) if c_pick else None
+            skill_list, spent, apply_skills = [], 0, False
 
             if not cls_blob:
                 st.warning("Please choose and apply a class in Step 4 first.")
             else:
-                # --------- figure out the class's skill list ----------
-                # Try several possible keys so we work with different JSON formats
-                skill_list = []
-                for key in ["skill_list", "skills", "class_skills", "trained_skills"]:
-                    val = cls_blob.get(key)
-                    if isinstance(val, list) and val:
-                        skill_list = [str(s) for s in val]
-                        break
+                # --------- class skill list + skill point budget ----------
+                skill_list, base_points, int_mod, total_points = _compute_skill_budget(c, cls_blob)
 
                 if not skill_list:
                     st.warning("This class has no skill list defined. "
                             "Check your SRD_Classes.json for a 'skill_list' or similar field.")
                 else:
-                    # --------- figure out how many skill points we have ----------
-                    raw_sp = str(cls_blob.get("skill_points_per_level", "") or cls_blob.get("skill_points", "0"))
-                    import re as _re
-                    m = _re.search(r"(\d+)", raw_sp)
-                    base_points = int(m.group(1)) if m else 0
-
-                    # If the class JSON doesn't have skill points, use a fallback (e.g. 2 + INT)
-                    if base_points == 0:
-                        base_points = 2  # tweak this default
-
-                    int_score = int(c.get("abilities", {}).get("INT", 10))
-                    int_mod = _ability_mod(int_score)
-                    total_points = max(1, base_points + int_mod)
-
                     st.markdown(
                         f"Class skill points: **{base_points} + INT mod ({int_mod:+d}) = {total_points}**"
                     )
@@ -15082,79 +15061,65 @@ if st.session_state.boot_mode == "new":
                     for sk in skill_list:
                         ranks_state.setdefault(sk, 0)
 
-                    cols = st.columns(3)
-                    spent = 0
-                    for i, sk in enumerate(skill_list):
-                        col = cols[i % 3]
-                        current = int(ranks_state.get(sk, 0))
-                        new_val = col.number_input(
-                            sk,
-                            min_value=0,
-                            max_value=10,
-                            value=current,
-                            key=f"skill_rank_{sk}",
-                        )
-                        ranks_state[sk] = new_val
-                        spent += new_val
+                    # One form so rank edits only rerun the page on submit
+                    with st.form("skill_form"):
+                        cols = st.columns(3)
+                        for i, sk in enumerate(skill_list):
+                            col = cols[i % 3]
+                            current = int(ranks_state.get(sk, 0))
+                            new_val = col.number_input(
+                                sk,
+                                min_value=0,
+                                max_value=10,
+                                value=current,
+                                key=f"skill_rank_{sk}",
+                            )
+                            ranks_state[sk] = new_val
+                            spent += new_val
 
-                    st.markdown(f"**Skill points spent:** {spent} / {total_points}")
-                    if spent > total_points:
-                        st.error("You have spent more skill points than available.")
+                        st.markdown(f"**Skill points spent:** {spent} / {total_points}")
+                        if spent > total_points:
+                            st.error("You have spent more skill points than available.")
+                        apply_skills = st.form_submit_button("Apply Skills", type="primary")
 
             col = st.columns([1, 1])
             if col[0].button("Back   ", key="skills_back"):
                 st.session_state.builder_step = 4
                 st.rerun()
 
-            if col[1].button("Apply Skills", type="primary"):
+            if not skill_list:
+                apply_skills = col[1].button("Apply Skills", type="primary")
+
+            if apply_skills:
                 if not cls_blob:
                     st.warning("You must choose a class in Step 4 first.")
+                elif skill_list and spent > total_points:
+                    st.error("Too many points spent; reduce some ranks before continuing.")
                 else:
-                    # recompute totals for validation
-                    raw_sp = str(cls_blob.get("skill_points_per_level", "") or cls_blob.get("skill_points", "0"))
-                    import re as _re
-                    m = _re.search(r"(\d+)", raw_sp)
-                    base_points = int(m.group(1)) if m else 0
-                    if base_points == 0:
-                        base_points = 2
-
-                    int_score = int(c.get("abilities", {}).get("INT", 10))
-                    int_mod = _ability_mod(int_score)
-                    total_points = max(1, base_points + int_mod)
-
-                    # same logic to discover skill list
-                    skill_list = []
-                    for key in ["skill_list", "skills", "class_skills", "trained_skills"]:
-                        val = cls_blob.get(key)
-                        if isinstance(val, list) and val:
-                            skill_list = [str(s) for s in val]
-                            break
-
-                    ranks_state = st.session_state.builder_skill_ranks
-                    spent = sum(int(ranks_state.get(sk, 0)) for sk in skill_list)
-
-                    if spent > total_points:
-                        st.error("Too many points spent; reduce some ranks before continuing.")
-                    else:
-                        # write to character
-                        skills_dict = c.setdefault("skills", {})
-                        prof_skills = set(c.setdefault("profs", {}).setdefault("skills", []))
-                        for sk in skill_list:
-                            r = int(ranks_state.get(sk, 0))
-                            if r > 0:
-                                skills_dict[sk] = r
-                                prof_skills.add(sk)
-                        c["profs"]["skills"] = sorted(prof_skills)
-                        st.session_state.builder_step = 6
-                        st.toast("Skills applied.")
-                        st.rerun()
+                    # write to character
+                    skills_dict = c.setdefault("skills", {})
+                    profs = c.setdefault("profs", {})
+                    prof_list = profs.setdefault("skills", [])
+                    ranked = []
+                    for sk in skill_list:
+                        r = int(ranks_state.get(sk, 0))
+                        if r > 0:
+                            skills_dict[sk] = r
+                            ranked.append(sk)
+                    # Only re-sort the stored list when this apply added a new skill
+                    added = set(ranked).difference(prof_list)
+                    if added:
+                        profs["skills"] = sorted(added.union(prof_list))
+                    st.session_state.builder_step = 6
+                    st.toast("Skills applied.")
+                    st.rerun()
 
         # ------------------------------------------------------
         # STEP 6: Feats
         # ------------------------------------------------------
         if step == 6:
             st.subheader("Step 6: Choose Feats (Optional)")
-            feat_names = [f.get("name", "") if isinstance(f, dict) else str(f) for f in feats_db]
+            feat_names = st.session_state.get("_feat_names", ())
             chosen = st.multiselect("Feats", feat_names, key="builder_feats_multi")
 
             col = st.columns([1, 1])
@@ -15173,20 +15138,26 @@ if st.session_state.boot_mode == "new":
         # ------------------------------------------------------
         if step == 7:
             st.subheader("Step 7: Add Equipment (Optional)")
-            item_names = [i.get("name", "") if isinstance(i, dict) else str(i) for i in equip_db]
+            item_names = st.session_state.get("_item_names", ())
             extras = st.multiselect("Add items", item_names, key="builder_items_multi")
 
             if st.button("Add Items"):
-                eq = set(c.get("equipment") or [])
+                # Ordered dedupe keeps the player's list order; skip the AC/attack
+                # recompute when nothing new was picked.
+                current = c.get("equipment") or []
+                eq = dict.fromkeys(current)
                 for it in extras:
                     if it:
-                        eq.add(it)
-                c["equipment"] = sorted(eq)
-                c["ac"] = compute_ac_from_equipment(c)
+                        eq[it] = None
+                if len(eq) != len(set(current)):
+                    c["equipment"] = list(eq)
+                    c["ac"] = compute_ac_from_equipment(c)
 
-                sync_attacks_from_equipment(c)
+                    sync_attacks_from_equipment(c)
 
-                st.toast("Items added.")
+                    st.toast("Items added.")
+                else:
+                    st.toast("No new items to add.")
 
             col = st.columns([1, 1, 2])
             if col[0].button("Back     ", key="equip_back"):
@@ -15225,7 +15196,7 @@ if st.session_state.boot_mode == "new":
                 if not c.get("name"):
                     st.warning("Please set a character name.")
                 else:
-                    st.session_state.party.append(json.loads(json.dumps(c)))
+                    st.session_state.party.append(copy.deepcopy(c))
                     st.success(f"Added to party: {c['name']}")
                     # stay on setup page; builder remains for creating another character
             
@@ -15308,16 +15279,16 @@ if st.session_state.boot_mode == "new":
             if not st.session_state.get("srd_enemies"):
                 st.caption("SRD file not found at ../data/SRD_Monsters.json")
             else:
-                srd_names = [m.get("name", "") for m in st.session_state.srd_enemies if m.get("name")]
+                srd_names = st.session_state.srd_enemy_names
                 srd_name = st.selectbox("SRD Monster", srd_names, key="add_srd_name")
                 qty = st.number_input("Quantity", 1, 20, 1, key="add_srd_qty")
 
-                sb = next((m for m in st.session_state.srd_enemies if m.get("name") == srd_name), None)
+                sb = st.session_state.srd_enemy_by_name.get(srd_name)
 
                 if st.button("Add SRD Enemy", type="primary", key="add_srd_enemy_btn"):
                     if sb:
                         for _ in range(int(qty)):
-                            blob = json.loads(json.dumps(sb))  # safe deep copy
+                            blob = copy.deepcopy(sb)
                             blob["src"] = sb.get("name", "Enemy")
                             blob["name"] = f"{sb.get('name','Enemy')} #{len(st.session_state.enemies)+1}"
                             blob["hp"] = int(blob.get("hp", 10))
@@ -15359,9 +15330,16 @@ if st.session_state.boot_mode == "new":
 
 # ---------------- Running Session ----------------
 
-# Refresh class features for all party members (ensures level-based features are applied)
+# Refresh class features for all party members (ensures level-based features are applied).
+# Skip members whose class/level/abilities haven't changed since the last refresh.
+# Handlers that change anything else the refresh reads (class options, feats,
+# literacy, companions) call add_level1_class_resources_and_actions themselves.
 for _pc in st.session_state.get("party", []):
+    _sig = f'{_pc.get("class")}|{_pc.get("level", 1)}|{json.dumps(_pc.get("abilities", {}), sort_keys=True)}'
+    if _pc.get("_resources_rev") == _sig:
+        continue
     add_level1_class_resources_and_actions(_pc)
+    _pc["_resources_rev"] = _sig
 
 # Run state validation and show warnings if any issues found
 _validation_warnings = debug_validate_state()
@@ -15388,1899 +15366,1896 @@ st.divider()
 # ========== MAIN LAYOUT: LEFT (Party+Enemies) | CENTER (Map) | RIGHT (Tracker+Log) ==========
 left_col, mid_col, tracker_col, roller_col = st.columns([1.15, 2.7, 1.35, 1.35], gap="small")
 
-# ===== LEFT COLUMN: Party + Enemies =====
-with left_col:
-    # ========== PARTY SECTION ==========
-    st.markdown("### 👥 Party")
-    with st.container(height=320, border=False):
-        if not st.session_state.party:
-            st.info("🧙 No party members yet. Go to **Setup** to add characters.")
+# ===== Party / enemy cards (fragments) =====
+_EMPTY = MappingProxyType({})  # shared read-only fallback for missing dicts
+
+@lru_cache(maxsize=None)
+def _card_keys(side: str, i: int) -> dict:
+    """Widget keys for the core controls on card i ("p" party, "e" enemy), built once per index."""
+    base = "run_p" if side == "p" else "e"
+    return {
+        "ac": f"{base}_ac_{i}",
+        "hp": f"{base}_hp_{i}",
+        "band": f"{base}_band_{i}",
+        "rm": f"{base}_rm_{i}",
+        "cond_sel": f"add_cond_sel_{side}_{i}",
+        "cond_dur": f"add_cond_dur_{side}_{i}",
+        "cond_custom": f"add_cond_custom_{side}_{i}",
+    }
+
+def _rerun_card():
+    """
+    Rerun only the calling fragment (a card or its maneuver box); falls back to
+    a full rerun when it is being drawn as part of a full-app run.
+    """
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def _xp_bundle(c: dict, i: int):
+    """
+    (xp_info, total level, classes, class summary) for party card i, cached in
+    session state until the character's XP, level or class levels change.
+    """
+    char_classes = get_classes(c)
+    stamp = (
+        c.get("xp_current", 0),
+        c.get("level", 1),
+        tuple((cc.get("class_id"), cc.get("level")) for cc in char_classes),
+    )
+    cached = st.session_state.get(f"xp_cache_{i}")
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, get_xp_progress(c), get_total_level(c), get_class_summary(c))
+        st.session_state[f"xp_cache_{i}"] = cached
+    _, xp_info, current_level, class_summary = cached
+    return xp_info, current_level, char_classes, class_summary
+
+@st.fragment
+def render_maneuver_ui(i: int, action_idx: int, action_name: str):
+    """
+    Target selection + Apply/Cancel for party member i's active Marshal maneuver.
+    Its own fragment, so picking targets or cancelling doesn't redraw the card.
+    """
+    if st.session_state.get(f"marshal_maneuver_active_{i}") != action_name:
+        return
+    party = st.session_state.party
+    if i >= len(party):
+        return
+    c = party[i]
+    char_name = c.get("name", "")
+    resources = c.setdefault("resources", {}) or {}
+    with st.container(border=True):
+        st.markdown(f"**🎯 Target Selection for {action_name}**")
+
+        # Get allies in range (all party members for now)
+        aura_range = c.get("aura_range", 30)
+        allies = [p.get("name", f"Ally {j}") for j, p in enumerate(party) if j != i]
+
+        maneuver_key = action_name.replace("Marshal: ", "")
+        maneuver_data = MARSHAL_MANEUVERS.get(maneuver_key, {})
+        flags = marshal_maneuver_flags(maneuver_data)
+
+        # Different targeting based on maneuver type
+        if flags["allies"]:
+            # Affects all allies - no selection needed
+            st.info(f"This affects all allies within {aura_range} ft.")
+            target_allies = allies
         else:
-            for i, c in enumerate(st.session_state.party):
-                box = st.container(border=True)
-                t1, t2, t3, t4, t5 = box.columns([3, 2, 2, 2, 2])
+            # Single target selection
+            target_allies = st.multiselect(
+                "Select target(s):",
+                allies,
+                key=f"marshal_targets_{i}_{action_idx}"
+            )
 
-                with t1:
-                    st.markdown(f"**{c.get('name','')}**")
-                with t2:
-                    c["ac"] = int(
-                        st.number_input(
-                            "AC", 0, 40, int(c.get("ac", 10)), key=f"run_p_ac_{i}"
-                        )
-                    )
-                with t3:
-                    c["hp"] = int(
-                        st.number_input(
-                            "HP", 0, 500, int(c.get("hp", 10)), key=f"run_p_hp_{i}"
+        col_apply, col_cancel = st.columns(2)
+        with col_apply:
+            if st.button("✅ Apply", key=f"apply_marshal_{i}_{action_idx}"):
+                # Consume Martial Die
+                martial_dice = resources.setdefault("Martial Dice", {})
+                martial_dice["current"] = max(0, martial_dice.get("current", 0) - 1)
+
+                # Roll the martial die
+                die_size = c.get("marshal_die_size", "d6")
+                die_value = int(die_size[1:])
+                roll = random.randint(1, die_value)
+
+                # Apply effect based on maneuver
+                effect_msg = f"{char_name} uses {action_name}! Rolled {roll} on {die_size}."
+
+                effect = next((fn for flag, fn in MANEUVER_EFFECTS.items() if flags[flag]), None)
+                if effect:
+                    effect_msg += effect(c, roll, target_allies, party)
+
+                st.toast(effect_msg)
+                st.session_state.pop(f"marshal_maneuver_active_{i}", None)
+                st.rerun()
+
+        with col_cancel:
+            if st.button("❌ Cancel", key=f"cancel_marshal_{i}_{action_idx}"):
+                st.session_state.pop(f"marshal_maneuver_active_{i}", None)
+                _rerun_card()
+
+def _fighter_maneuver_caption(name: str, data: dict) -> str:
+    return f"• **{name}** ({data.get('type', 'attack')}): {data.get('description', '')}"
+
+_MARSHAL_TYPE_LABELS = {"action": "Action", "bonus": "Bonus", "reaction": "Reaction"}
+
+def _marshal_maneuver_caption(name: str, data: dict) -> str:
+    mtype = data.get("type", "action")
+    return f"• **{name}** ({_MARSHAL_TYPE_LABELS.get(mtype) or mtype.capitalize()}): {data.get('description', '')}"
+
+def _knight_maneuver_caption(name: str, data: dict) -> str:
+    requires_mounted = " (Mounted only)" if data.get("requires_mounted") else ""
+    return f"• **{name}** ({data.get('type', 'attack')}){requires_mounted}: {data.get('description', '')}"
+
+def _invocation_caption(name: str, data: dict) -> str:
+    prereq_text = f" *(Requires: {data.get('prereq')})*" if data.get("prereq") else ""
+    return f"**{name}**: {data.get('description', '')}{prereq_text}"
+
+def _metamagic_caption(name: str, data: dict) -> str:
+    cost = data.get("cost", 1)
+    cost_str = f"{cost} SP" if isinstance(cost, int) else "Spell level SP"
+    return f"• **{name}** ({cost_str}): {data.get('description', '')}"
+
+def _primal_talent_caption(name: str, data: dict) -> str:
+    prereq = data.get("prerequisite")
+    prereq_str = f" (Requires: {prereq})" if prereq else ""
+    return f"• **{name}**{prereq_str}: {data.get('description', '')}"
+
+# Caption lines for selected level-up options, formatted once at import
+_FIGHTER_MANEUVER_CAPTIONS = {n: _fighter_maneuver_caption(n, d) for n, d in FIGHTER_MANEUVERS.items()}
+_MARSHAL_MANEUVER_CAPTIONS = {n: _marshal_maneuver_caption(n, d) for n, d in MARSHAL_MANEUVERS.items()}
+_KNIGHT_MANEUVER_CAPTIONS = {n: _knight_maneuver_caption(n, d) for n, d in KNIGHT_MANEUVERS.items()}
+_INVOCATION_CAPTIONS = {n: _invocation_caption(n, d) for n, d in WARLOCK_INVOCATIONS.items()}
+_METAMAGIC_CAPTIONS = {n: _metamagic_caption(n, d) for n, d in SORCERER_METAMAGIC.items()}
+_PRIMAL_TALENT_CAPTIONS = {n: _primal_talent_caption(n, d) for n, d in BARBARIAN_PRIMAL_TALENTS.items()}
+
+# Pending flag -> settings for the shared maneuver-learning expander.
+# "stem" builds the widget keys: {stem}_select_{i}, {stem}_filter_{i}, learn_{stem}s_{i}.
+_MANEUVER_PICKERS = {
+    "maneuvers": {
+        "title": "⚔️ Combat Maneuvers", "names": _FIGHTER_MANEUVER_NAMES,
+        "known": "fighter_maneuvers", "pending": "pending_maneuvers", "stem": "maneuver",
+        "captions": _FIGHTER_MANEUVER_CAPTIONS, "noun": "maneuver(s)", "none_left": "All maneuvers already learned.",
+    },
+    "marshal_maneuvers": {
+        "title": "🎖️ Marshal Maneuvers", "names": _MARSHAL_MANEUVER_NAMES,
+        "known": "marshal_maneuvers", "pending": "pending_marshal_maneuvers", "stem": "marshal_maneuver",
+        "captions": _MARSHAL_MANEUVER_CAPTIONS, "noun": "maneuver(s)", "none_left": "All marshal maneuvers already learned.",
+    },
+    "knight_maneuvers": {
+        "title": "🛡️ Knight Maneuvers", "names": _KNIGHT_MANEUVER_NAMES,
+        "known": "knight_maneuvers", "pending": "pending_knight_maneuvers", "stem": "knight_maneuver",
+        "captions": _KNIGHT_MANEUVER_CAPTIONS, "noun": "knight maneuver(s)", "none_left": "All knight maneuvers already learned.",
+    },
+}
+
+def _render_maneuver_learning(c: dict, i: int, kind: str):
+    """Pending-choice expander for learning fighter, marshal or knight maneuvers on party card i."""
+    cfg = _MANEUVER_PICKERS[kind]
+    stem = cfg["stem"]
+    maneuvers_to_choose = c.get(cfg["pending"], 0)
+    with st.expander(f"{cfg['title']} ({maneuvers_to_choose} to choose)", expanded=True):
+        current_maneuvers = c.get(cfg["known"], [])
+
+        # Get available maneuvers
+        maneuver_names = _unlearned(cfg["names"], current_maneuvers)
+
+        if maneuver_names:
+            selected_maneuvers = st.multiselect(
+                f"Choose {maneuvers_to_choose} maneuver(s):",
+                _picker_options(maneuver_names, f"{stem}_filter_{i}"),
+                max_selections=maneuvers_to_choose,
+                key=f"{stem}_select_{i}"
+            )
+
+            # Show descriptions for selected
+            if selected_maneuvers:
+                st.markdown("**Selected Maneuvers:**")
+                captions = cfg["captions"]
+                for m_name in selected_maneuvers:
+                    st.caption(captions[m_name])
+
+            if st.button("Learn Maneuvers", key=f"learn_{stem}s_{i}",
+                    disabled=len(selected_maneuvers) != maneuvers_to_choose):
+                # Apply maneuvers
+                c[cfg["known"]] = current_maneuvers + selected_maneuvers
+                c[cfg["pending"]] = 0
+
+                # Re-apply maneuver actions
+                add_level1_class_resources_and_actions(c)
+
+                st.toast(f"✅ Learned {len(selected_maneuvers)} {cfg['noun']}!")
+                st.rerun()
+        else:
+            st.caption(cfg["none_left"])
+
+@st.fragment
+def _render_party_member(i):
+    """Running-session card for party member i; a fragment, so edits rerun only this card."""
+    party = st.session_state.party
+    if i >= len(party):
+        return
+    c = party[i]
+    keys = _card_keys("p", i)
+    box = st.container(border=True)
+    t1, t2, t3, t4, t5 = box.columns([3, 2, 2, 2, 2])
+
+    with t1:
+        st.markdown(f"**{c.get('name','')}**")
+    with t2:
+        c["ac"] = int(
+            st.number_input(
+                "AC", 0, 40, int(c.get("ac", 10)), key=keys["ac"]
+            )
+        )
+    with t3:
+        c["hp"] = int(
+            st.number_input(
+                "HP", 0, 500, int(c.get("hp", 10)), key=keys["hp"]
+            )
+        )
+    with t4:
+        # Position band dropdown (only during combat)
+        if st.session_state.in_combat:
+            current_band = ensure_position_band(c)
+            band_idx = BAND_ORDER.get(current_band, 1)
+            new_band = st.selectbox(
+                "Pos",
+                POSITION_BANDS,
+                index=band_idx,
+                key=keys["band"],
+                format_func=lambda b: get_band_display(b)
+            )
+            c["position_band"] = new_band
+        else:
+            st.caption("—")
+    with t5:
+        if st.button("Remove", key=keys["rm"]):
+            del party[i]
+            st.rerun()
+
+    # Is this the active turn PC?
+    is_active_pc = False
+    if st.session_state.in_combat:
+        ent = current_turn()
+        if ent and ent.get("kind") == "party" and ent.get("idx") == i:
+            is_active_pc = True
+
+    # --- Attacks panel for this party member ---
+    with box.expander("Attacks"):
+        attacks = c.get("attacks") or []
+        if not attacks:
+            st.caption("No attacks listed.")
+        else:
+            for a in attacks:
+                # Use helper functions for consistent field access
+                name = a.get("name", "Attack")
+                to_hit = get_attack_to_hit(a)
+                dmg = get_attack_damage(a)
+                dmg_type = get_attack_damage_type(a)
+                if dmg_type:
+                    st.write(f"{name}: +{to_hit} to hit, {dmg} {dmg_type}")
+                else:
+                    st.write(f"{name}: +{to_hit} to hit, {dmg}")
+
+        if st.session_state.in_combat and not is_active_pc:
+            st.caption("Waiting for this character's turn.")
+
+    # --- Conditions panel for this party member ---
+    with box.expander("Conditions"):
+        conditions = ensure_conditions(c)
+
+        if not conditions:
+            st.caption("No active conditions.")
+        else:
+            for ci, cond in enumerate(conditions):
+                cond_col1, cond_col2 = st.columns([4, 1])
+                with cond_col1:
+                    st.write(get_condition_display(cond))
+                with cond_col2:
+                    if st.button("✖", key=f"rm_cond_p_{i}_{ci}"):
+                        conditions.pop(ci)
+                        st.rerun()
+
+        # Add condition form
+        st.markdown("**Add Condition**")
+        cond_options = get_condition_options()
+
+        add_cond_col1, add_cond_col2 = st.columns([2, 1])
+        with add_cond_col1:
+            selected_cond = st.selectbox(
+                "Condition",
+                cond_options,
+                key=keys["cond_sel"],
+                label_visibility="collapsed"
+            )
+        with add_cond_col2:
+            cond_duration = st.number_input(
+                "Rounds",
+                min_value=0,
+                value=0,
+                key=keys["cond_dur"],
+                help="0 = indefinite"
+            )
+
+        if selected_cond == "(Custom)":
+            custom_cond_name = st.text_input(
+                "Custom Condition Name",
+                key=keys["cond_custom"]
+            )
+        else:
+            custom_cond_name = None
+
+        if st.button("Add Condition", key=f"add_cond_btn_p_{i}"):
+            cond_name = custom_cond_name if selected_cond == "(Custom)" else selected_cond
+            if cond_name:
+                dur = cond_duration if cond_duration > 0 else None
+                add_condition(c, cond_name, duration_rounds=dur)
+                st.toast(f"Added {cond_name} to {c.get('name', 'character')}")
+                st.rerun()
+            else:
+                st.warning("Please enter a condition name.")
+
+    # --- Actions & Resources ---
+    with box.expander("Actions & Resources"):
+        char_name = c.get("name", "")
+        resources = c.get("resources") or _EMPTY
+        if resources:
+            st.markdown("**Resources**")
+            for rname, rdata in resources.items():
+                rc1, rc2, rc3 = st.columns([3, 2, 2])
+                current = int(rdata.get("current", 0))
+                max_val = int(rdata.get("max", 0))
+
+                with rc1:
+                    st.markdown(f"{rname}: **{current} / {max_val}**")
+                with rc2:
+                    if st.button(
+                        f"Use {rname}", key=f"use_res_{i}_{rname}"
+                    ):
+                        if current > 0:
+                            current -= 1
+                            rdata["current"] = current
+                            st.toast(
+                                f"{char_name} uses {rname}! "
+                                f"({current}/{max_val} left)"
+                            )
+                        else:
+                            st.warning(
+                                f"{char_name} has no {rname} uses left."
+                            )
+                with rc3:
+                    if st.button(
+                        "Reset", key=f"reset_res_{i}_{rname}"
+                    ):
+                        rdata["current"] = max_val
+                        st.toast(
+                            f"{rname} reset to full for {char_name}."
                         )
+
+        actions = c.get("actions", []) or []
+        if actions:
+            st.markdown("**Actions**")
+            for action_idx, a in enumerate(actions):
+                action_name = a.get('name', 'Unnamed')
+                action_resource = a.get("resource")
+
+                # Check if this is a Marshal maneuver (needs targeting)
+                is_marshal_maneuver = action_name.startswith("Marshal:")
+
+                action_col1, action_col2 = st.columns([4, 1])
+
+                with action_col1:
+                    line = f"**{action_name}**"
+                    if action_resource:
+                        line += f" _(uses {action_resource})_"
+                    st.markdown(line)
+                    if a.get("description"):
+                        st.caption(a["description"])
+
+                with action_col2:
+                    # Add Use button for usable actions
+                    if is_marshal_maneuver or action_resource:
+                        if action_resource:
+                            res_data = resources.get(action_resource)
+                            can_use = res_data is not None and res_data.get("current", 0) > 0
+                        else:
+                            can_use = True
+
+                        if st.button("Use", key=f"use_action_{i}_{action_idx}", disabled=not can_use):
+                            # Handle Marshal maneuvers with targeting
+                            if is_marshal_maneuver:
+                                st.session_state[f"marshal_maneuver_active_{i}"] = action_name
+                                _rerun_card()
+                            else:
+                                # Just consume the resource
+                                if action_resource:
+                                    res_data["current"] -= 1
+                                    st.toast(f"{char_name} uses {action_name}!")
+                                    st.rerun()
+
+                # Marshal maneuver targeting UI
+                if st.session_state.get(f"marshal_maneuver_active_{i}") == action_name:
+                    render_maneuver_ui(i, action_idx, action_name)
+
+    # --- XP & Leveling ---
+    with box.expander("📈 XP & Leveling"):
+        # SRD tables used by the level-up wizard and skill allocation below
+        srd_classes = load_srd_classes()
+        srd_by_name = get_srd_class_index()
+        load_srd_skills()  # also fills _skill_names for skill allocation
+        char_abilities = c.get("abilities") or {}
+
+        # Migrate character to ensure XP and multiclass fields exist
+        migrate_character_xp(c)
+        migrate_to_multiclass(c)
+
+        xp_info, current_level, char_classes, class_summary = _xp_bundle(c, i)
+        current_xp = xp_info["current_xp"]
+
+        # ========== CHARACTER SHEET SUMMARY ==========
+        st.markdown("#### 📋 Character Sheet")
+
+        # Main stats row
+        stat_col1, stat_col2, stat_col3 = st.columns(3)
+        with stat_col1:
+            st.metric("Total Level", current_level)
+        with stat_col2:
+            st.metric("XP", f"{current_xp:,}")
+        with stat_col3:
+            st.metric("BAB", f"+{c.get('bab', 0)}")
+
+        # Class breakdown
+        st.markdown(f"**Classes:** {class_summary}")
+        if len(char_classes) > 1:
+            for cls in char_classes:
+                cls_id = cls.get('class_id', '?')
+                cls_lvl = cls.get('level', 0)
+                hit_die = get_hit_die_for_class(cls_id)
+                st.caption(f"  • {cls_id} {cls_lvl} (d{hit_die} hit die)")
+
+        # XP Progress bar
+        if not xp_info["at_max_level"]:
+            st.progress(
+                xp_info["progress_pct"] / 100.0,
+                text=f"{xp_info['xp_needed']:,} XP needed for level {xp_info['next_level']}"
+            )
+        else:
+            st.success("🏆 Maximum Level Reached!")
+
+        # ========== LEVEL UP AVAILABLE INDICATOR ==========
+        if c.get("level_up_pending", False):
+            st.markdown("---")
+            st.markdown("### ⬆️ Level Up Available!")
+            st.info(f"**{c.get('name', 'Character')}** has enough XP to reach level {current_level + 1}!")
+
+            # Initialize level up wizard state
+            wizard_key = f"lvlup_wizard_{i}"
+            if wizard_key not in st.session_state:
+                st.session_state[wizard_key] = {"step": 1, "selected_class": None, "hp_method": None}
+
+            wizard_state = st.session_state[wizard_key]
+
+            # Get available classes; the split option lists are memoized per card
+            # until XP, class levels or ability scores change.
+            lvlup_v = (
+                c.get("xp_current", 0),
+                tuple((cc.get("class_id"), cc.get("level")) for cc in char_classes),
+                json.dumps(char_abilities, sort_keys=True),
+            )
+            lvlup_opts = st.session_state.get(f"lvlup_opts_{i}")
+            if lvlup_opts is None or lvlup_opts["v"] != lvlup_v:
+                all_class_names = [cls.get("name", "") for cls in srd_classes]
+                available_classes = get_available_classes_for_multiclass(c, all_class_names)
+
+                # Separate existing and new classes
+                existing_options = []
+                new_class_options = []
+
+                for cls in available_classes:
+                    cls_id = cls["class_id"]
+                    if not cls_id:
+                        continue
+                    current_cls_level = cls["current_level"]
+
+                    if current_cls_level > 0:
+                        existing_options.append({
+                            "id": cls_id,
+                            "label": f"📈 {cls_id} (Level {current_cls_level} → {current_cls_level + 1})",
+                            "new": False,
+                            "level": current_cls_level
+                        })
+                    elif cls["can_add"]:
+                        new_class_options.append({
+                            "id": cls_id,
+                            "label": f"✨ {cls_id} (NEW - Multiclass into Level 1)",
+                            "new": True,
+                            "level": 0,
+                            "reason": cls["reason"]
+                        })
+
+                # Build combined options list
+                all_options = list(existing_options)
+                option_labels = [opt["label"] for opt in existing_options]
+                if new_class_options:
+                    if existing_options:
+                        option_labels.append("─── Multiclass Options ───")
+                        all_options.append(None)  # Separator
+                    for opt in new_class_options:
+                        all_options.append(opt)
+                        option_labels.append(opt["label"])
+
+                lvlup_opts = {
+                    "v": lvlup_v,
+                    "existing": existing_options,
+                    "new": new_class_options,
+                    "options": all_options,
+                    "labels": option_labels,
+                }
+                st.session_state[f"lvlup_opts_{i}"] = lvlup_opts
+
+            existing_options = lvlup_opts["existing"]
+            new_class_options = lvlup_opts["new"]
+            all_options = lvlup_opts["options"]
+            option_labels = lvlup_opts["labels"]
+
+            # ===== STEP 1: Choose Class =====
+            st.markdown("**Step 1: Choose Class to Level**")
+            if existing_options:
+                st.caption("Continue existing class:")
+
+            if option_labels:
+                selected_idx = st.selectbox(
+                    "Select class",
+                    range(len(option_labels)),
+                    format_func=lambda x: option_labels[x],
+                    key=f"lvlup_class_select_{i}",
+                    label_visibility="collapsed"
+                )
+
+                selected_option = all_options[selected_idx] if selected_idx < len(all_options) else None
+
+                # Skip separator
+                if selected_option is None:
+                    st.warning("Please select a valid class option")
+                else:
+                    selected_class = selected_option["id"]
+                    selected_class_lc = selected_class.lower()
+                    is_new_class = selected_option["new"]
+                    new_class_level = selected_option["level"] + 1
+
+                    # Show class info
+                    hit_die = get_hit_die_for_class(selected_class)
+                    con_mod = _ability_mod(char_abilities.get("CON", 10))
+                    avg_hp = (hit_die // 2) + 1 + con_mod
+
+                    st.markdown("---")
+                    st.markdown(f"**Step 2: HP Increase for {selected_class} Level {new_class_level}**")
+
+                    info_col1, info_col2 = st.columns(2)
+                    with info_col1:
+                        st.caption(f"Hit Die: d{hit_die}")
+                        st.caption(f"CON Modifier: {'+' if con_mod >= 0 else ''}{con_mod}")
+                    with info_col2:
+                        st.caption(f"Average HP: {avg_hp}")
+                        st.caption(f"Roll Range: {max(1, 1 + con_mod)} - {hit_die + con_mod}")
+
+                    # ===== STEP 2: HP Method =====
+                    hp_method = st.radio(
+                        "Choose HP method:",
+                        ["average", "roll"],
+                        format_func=lambda x: f"📊 Take Average ({avg_hp} HP)" if x == "average" else f"🎲 Roll d{hit_die}",
+                        key=f"lvlup_hp_method_{i}",
+                        horizontal=True
                     )
-                with t4:
-                    # Position band dropdown (only during combat)
-                    if st.session_state.in_combat:
-                        current_band = ensure_position_band(c)
-                        band_idx = POSITION_BANDS.index(current_band) if current_band in POSITION_BANDS else 1
-                        new_band = st.selectbox(
-                            "Pos",
-                            POSITION_BANDS,
-                            index=band_idx,
-                            key=f"run_p_band_{i}",
-                            format_func=lambda b: get_band_display(b)
-                        )
-                        c["position_band"] = new_band
-                    else:
-                        st.caption("—")
-                with t5:
-                    if st.button("Remove", key=f"run_p_rm_{i}"):
-                        del st.session_state.party[i]
-                        st.rerun()
 
-                # Is this the active turn PC?
-                is_active_pc = False
-                if st.session_state.in_combat:
-                    ent = current_turn()
-                    if ent and ent.get("kind") == "party" and ent.get("idx") == i:
-                        is_active_pc = True
+                    # ===== STEP 3: Preview Features =====
+                    st.markdown("---")
+                    st.markdown(f"**Step 3: Features at {selected_class} Level {new_class_level}**")
+
+                    # Look up class features for this level
+                    class_data = srd_by_name.get(selected_class_lc)
+
+                    features_at_level = []
+                    level_has_asi = False
+                    if class_data:
+                        levels_data = class_data.get("levels", {})
+                        level_info = levels_data.get(str(new_class_level), {})
+                        features_at_level = level_info.get("features_at_level", [])
+                        level_has_asi = bool(level_info.get("asi_or_feat"))
+
+                        if features_at_level:
+                            for feat in features_at_level:
+                                if isinstance(feat, str):
+                                    st.markdown(f"  • **{feat}**")
+                                elif isinstance(feat, dict):
+                                    st.markdown(f"  • **{feat.get('name', 'Feature')}**")
+                                    if feat.get("description"):
+                                        st.caption(f"    {feat.get('description')}")
+                        else:
+                            st.caption("No new features at this level.")
 
-                # --- Attacks panel for this party member ---
-                with box.expander("Attacks"):
-                    attacks = c.get("attacks") or []
-                    if not attacks:
-                        st.caption("No attacks listed.")
+                        # Show ASI/Feat if applicable
+                        if level_has_asi:
+                            st.markdown(f"  • **Ability Score Improvement or Feat**")
                     else:
-                        for a in attacks:
-                            # Use helper functions for consistent field access
-                            name = a.get("name", "Attack")
-                            to_hit = get_attack_to_hit(a)
-                            dmg = get_attack_damage(a)
-                            dmg_type = get_attack_damage_type(a)
-                            if dmg_type:
-                                st.write(f"{name}: +{to_hit} to hit, {dmg} {dmg_type}")
+                        st.caption("Class data not found.")
+
+                    # If multiclassing, show proficiencies gained
+                    if is_new_class:
+                        st.markdown("---")
+                        st.markdown(f"**Multiclass Proficiencies (from {selected_class}):**")
+                        mc_profs = get_multiclass_proficiencies(selected_class)
+
+                        mc_armor = mc_profs.get("armor")
+                        mc_weapons = mc_profs.get("weapons")
+                        mc_skills = mc_profs.get("skills", 0)
+                        if mc_armor:
+                            st.caption(f"  Armor: {', '.join(mc_armor)}")
+                        if mc_weapons:
+                            st.caption(f"  Weapons: {', '.join(mc_weapons)}")
+                        if mc_skills > 0:
+                            st.caption(f"  Skills: Choose {mc_skills} skill(s)")
+                        if not (mc_armor or mc_weapons or mc_skills):
+                            st.caption("  No additional proficiencies.")
+
+                    # ===== STEP 4: Apply Level Up =====
+                    st.markdown("---")
+                    st.markdown("**Step 4: Apply Level Up**")
+
+                    # Calculate skill points
+                    from src.leveling import get_skill_points_for_level, is_asi_level, get_new_spells_at_level, is_caster_class
+                    int_mod = _ability_mod(char_abilities.get("INT", 10))
+                    skill_points = get_skill_points_for_level(selected_class, int_mod)
+
+                    # Barbarian Illiteracy bonus: +1 skill point while illiterate
+                    if selected_class_lc == "barbarian" and not c.get("is_literate", False):
+                        skill_points += 1
+
+                    # Check for spells
+                    spell_info = get_new_spells_at_level(selected_class, selected_option["level"], new_class_level)
+
+                    # Summary of what will be gained
+                    gains = [
+                        "**Summary of gains:**",
+                        f"  • HP: +{avg_hp if hp_method == 'average' else f'1d{hit_die}+{con_mod}'}",
+                        f"  • Skill Points: +{skill_points}",
+                    ]
+                    if spell_info["new_cantrips"] > 0:
+                        gains.append(f"  • New Cantrips: +{spell_info['new_cantrips']}")
+                    if spell_info["new_spells"] > 0:
+                        gains.append(f"  • New Spells: +{spell_info['new_spells']} (max level {spell_info['max_spell_level']})")
+                    if level_has_asi or is_asi_level(selected_class, new_class_level):
+                        gains.append("  • ASI/Feat: +1 choice")
+                    # One element instead of one per line (markdown hard breaks)
+                    st.caption("  \n".join(gains))
+
+                    apply_col1, apply_col2 = st.columns([3, 1])
+                    with apply_col1:
+                        st.caption(f"This will increase {c.get('name', 'Character')}'s {selected_class} to level {new_class_level}.")
+                    with apply_col2:
+                        if st.button("✅ Apply", key=f"lvlup_apply_{i}", type="primary", use_container_width=True):
+                            roll_hp = (hp_method == "roll")
+                            result = level_up_character_multiclass(c, selected_class, roll_hp=roll_hp)
+
+                            if result["success"]:
+                                # Apply class features
+                                from src.leveling import apply_class_features
+                                if features_at_level:
+                                    apply_class_features(c, features_at_level)
+
+                                # Clear wizard state
+                                st.session_state.pop(wizard_key, None)
+
+                                # Show success message with pending choices
+                                from src.leveling import has_pending_choices, get_pending_summary
+                                pending = has_pending_choices(c)
+                                msg = f"🎉 {c.get('name', 'Character')} is now {get_class_summary(c)}! +{result['hp_gained']} HP"
+                                if pending["any"]:
+                                    msg += f" — {get_pending_summary(c)}"
+                                st.toast(msg)
+
+                                if roll_hp:
+                                    st.balloons()
+
+                                st.rerun()
                             else:
-                                st.write(f"{name}: +{to_hit} to hit, {dmg}")
+                                st.error(result.get("message", "Level up failed"))
+            else:
+                st.error("No classes available for level up. Check multiclass prerequisites.")
 
-                    if st.session_state.in_combat and not is_active_pc:
-                        st.caption("Waiting for this character's turn.")
+        # ========== PENDING CHOICES (Skill Points, Spells, ASI/Feat) ==========
+        from src.leveling import has_pending_choices, apply_skill_ranks, apply_spell_selection, apply_asi, apply_feat, meets_prereqs
+        pending = has_pending_choices(c)
 
-                # --- Conditions panel for this party member ---
-                with box.expander("Conditions"):
-                    conditions = ensure_conditions(c)
-                    
-                    if not conditions:
-                        st.caption("No active conditions.")
-                    else:
-                        for ci, cond in enumerate(conditions):
-                            cond_col1, cond_col2 = st.columns([4, 1])
-                            with cond_col1:
-                                st.write(get_condition_display(cond))
-                            with cond_col2:
-                                if st.button("✖", key=f"rm_cond_p_{i}_{ci}"):
-                                    conditions.pop(ci)
-                                    st.rerun()
-                    
-                    # Add condition form
-                    st.markdown("**Add Condition**")
-                    srd_cond_names = get_srd_condition_names()
-                    cond_options = srd_cond_names + ["(Custom)"]
-                    
-                    add_cond_col1, add_cond_col2 = st.columns([2, 1])
-                    with add_cond_col1:
-                        selected_cond = st.selectbox(
-                            "Condition",
-                            cond_options,
-                            key=f"add_cond_sel_p_{i}",
-                            label_visibility="collapsed"
-                        )
-                    with add_cond_col2:
-                        cond_duration = st.number_input(
-                            "Rounds",
-                            min_value=0,
-                            value=0,
-                            key=f"add_cond_dur_p_{i}",
-                            help="0 = indefinite"
-                        )
-                    
-                    if selected_cond == "(Custom)":
-                        custom_cond_name = st.text_input(
-                            "Custom Condition Name",
-                            key=f"add_cond_custom_p_{i}"
+        if pending["any"]:
+            st.markdown("---")
+            st.markdown("### 📋 Pending Level-Up Choices")
+
+            # SRD feats shared by the sections below (session-cached loader, bound once)
+            feats = load_srd_feats() if (pending["asi_or_feat"] or pending.get("fighting_style") or pending.get("bonus_feat")) else []
+
+            # ===== BARBARIAN ILLITERACY =====
+            # Barbarians can spend 2 skill points to become literate
+            if c.get("class", "").lower() == "barbarian" and not c.get("is_literate", False):
+                skill_points_for_literacy = c.get("pending_skill_points", 0)
+                if skill_points_for_literacy >= 2:
+                    with st.expander("📖 Learn to Read & Write (Barbarian)", expanded=False):
+                        st.info(
+                            "As a Barbarian, you are illiterate by default. "
+                            "You can spend **2 skill points** to learn to read and write. "
+                            "While illiterate, you gain +1 skill point per level."
                         )
-                    else:
-                        custom_cond_name = None
-                    
-                    if st.button("Add Condition", key=f"add_cond_btn_p_{i}"):
-                        cond_name = custom_cond_name if selected_cond == "(Custom)" else selected_cond
-                        if cond_name:
-                            dur = cond_duration if cond_duration > 0 else None
-                            add_condition(c, cond_name, duration_rounds=dur)
-                            st.toast(f"Added {cond_name} to {c.get('name', 'character')}")
+                        if st.button("Spend 2 Skill Points to Become Literate", key=f"literacy_{i}"):
+                            c["is_literate"] = True
+                            c["pending_skill_points"] = skill_points_for_literacy - 2
+                            # Remove the bonus skill point feature
+                            c.pop("illiteracy_skill_bonus", None)
+                            # Update features
+                            features = c.get("features", [])
+                            # Remove old illiteracy feature and add new one
+                            new_features = [f for f in features if ILLITERACY not in f]
+                            new_features.append(ILLITERACY_REMOVED)
+                            c["features"] = new_features
+                            add_level1_class_resources_and_actions(c)
+                            st.toast("📖 You have learned to read and write!")
                             st.rerun()
+
+            # ===== SKILL POINTS =====
+            if pending["skill_points"]:
+                skill_points_available = c.get("pending_skill_points", 0)
+                with st.expander(f"🎯 Skill Points ({skill_points_available} to allocate)", expanded=True):
+
+                    # Get class skills
+                    char_classes = c.get("classes", [{"class_id": c.get("class", "fighter"), "level": c.get("level", 1)}])
+                    class_skills = set(chain.from_iterable(
+                        srd_by_name[cid].get("skill_list", [])
+                        for cid in (cc.get("class_id", "").lower() for cc in char_classes)
+                        if cid in srd_by_name
+                    ))
+
+                    # All skills from SRD (names built once per load), split into class / cross-class
+                    all_skills = frozenset(st.session_state.get("_skill_names", ()))
+                    class_skill_names = tuple(sorted(class_skills & all_skills))
+                    cross_class = tuple(sorted(all_skills - class_skills))
+
+                    # Current skill ranks
+                    current_skills = c.get("skills", {})
+                    max_ranks = c.get("level", 1) + 3  # Max ranks = level + 3
+
+                    # Skill allocation UI
+                    skill_alloc_key = f"skill_alloc_{i}"
+                    if skill_alloc_key not in st.session_state:
+                        st.session_state[skill_alloc_key] = {}
+
+                    alloc = st.session_state[skill_alloc_key]
+                    total_allocated = sum(alloc.values())
+                    remaining = skill_points_available - total_allocated
+
+                    st.caption(f"Points remaining: **{remaining}** / {skill_points_available}")
+                    st.caption(f"Max ranks per skill: {max_ranks}")
+
+                    # Show class skills first, then others; one form so rank edits
+                    # only rerun on submit (caps use the last submitted allocation)
+                    room = max(remaining, 0)
+                    with st.form(f"pending_skills_form_{i}"):
+                        st.markdown("**Class Skills:**")
+                        skill_cols = st.columns(3)
+                        col_idx = 0
+                        for skill in class_skill_names:
+                            current = current_skills.get(skill, 0)
+                            adding = alloc.get(skill, 0)
+                            with skill_cols[col_idx % 3]:
+                                new_val = st.number_input(
+                                    f"{skill} ({current}+)",
+                                    min_value=0,
+                                    max_value=min(room + adding, max_ranks - current),
+                                    value=adding,
+                                    key=f"skill_{i}_{skill}",
+                                    help=f"Current: {current}, Max: {max_ranks}"
+                                )
+                                alloc[skill] = new_val
+                            col_idx += 1
+
+                        # Cross-class skills (cost 2 points per rank)
+                        with st.expander("Cross-Class Skills (2 points per rank)"):
+                            skill_cols2 = st.columns(3)
+                            col_idx2 = 0
+                            for skill in cross_class:
+                                current = current_skills.get(skill, 0)
+                                adding = alloc.get(skill, 0) // 2  # stored as cost, shown as ranks
+                                with skill_cols2[col_idx2 % 3]:
+                                    new_val = st.number_input(
+                                        f"{skill} ({current}+)",
+                                        min_value=0,
+                                        max_value=min(room // 2 + adding, (max_ranks // 2) - current),
+                                        value=adding,
+                                        key=f"skill_cc_{i}_{skill}",
+                                        help=f"Current: {current}, Max: {max_ranks // 2} (cross-class)"
+                                    )
+                                    alloc[skill] = new_val * 2  # Double cost for cross-class
+                                col_idx2 += 1
+
+                        # Recalculate total
+                        total_allocated = sum(alloc.values())
+                        remaining = skill_points_available - total_allocated
+
+                        apply_points = st.form_submit_button("Apply Skill Points", type="primary")
+
+                    if apply_points:
+                        if total_allocated == 0:
+                            st.warning("Allocate at least one skill point first.")
+                        elif total_allocated > skill_points_available:
+                            st.error("Too many points allocated; reduce some ranks before applying.")
                         else:
-                            st.warning("Please enter a condition name.")
-
-                # --- Actions & Resources ---
-                with box.expander("Actions & Resources"):
-                    resources = c.get("resources", {}) or {}
-                    if resources:
-                        st.markdown("**Resources**")
-                        for rname, rdata in resources.items():
-                            rc1, rc2, rc3 = st.columns([3, 2, 2])
-                            current = int(rdata.get("current", 0))
-                            max_val = int(rdata.get("max", 0))
-
-                            with rc1:
-                                st.markdown(f"{rname}: **{current} / {max_val}**")
-                            with rc2:
-                                if st.button(
-                                    f"Use {rname}", key=f"use_res_{i}_{rname}"
-                                ):
-                                    if current > 0:
-                                        current -= 1
-                                        st.session_state.party[i].setdefault(
-                                            "resources", {}
-                                        )[rname]["current"] = current
-                                        st.toast(
-                                            f"{c.get('name','')} uses {rname}! "
-                                            f"({current}/{max_val} left)"
-                                        )
+                            # Convert allocation to actual ranks (cross-class already doubled in cost)
+                            actual_ranks = {}
+                            for skill, cost in alloc.items():
+                                if cost > 0:
+                                    if skill in class_skills:
+                                        actual_ranks[skill] = cost
                                     else:
-                                        st.warning(
-                                            f"{c.get('name','')} has no {rname} uses left."
-                                        )
-                            with rc3:
-                                if st.button(
-                                    "Reset", key=f"reset_res_{i}_{rname}"
-                                ):
-                                    st.session_state.party[i].setdefault(
-                                        "resources", {}
-                                    )[rname]["current"] = max_val
-                                    st.toast(
-                                        f"{rname} reset to full for {c.get('name','')}."
-                                    )
+                                        actual_ranks[skill] = cost // 2  # Cross-class gives half ranks
 
-                    actions = c.get("actions", []) or []
-                    if actions:
-                        st.markdown("**Actions**")
-                        for action_idx, a in enumerate(actions):
-                            action_name = a.get('name', 'Unnamed')
-                            action_resource = a.get("resource")
-                            
-                            # Check if this is a Marshal maneuver (needs targeting)
-                            is_marshal_maneuver = action_name.startswith("Marshal:")
-                            
-                            action_col1, action_col2 = st.columns([4, 1])
-                            
-                            with action_col1:
-                                line = f"**{action_name}**"
-                                if action_resource:
-                                    line += f" _(uses {action_resource})_"
-                                st.markdown(line)
-                                if a.get("description"):
-                                    st.caption(a["description"])
-                            
-                            with action_col2:
-                                # Add Use button for usable actions
-                                if is_marshal_maneuver or action_resource:
-                                    can_use = True
-                                    if action_resource:
-                                        res_data = c.get("resources", {}).get(action_resource, {})
-                                        can_use = res_data.get("current", 0) > 0
-                                    
-                                    if st.button("Use", key=f"use_action_{i}_{action_idx}", disabled=not can_use):
-                                        # Handle Marshal maneuvers with targeting
-                                        if is_marshal_maneuver:
-                                            st.session_state[f"marshal_maneuver_active_{i}"] = action_name
-                                            st.rerun()
-                                        else:
-                                            # Just consume the resource
-                                            if action_resource:
-                                                c.setdefault("resources", {}).setdefault(action_resource, {})["current"] -= 1
-                                                st.toast(f"{c.get('name', '')} uses {action_name}!")
-                                                st.rerun()
-                            
-                            # Marshal maneuver targeting UI
-                            if st.session_state.get(f"marshal_maneuver_active_{i}") == action_name:
-                                with st.container(border=True):
-                                    st.markdown(f"**🎯 Target Selection for {action_name}**")
-                                    
-                                    # Get allies in range (all party members for now)
-                                    aura_range = c.get("aura_range", 30)
-                                    allies = [p.get("name", f"Ally {j}") for j, p in enumerate(st.session_state.get("party", [])) if j != i]
-                                    
-                                    maneuver_key = action_name.replace("Marshal: ", "")
-                                    maneuver_data = MARSHAL_MANEUVERS.get(maneuver_key, {})
-                                    
-                                    # Different targeting based on maneuver type
-                                    if "Allies" in maneuver_data.get("description", "") or "allies" in maneuver_data.get("description", "").lower():
-                                        # Affects all allies - no selection needed
-                                        st.info(f"This affects all allies within {aura_range} ft.")
-                                        target_allies = allies
+                            result = apply_skill_ranks(c, actual_ranks)
+                            if result["success"]:
+                                st.session_state[skill_alloc_key] = {}
+                                st.toast(f"✅ Allocated {result['allocated']} skill points!")
+                                st.rerun()
+                            else:
+                                st.error(result["message"])
+
+            # ===== CANTRIPS =====
+            if pending["cantrips"]:
+                cantrips_available = c.get("pending_cantrips", 0)
+                with st.expander(f"✨ Cantrips ({cantrips_available} to choose)", expanded=True, key=f"pending_exp_cantrips_{i}", on_change="rerun") as section:
+                    if section.open:  # skip the SRD filtering while collapsed
+
+                        # Get class spell list
+                        char_classes = c.get("classes", [{"class_id": c.get("class", "wizard"), "level": 1}])
+                        spell_classes = tuple(sorted({cc.get("class_id", "").lower() for cc in char_classes}))
+
+                        # Class cantrips (memoized per class set)
+                        class_cantrips = _class_spell_names(spell_classes)[0]
+
+                        # Already known cantrips
+                        known_cantrips = set(c.get("spells", {}).get("cantrips", []))
+                        available_cantrips = [ct for ct in class_cantrips if ct not in known_cantrips]
+
+                        if available_cantrips:
+                            with st.form(f"pending_cantrips_form_{i}"):
+                                selected_cantrips = st.multiselect(
+                                    f"Choose {cantrips_available} cantrip(s):",
+                                    available_cantrips,
+                                    max_selections=cantrips_available,
+                                    key=f"cantrip_select_{i}"
+                                )
+                                learn_cantrips = st.form_submit_button("Learn Cantrips")
+
+                            if learn_cantrips:
+                                if not selected_cantrips:
+                                    st.warning("Choose at least one cantrip first.")
+                                else:
+                                    result = apply_spell_selection(c, "cantrip", selected_cantrips)
+                                    if result["success"]:
+                                        st.toast(f"✅ Learned {len(selected_cantrips)} cantrip(s)!")
+                                        st.rerun()
                                     else:
-                                        # Single target selection
-                                        target_allies = st.multiselect(
-                                            "Select target(s):",
-                                            allies,
-                                            key=f"marshal_targets_{i}_{action_idx}"
-                                        )
-                                    
-                                    col_apply, col_cancel = st.columns(2)
-                                    with col_apply:
-                                        if st.button("✅ Apply", key=f"apply_marshal_{i}_{action_idx}"):
-                                            # Consume Martial Die
-                                            c.setdefault("resources", {}).setdefault("Martial Dice", {})["current"] = max(0, c.get("resources", {}).get("Martial Dice", {}).get("current", 0) - 1)
-                                            
-                                            # Roll the martial die
-                                            die_size = c.get("marshal_die_size", "d6")
-                                            die_value = int(die_size[1:])
-                                            roll = random.randint(1, die_value)
-                                            
-                                            # Apply effect based on maneuver
-                                            effect_msg = f"{c.get('name', '')} uses {action_name}! Rolled {roll} on {die_size}."
-                                            
-                                            if "temp HP" in maneuver_data.get("description", ""):
-                                                cha_mod = (c.get("abilities", {}).get("CHA", 10) - 10) // 2
-                                                temp_hp = cha_mod + roll
-                                                effect_msg += f" Allies gain {temp_hp} temp HP."
-                                                # Apply temp HP to targets
-                                                for ally_name in target_allies:
-                                                    for p in st.session_state.get("party", []):
-                                                        if p.get("name") == ally_name:
-                                                            p["temp_hp"] = p.get("temp_hp", 0) + temp_hp
-                                            
-                                            elif "move" in maneuver_data.get("description", "").lower():
-                                                effect_msg += f" Allies can move up to 10 ft without provoking."
-                                            
-                                            elif "AC" in maneuver_data.get("description", ""):
-                                                effect_msg += f" Target gains +{roll} AC until next turn."
-                                            
-                                            st.toast(effect_msg)
-                                            del st.session_state[f"marshal_maneuver_active_{i}"]
-                                            st.rerun()
-                                    
-                                    with col_cancel:
-                                        if st.button("❌ Cancel", key=f"cancel_marshal_{i}_{action_idx}"):
-                                            del st.session_state[f"marshal_maneuver_active_{i}"]
-                                            st.rerun()
-
-                # --- XP & Leveling ---
-                with box.expander("📈 XP & Leveling"):
-                    # Migrate character to ensure XP and multiclass fields exist
-                    migrate_character_xp(c)
-                    migrate_to_multiclass(c)
-                    
-                    xp_info = get_xp_progress(c)
-                    current_xp = xp_info["current_xp"]
-                    current_level = get_total_level(c)
-                    char_classes = get_classes(c)
-                    class_summary = get_class_summary(c)
-                    
-                    # ========== CHARACTER SHEET SUMMARY ==========
-                    st.markdown("#### 📋 Character Sheet")
-                    
-                    # Main stats row
-                    stat_col1, stat_col2, stat_col3 = st.columns(3)
-                    with stat_col1:
-                        st.metric("Total Level", current_level)
-                    with stat_col2:
-                        st.metric("XP", f"{current_xp:,}")
-                    with stat_col3:
-                        st.metric("BAB", f"+{c.get('bab', 0)}")
-                    
-                    # Class breakdown
-                    st.markdown(f"**Classes:** {class_summary}")
-                    if len(char_classes) > 1:
-                        for cls in char_classes:
-                            cls_id = cls.get('class_id', '?')
-                            cls_lvl = cls.get('level', 0)
-                            hit_die = get_hit_die_for_class(cls_id)
-                            st.caption(f"  • {cls_id} {cls_lvl} (d{hit_die} hit die)")
-                    
-                    # XP Progress bar
-                    if not xp_info["at_max_level"]:
-                        st.progress(
-                            xp_info["progress_pct"] / 100.0,
-                            text=f"{xp_info['xp_needed']:,} XP needed for level {xp_info['next_level']}"
-                        )
-                    else:
-                        st.success("🏆 Maximum Level Reached!")
-                    
-                    # ========== LEVEL UP AVAILABLE INDICATOR ==========
-                    if c.get("level_up_pending", False):
-                        st.markdown("---")
-                        st.markdown("### ⬆️ Level Up Available!")
-                        st.info(f"**{c.get('name', 'Character')}** has enough XP to reach level {current_level + 1}!")
-                        
-                        # Initialize level up wizard state
-                        wizard_key = f"lvlup_wizard_{i}"
-                        if wizard_key not in st.session_state:
-                            st.session_state[wizard_key] = {"step": 1, "selected_class": None, "hp_method": None}
-                        
-                        wizard_state = st.session_state[wizard_key]
-                        
-                        # Get available classes
-                        all_class_names = [cls.get("name", "") for cls in load_srd_classes()]
-                        available_classes = get_available_classes_for_multiclass(c, all_class_names)
-                        
-                        # Separate existing and new classes
-                        existing_options = []
-                        new_class_options = []
-                        
-                        for cls in available_classes:
-                            cls_id = cls["class_id"]
-                            if not cls_id:
-                                continue
-                            current_cls_level = cls["current_level"]
-                            
-                            if current_cls_level > 0:
-                                existing_options.append({
-                                    "id": cls_id,
-                                    "label": f"📈 {cls_id} (Level {current_cls_level} → {current_cls_level + 1})",
-                                    "new": False,
-                                    "level": current_cls_level
-                                })
-                            elif cls["can_add"]:
-                                new_class_options.append({
-                                    "id": cls_id,
-                                    "label": f"✨ {cls_id} (NEW - Multiclass into Level 1)",
-                                    "new": True,
-                                    "level": 0,
-                                    "reason": cls["reason"]
-                                })
-                        
-                        # ===== STEP 1: Choose Class =====
-                        st.markdown("**Step 1: Choose Class to Level**")
-                        
-                        # Build combined options list
-                        all_options = []
-                        option_labels = []
-                        
-                        if existing_options:
-                            st.caption("Continue existing class:")
-                            for opt in existing_options:
-                                all_options.append(opt)
-                                option_labels.append(opt["label"])
-                        
-                        if new_class_options:
-                            if existing_options:
-                                option_labels.append("─── Multiclass Options ───")
-                                all_options.append(None)  # Separator
-                            for opt in new_class_options:
-                                all_options.append(opt)
-                                option_labels.append(opt["label"])
-                        
-                        if option_labels:
-                            selected_idx = st.selectbox(
-                                "Select class",
-                                range(len(option_labels)),
-                                format_func=lambda x: option_labels[x],
-                                key=f"lvlup_class_select_{i}",
-                                label_visibility="collapsed"
-                            )
-                            
-                            selected_option = all_options[selected_idx] if selected_idx < len(all_options) else None
-                            
-                            # Skip separator
-                            if selected_option is None:
-                                st.warning("Please select a valid class option")
-                            else:
-                                selected_class = selected_option["id"]
-                                is_new_class = selected_option["new"]
-                                new_class_level = selected_option["level"] + 1
-                                
-                                # Show class info
-                                hit_die = get_hit_die_for_class(selected_class)
-                                con_mod = (c.get("abilities", {}).get("CON", 10) - 10) // 2
-                                avg_hp = (hit_die // 2) + 1 + con_mod
-                                
-                                st.markdown("---")
-                                st.markdown(f"**Step 2: HP Increase for {selected_class} Level {new_class_level}**")
-                                
-                                info_col1, info_col2 = st.columns(2)
-                                with info_col1:
-                                    st.caption(f"Hit Die: d{hit_die}")
-                                    st.caption(f"CON Modifier: {'+' if con_mod >= 0 else ''}{con_mod}")
-                                with info_col2:
-                                    st.caption(f"Average HP: {avg_hp}")
-                                    st.caption(f"Roll Range: {max(1, 1 + con_mod)} - {hit_die + con_mod}")
-                                
-                                # ===== STEP 2: HP Method =====
-                                hp_method = st.radio(
-                                    "Choose HP method:",
-                                    ["average", "roll"],
-                                    format_func=lambda x: f"📊 Take Average ({avg_hp} HP)" if x == "average" else f"🎲 Roll d{hit_die}",
-                                    key=f"lvlup_hp_method_{i}",
-                                    horizontal=True
+                                        st.error(result["message"])
+                        else:
+                            st.caption("No more cantrips available to learn.")
+
+            # ===== SPELLS =====
+            if pending["spells"]:
+                spells_available = c.get("pending_spells", 0)
+                with st.expander(f"📖 Spells ({spells_available} to choose)", expanded=True, key=f"pending_exp_spells_{i}", on_change="rerun") as section:
+                    if section.open:  # skip the SRD filtering while collapsed
+                        max_spell_level = c.get("max_spell_level", 1)
+
+                        # Get class spell list
+                        char_classes = c.get("classes", [{"class_id": c.get("class", "wizard"), "level": 1}])
+                        spell_classes = tuple(sorted({cc.get("class_id", "").lower() for cc in char_classes}))
+
+                        # Class spells of appropriate level (memoized per class set and level)
+                        class_spells = _class_spell_names(spell_classes, max_spell_level)[1]
+
+                        # Already known spells
+                        known_spells = set(c.get("spells", {}).get("known", []))
+                        available_spells = [sp for sp in class_spells if sp not in known_spells]
+
+                        if available_spells:
+                            st.caption(f"Max spell level: {max_spell_level}")
+                            with st.form(f"pending_spells_form_{i}"):
+                                selected_spells = st.multiselect(
+                                    f"Choose {spells_available} spell(s):",
+                                    available_spells,
+                                    max_selections=spells_available,
+                                    key=f"spell_select_{i}"
                                 )
-                                
-                                # ===== STEP 3: Preview Features =====
-                                st.markdown("---")
-                                st.markdown(f"**Step 3: Features at {selected_class} Level {new_class_level}**")
-                                
-                                # Look up class features for this level
-                                srd_classes = load_srd_classes()
-                                class_data = next((cls for cls in srd_classes if cls.get("name", "").lower() == selected_class.lower()), None)
-                                
-                                features_at_level = []
-                                level_has_asi = False
-                                if class_data:
-                                    levels_data = class_data.get("levels", {})
-                                    level_info = levels_data.get(str(new_class_level), {})
-                                    features_at_level = level_info.get("features_at_level", [])
-                                    level_has_asi = bool(level_info.get("asi_or_feat"))
-                                    
-                                    if features_at_level:
-                                        for feat in features_at_level:
-                                            if isinstance(feat, str):
-                                                st.markdown(f"  • **{feat}**")
-                                            elif isinstance(feat, dict):
-                                                st.markdown(f"  • **{feat.get('name', 'Feature')}**")
-                                                if feat.get("description"):
-                                                    st.caption(f"    {feat.get('description')}")
-                                    else:
-                                        st.caption("No new features at this level.")
-                                    
-                                    # Show ASI/Feat if applicable
-                                    if level_has_asi:
-                                        st.markdown(f"  • **Ability Score Improvement or Feat**")
+                                learn_spells = st.form_submit_button("Learn Spells")
+
+                            if learn_spells:
+                                if not selected_spells:
+                                    st.warning("Choose at least one spell first.")
                                 else:
-                                    st.caption("Class data not found.")
-                                
-                                # If multiclassing, show proficiencies gained
-                                if is_new_class:
-                                    st.markdown("---")
-                                    st.markdown(f"**Multiclass Proficiencies (from {selected_class}):**")
-                                    mc_profs = get_multiclass_proficiencies(selected_class)
-                                    
-                                    if mc_profs.get("armor"):
-                                        st.caption(f"  Armor: {', '.join(mc_profs['armor'])}")
-                                    if mc_profs.get("weapons"):
-                                        st.caption(f"  Weapons: {', '.join(mc_profs['weapons'])}")
-                                    if mc_profs.get("skills", 0) > 0:
-                                        st.caption(f"  Skills: Choose {mc_profs['skills']} skill(s)")
-                                    if not any([mc_profs.get("armor"), mc_profs.get("weapons"), mc_profs.get("skills", 0)]):
-                                        st.caption("  No additional proficiencies.")
-                                
-                                # ===== STEP 4: Apply Level Up =====
-                                st.markdown("---")
-                                st.markdown("**Step 4: Apply Level Up**")
-                                
-                                # Calculate skill points
-                                from src.leveling import get_skill_points_for_level, is_asi_level, get_new_spells_at_level, is_caster_class
-                                int_mod = (c.get("abilities", {}).get("INT", 10) - 10) // 2
-                                skill_points = get_skill_points_for_level(selected_class, int_mod)
-                                
-                                # Barbarian Illiteracy bonus: +1 skill point while illiterate
-                                if selected_class.lower() == "barbarian" and not c.get("is_literate", False):
-                                    skill_points += 1
-                                
-                                # Check for spells
-                                spell_info = get_new_spells_at_level(selected_class, selected_option["level"], new_class_level)
-                                
-                                # Summary of what will be gained
-                                st.caption(f"**Summary of gains:**")
-                                st.caption(f"  • HP: +{avg_hp if hp_method == 'average' else f'1d{hit_die}+{con_mod}'}")
-                                st.caption(f"  • Skill Points: +{skill_points}")
-                                
-                                if spell_info["new_cantrips"] > 0:
-                                    st.caption(f"  • New Cantrips: +{spell_info['new_cantrips']}")
-                                if spell_info["new_spells"] > 0:
-                                    st.caption(f"  • New Spells: +{spell_info['new_spells']} (max level {spell_info['max_spell_level']})")
-                                if level_has_asi or is_asi_level(selected_class, new_class_level):
-                                    st.caption(f"  • ASI/Feat: +1 choice")
-                                
-                                apply_col1, apply_col2 = st.columns([3, 1])
-                                with apply_col1:
-                                    st.caption(f"This will increase {c.get('name', 'Character')}'s {selected_class} to level {new_class_level}.")
-                                with apply_col2:
-                                    if st.button("✅ Apply", key=f"lvlup_apply_{i}", type="primary", use_container_width=True):
-                                        roll_hp = (hp_method == "roll")
-                                        result = level_up_character_multiclass(c, selected_class, roll_hp=roll_hp)
-                                        
-                                        if result["success"]:
-                                            # Apply class features
-                                            from src.leveling import apply_class_features
-                                            if features_at_level:
-                                                apply_class_features(c, features_at_level)
-                                            
-                                            # Clear wizard state
-                                            if wizard_key in st.session_state:
-                                                del st.session_state[wizard_key]
-                                            
-                                            # Show success message with pending choices
-                                            from src.leveling import has_pending_choices, get_pending_summary
-                                            pending = has_pending_choices(c)
-                                            msg = f"🎉 {c.get('name', 'Character')} is now {get_class_summary(c)}! +{result['hp_gained']} HP"
-                                            if pending["any"]:
-                                                msg += f" — {get_pending_summary(c)}"
-                                            st.toast(msg)
-                                            
-                                            if roll_hp:
-                                                st.balloons()
-                                            
-                                            st.rerun()
-                                        else:
-                                            st.error(result.get("message", "Level up failed"))
-                        else:
-                            st.error("No classes available for level up. Check multiclass prerequisites.")
-                    
-                    # ========== PENDING CHOICES (Skill Points, Spells, ASI/Feat) ==========
-                    from src.leveling import has_pending_choices, apply_skill_ranks, apply_spell_selection, apply_asi, apply_feat
-                    pending = has_pending_choices(c)
-                    
-                    if pending["any"]:
-                        st.markdown("---")
-                        st.markdown("### 📋 Pending Level-Up Choices")
-                        
-                        # ===== BARBARIAN ILLITERACY =====
-                        # Barbarians can spend 2 skill points to become literate
-                        if c.get("class", "").lower() == "barbarian" and not c.get("is_literate", False):
-                            skill_points_for_literacy = c.get("pending_skill_points", 0)
-                            if skill_points_for_literacy >= 2:
-                                with st.expander("📖 Learn to Read & Write (Barbarian)", expanded=False):
-                                    st.info(
-                                        "As a Barbarian, you are illiterate by default. "
-                                        "You can spend **2 skill points** to learn to read and write. "
-                                        "While illiterate, you gain +1 skill point per level."
-                                    )
-                                    if st.button("Spend 2 Skill Points to Become Literate", key=f"literacy_{i}"):
-                                        c["is_literate"] = True
-                                        c["pending_skill_points"] = skill_points_for_literacy - 2
-                                        # Remove the bonus skill point feature
-                                        c.pop("illiteracy_skill_bonus", None)
-                                        # Update features
-                                        features = c.get("features", [])
-                                        # Remove old illiteracy feature and add new one
-                                        c["features"] = [f for f in features if "Illiteracy" not in f]
-                                        c["features"].append("Illiteracy (Removed): You spent 2 skill points to learn to read and write.")
-                                        st.toast("📖 You have learned to read and write!")
-                                        st.rerun()
-                        
-                        # ===== SKILL POINTS =====
-                        if pending["skill_points"]:
-                            with st.expander(f"🎯 Skill Points ({c.get('pending_skill_points', 0)} to allocate)", expanded=True):
-                                skill_points_available = c.get("pending_skill_points", 0)
-                                
-                                # Get class skills
-                                srd_classes = load_srd_classes()
-                                char_classes = c.get("classes", [{"class_id": c.get("class", "fighter"), "level": c.get("level", 1)}])
-                                class_skills = set()
-                                for cc in char_classes:
-                                    cls_data = next((cls for cls in srd_classes if cls.get("name", "").lower() == cc.get("class_id", "").lower()), None)
-                                    if cls_data:
-                                        class_skills.update(cls_data.get("skill_list", []))
-                                
-                                # All skills from SRD
-                                all_skills = [s.get("name", "") for s in load_srd_skills()]
-                                
-                                # Current skill ranks
-                                current_skills = c.get("skills", {})
-                                max_ranks = c.get("level", 1) + 3  # Max ranks = level + 3
-                                
-                                # Skill allocation UI
-                                skill_alloc_key = f"skill_alloc_{i}"
-                                if skill_alloc_key not in st.session_state:
-                                    st.session_state[skill_alloc_key] = {}
-                                
-                                alloc = st.session_state[skill_alloc_key]
-                                total_allocated = sum(alloc.values())
-                                remaining = skill_points_available - total_allocated
-                                
-                                st.caption(f"Points remaining: **{remaining}** / {skill_points_available}")
-                                st.caption(f"Max ranks per skill: {max_ranks}")
-                                
-                                # Show class skills first, then others
-                                st.markdown("**Class Skills:**")
-                                skill_cols = st.columns(3)
-                                col_idx = 0
-                                for skill in sorted(class_skills):
-                                    if skill in all_skills:
-                                        current = current_skills.get(skill, 0)
-                                        adding = alloc.get(skill, 0)
-                                        with skill_cols[col_idx % 3]:
-                                            new_val = st.number_input(
-                                                f"{skill} ({current}+)",
-                                                min_value=0,
-                                                max_value=min(remaining + adding, max_ranks - current),
-                                                value=adding,
-                                                key=f"skill_{i}_{skill}",
-                                                help=f"Current: {current}, Max: {max_ranks}"
-                                            )
-                                            alloc[skill] = new_val
-                                        col_idx += 1
-                                
-                                # Cross-class skills (cost 2 points per rank)
-                                with st.expander("Cross-Class Skills (2 points per rank)"):
-                                    cross_class = [s for s in all_skills if s not in class_skills]
-                                    skill_cols2 = st.columns(3)
-                                    col_idx2 = 0
-                                    for skill in sorted(cross_class):
-                                        current = current_skills.get(skill, 0)
-                                        adding = alloc.get(skill, 0)
-                                        with skill_cols2[col_idx2 % 3]:
-                                            new_val = st.number_input(
-                                                f"{skill} ({current}+)",
-                                                min_value=0,
-                                                max_value=min((remaining + adding) // 2, (max_ranks // 2) - current),
-                                                value=adding,
-                                                key=f"skill_cc_{i}_{skill}",
-                                                help=f"Current: {current}, Max: {max_ranks // 2} (cross-class)"
-                                            )
-                                            alloc[skill] = new_val * 2  # Double cost for cross-class
-                                        col_idx2 += 1
-                                
-                                # Recalculate total
-                                total_allocated = sum(alloc.values())
-                                remaining = skill_points_available - total_allocated
-                                
-                                if st.button("Apply Skill Points", key=f"apply_skills_{i}", disabled=total_allocated == 0):
-                                    # Convert allocation to actual ranks (cross-class already doubled in cost)
-                                    actual_ranks = {}
-                                    for skill, cost in alloc.items():
-                                        if cost > 0:
-                                            if skill in class_skills:
-                                                actual_ranks[skill] = cost
-                                            else:
-                                                actual_ranks[skill] = cost // 2  # Cross-class gives half ranks
-                                    
-                                    result = apply_skill_ranks(c, actual_ranks)
+                                    result = apply_spell_selection(c, "spell", selected_spells)
                                     if result["success"]:
-                                        st.session_state[skill_alloc_key] = {}
-                                        st.toast(f"✅ Allocated {result['allocated']} skill points!")
+                                        st.toast(f"✅ Learned {len(selected_spells)} spell(s)!")
                                         st.rerun()
                                     else:
                                         st.error(result["message"])
-                        
-                        # ===== CANTRIPS =====
-                        if pending["cantrips"]:
-                            with st.expander(f"✨ Cantrips ({c.get('pending_cantrips', 0)} to choose)", expanded=True):
-                                cantrips_available = c.get("pending_cantrips", 0)
-                                
-                                # Get class spell list
-                                char_classes = c.get("classes", [{"class_id": c.get("class", "wizard"), "level": 1}])
-                                spell_classes = [cc.get("class_id", "").lower() for cc in char_classes]
-                                
-                                # Load all spells
-                                all_spells = load_srd_spells()
-                                cantrips = [s for s in all_spells if s.get("level", 0) == 0]
-                                
-                                # Filter to class cantrips
-                                class_cantrips = []
-                                for cantrip in cantrips:
-                                    spell_classes_list = [sc.lower() for sc in cantrip.get("classes", [])]
-                                    if any(sc in spell_classes_list for sc in spell_classes):
-                                        class_cantrips.append(cantrip.get("name", ""))
-                                
-                                # Already known cantrips
-                                known_cantrips = c.get("spells", {}).get("cantrips", [])
-                                available_cantrips = [ct for ct in class_cantrips if ct not in known_cantrips]
-                                
-                                if available_cantrips:
-                                    selected_cantrips = st.multiselect(
-                                        f"Choose {cantrips_available} cantrip(s):",
-                                        available_cantrips,
-                                        max_selections=cantrips_available,
-                                        key=f"cantrip_select_{i}"
-                                    )
-                                    
-                                    if st.button("Learn Cantrips", key=f"learn_cantrips_{i}", disabled=len(selected_cantrips) == 0):
-                                        result = apply_spell_selection(c, "cantrip", selected_cantrips)
-                                        if result["success"]:
-                                            st.toast(f"✅ Learned {len(selected_cantrips)} cantrip(s)!")
-                                            st.rerun()
-                                        else:
-                                            st.error(result["message"])
-                                else:
-                                    st.caption("No more cantrips available to learn.")
-                        
-                        # ===== SPELLS =====
-                        if pending["spells"]:
-                            with st.expander(f"📖 Spells ({c.get('pending_spells', 0)} to choose)", expanded=True):
-                                spells_available = c.get("pending_spells", 0)
-                                max_spell_level = c.get("max_spell_level", 1)
-                                
-                                # Get class spell list
-                                char_classes = c.get("classes", [{"class_id": c.get("class", "wizard"), "level": 1}])
-                                spell_classes = [cc.get("class_id", "").lower() for cc in char_classes]
-                                
-                                # Load all spells
-                                all_spells = load_srd_spells()
-                                
-                                # Filter to class spells of appropriate level
-                                class_spells = []
-                                for spell in all_spells:
-                                    spell_level = spell.get("level", 0)
-                                    if spell_level > 0 and spell_level <= max_spell_level:
-                                        spell_classes_list = [sc.lower() for sc in spell.get("classes", [])]
-                                        if any(sc in spell_classes_list for sc in spell_classes):
-                                            class_spells.append(spell.get("name", ""))
-                                
-                                # Already known spells
-                                known_spells = c.get("spells", {}).get("known", [])
-                                available_spells = [sp for sp in class_spells if sp not in known_spells]
-                                
-                                if available_spells:
-                                    st.caption(f"Max spell level: {max_spell_level}")
-                                    selected_spells = st.multiselect(
-                                        f"Choose {spells_available} spell(s):",
-                                        sorted(available_spells),
-                                        max_selections=spells_available,
-                                        key=f"spell_select_{i}"
-                                    )
-                                    
-                                    if st.button("Learn Spells", key=f"learn_spells_{i}", disabled=len(selected_spells) == 0):
-                                        result = apply_spell_selection(c, "spell", selected_spells)
-                                        if result["success"]:
-                                            st.toast(f"✅ Learned {len(selected_spells)} spell(s)!")
-                                            st.rerun()
-                                        else:
-                                            st.error(result["message"])
-                                else:
-                                    st.caption("No more spells available to learn.")
-                        
-                        # ===== ASI / FEAT =====
-                        if pending["asi_or_feat"]:
-                            with st.expander(f"⬆️ Ability Score Improvement / Feat ({c.get('pending_asi', 0)} choice(s))", expanded=True):
-                                asi_choice = st.radio(
-                                    "Choose:",
-                                    ["asi", "feat"],
-                                    format_func=lambda x: "📊 Ability Score Improvement (+2 to one / +1 to two)" if x == "asi" else "🏅 Feat",
-                                    key=f"asi_choice_{i}",
-                                    horizontal=True
+                        else:
+                            st.caption("No more spells available to learn.")
+
+            # ===== ASI / FEAT =====
+            if pending["asi_or_feat"]:
+                with st.expander(f"⬆️ Ability Score Improvement / Feat ({c.get('pending_asi', 0)} choice(s))", expanded=True, key=f"pending_exp_asi_{i}", on_change="rerun") as section:
+                    if section.open:  # skip the SRD filtering while collapsed
+                        asi_choice = st.radio(
+                            "Choose:",
+                            ["asi", "feat"],
+                            format_func=lambda x: "📊 Ability Score Improvement (+2 to one / +1 to two)" if x == "asi" else "🏅 Feat",
+                            key=f"asi_choice_{i}",
+                            horizontal=True
+                        )
+
+                        if asi_choice == "asi":
+                            abilities = _ABILITIES
+                            current_abilities = char_abilities
+
+                            asi_method = st.radio(
+                                "Method:",
+                                ["+2_one", "+1_two"],
+                                format_func=lambda x: "+2 to one ability" if x == "+2_one" else "+1 to two abilities",
+                                key=f"asi_method_{i}",
+                                horizontal=True
+                            )
+
+                            if asi_method == "+2_one":
+                                ability1 = st.selectbox(
+                                    "Increase by +2:",
+                                    abilities,
+                                    format_func=_ability_preview(abilities, current_abilities, 2).__getitem__,
+                                    key=f"asi_ability1_{i}"
                                 )
-                                
-                                if asi_choice == "asi":
-                                    abilities = ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
-                                    current_abilities = c.get("abilities", {})
-                                    
-                                    asi_method = st.radio(
-                                        "Method:",
-                                        ["+2_one", "+1_two"],
-                                        format_func=lambda x: "+2 to one ability" if x == "+2_one" else "+1 to two abilities",
-                                        key=f"asi_method_{i}",
-                                        horizontal=True
-                                    )
-                                    
-                                    if asi_method == "+2_one":
-                                        ability1 = st.selectbox(
-                                            "Increase by +2:",
-                                            abilities,
-                                            format_func=lambda x: f"{x} ({current_abilities.get(x, 10)} → {min(20, current_abilities.get(x, 10) + 2)})",
-                                            key=f"asi_ability1_{i}"
-                                        )
-                                        ability2 = None
-                                    else:
-                                        col1, col2 = st.columns(2)
-                                        with col1:
-                                            ability1 = st.selectbox(
-                                                "First +1:",
-                                                abilities,
-                                                format_func=lambda x: f"{x} ({current_abilities.get(x, 10)} → {min(20, current_abilities.get(x, 10) + 1)})",
-                                                key=f"asi_ability1_{i}"
-                                            )
-                                        with col2:
-                                            ability2 = st.selectbox(
-                                                "Second +1:",
-                                                [a for a in abilities if a != ability1],
-                                                format_func=lambda x: f"{x} ({current_abilities.get(x, 10)} → {min(20, current_abilities.get(x, 10) + 1)})",
-                                                key=f"asi_ability2_{i}"
-                                            )
-                                    
-                                    if st.button("Apply ASI", key=f"apply_asi_{i}"):
-                                        result = apply_asi(c, ability1, ability2)
-                                        if result["success"]:
-                                            st.toast(f"✅ {result['message']}")
-                                            st.rerun()
-                                        else:
-                                            st.error(result["message"])
-                                
-                                else:  # Feat
-                                    # Load feats
-                                    feats = load_srd_feats()
-                                    feat_names = [f.get("name", "") for f in feats]
-                                    current_feats = c.get("feats", [])
-                                    
-                                    # Filter feats - exclude ones already taken (except repeatable ones)
-                                    repeatable_feats = ["Elemental Adept", "Weapon Focus", "Weapon Specialization", 
-                                                    "Greater Weapon Focus", "Greater Weapon Specialization"]
-                                    available_feats = [f for f in feat_names if f not in current_feats or f in repeatable_feats]
-                                    
-                                    # Also check prerequisites
-                                    char_abilities = c.get("abilities", {})
-                                    char_bab = c.get("bab", 0)
-                                    char_feats = c.get("feats", [])
-                                    
-                                    def check_prereqs(feat_data):
-                                        prereqs = feat_data.get("prerequisites", [])
-                                        if not prereqs:
-                                            return True
-                                        for prereq in prereqs:
-                                            if isinstance(prereq, dict):
-                                                for key, val in prereq.items():
-                                                    if key in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]:
-                                                        if char_abilities.get(key, 10) < val:
-                                                            return False
-                                                    elif key == "BAB":
-                                                        if char_bab < val:
-                                                            return False
-                                                    elif key == "feat":
-                                                        if val not in char_feats:
-                                                            return False
-                                                    elif key == "spellcasting":
-                                                        # Check if character has any spellcasting
-                                                        has_spells = bool(c.get("spells", {}).get("known") or c.get("spells", {}).get("cantrips"))
-                                                        if val and not has_spells:
-                                                            return False
-                                        return True
-                                    
-                                    # Filter by prerequisites
-                                    valid_feats = []
-                                    for fname in available_feats:
-                                        fdata = next((f for f in feats if f.get("name") == fname), None)
-                                        if fdata and check_prereqs(fdata):
-                                            valid_feats.append(fname)
-                                    
-                                    if valid_feats:
-                                        selected_feat = st.selectbox(
-                                            "Choose a feat:",
-                                            sorted(valid_feats),
-                                            key=f"feat_select_{i}"
-                                        )
-                                        
-                                        # Show feat description
-                                        feat_data = next((f for f in feats if f.get("name") == selected_feat), None)
-                                        if feat_data:
-                                            st.caption(feat_data.get("description", "No description available."))
-                                            
-                                            # Show prerequisites if any
-                                            prereqs = feat_data.get("prerequisites", [])
-                                            if prereqs:
-                                                prereq_strs = []
-                                                for p in prereqs:
-                                                    if isinstance(p, dict):
-                                                        for k, v in p.items():
-                                                            prereq_strs.append(f"{k} {v}")
-                                                if prereq_strs:
-                                                    st.caption(f"**Prerequisites:** {', '.join(prereq_strs)}")
-                                            
-                                            # Show effects
-                                            effects = feat_data.get("effects", {})
-                                            if effects:
-                                                effect_strs = []
-                                                if "initiative_bonus" in effects:
-                                                    effect_strs.append(f"+{effects['initiative_bonus']} Initiative")
-                                                if "speed_bonus" in effects:
-                                                    effect_strs.append(f"+{effects['speed_bonus']} ft. Speed")
-                                                if "hp_bonus_per_level" in effects:
-                                                    effect_strs.append(f"+{effects['hp_bonus_per_level']} HP/level")
-                                                if "ac_bonus" in effects:
-                                                    effect_strs.append(f"+{effects['ac_bonus']} AC")
-                                                if effect_strs:
-                                                    st.caption(f"**Effects:** {', '.join(effect_strs)}")
-                                            
-                                            # Handle ability increase choice
-                                            ability_choice = None
-                                            ability_increase = feat_data.get("ability_increase", {})
-                                            if ability_increase and "choice" in ability_increase:
-                                                choices = ability_increase["choice"]
-                                                amount = ability_increase.get("amount", 1)
-                                                ability_choice = st.selectbox(
-                                                    f"Choose ability to increase (+{amount}):",
-                                                    choices,
-                                                    format_func=lambda x: f"{x} ({char_abilities.get(x, 10)} → {min(20, char_abilities.get(x, 10) + amount)})",
-                                                    key=f"feat_ability_choice_{i}"
-                                                )
-                                            elif ability_increase:
-                                                # Show fixed ability increases
-                                                fixed_increases = []
-                                                for ab, amt in ability_increase.items():
-                                                    if ab in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]:
-                                                        fixed_increases.append(f"+{amt} {ab}")
-                                                if fixed_increases:
-                                                    st.caption(f"**Ability Increase:** {', '.join(fixed_increases)}")
-                                        
-                                        if st.button("Take Feat", key=f"take_feat_{i}"):
-                                            result = apply_feat(c, selected_feat, feat_data, ability_choice=ability_choice)
-                                            if result["success"]:
-                                                st.toast(f"✅ {result['message']}")
-                                                st.rerun()
-                                            else:
-                                                st.error(result["message"])
-                                    else:
-                                        st.caption("No feats available (prerequisites not met or all taken).")
-                        
-                        # ===== FIGHTING STYLE =====
-                        if pending.get("fighting_style"):
-                            with st.expander(f"⚔️ Fighting Style ({c.get('pending_fighting_style', 0)} to choose)", expanded=True):
-                                from src.leveling import get_available_fighting_styles, apply_fighting_style
-                                
-                                feats = load_srd_feats()
-                                available_styles = get_available_fighting_styles(c, feats)
-                                
-                                if available_styles:
-                                    style_names = [s["name"] for s in available_styles]
-                                    selected_style = st.selectbox(
-                                        "Choose a Fighting Style:",
-                                        sorted(style_names),
-                                        key=f"fighting_style_select_{i}"
+                                ability2 = None
+                            else:
+                                plus_one = _ability_preview(abilities, current_abilities, 1)
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    ability1 = st.selectbox(
+                                        "First +1:",
+                                        abilities,
+                                        format_func=plus_one.__getitem__,
+                                        key=f"asi_ability1_{i}"
                                     )
-                                    
-                                    # Show description
-                                    style_data = next((s for s in available_styles if s["name"] == selected_style), None)
-                                    if style_data:
-                                        st.caption(style_data.get("description", ""))
-                                        
-                                        # Show effects
-                                        effects = style_data.get("effects", {})
-                                        if effects:
-                                            effect_strs = []
-                                            if "ranged_attack_bonus" in effects:
-                                                effect_strs.append(f"+{effects['ranged_attack_bonus']} ranged attack")
-                                            if "armor_ac_bonus" in effects:
-                                                effect_strs.append(f"+{effects['armor_ac_bonus']} AC (in armor)")
-                                            if "one_handed_damage_bonus" in effects:
-                                                effect_strs.append(f"+{effects['one_handed_damage_bonus']} damage (one-handed)")
-                                            if "thrown_damage_bonus" in effects:
-                                                effect_strs.append(f"+{effects['thrown_damage_bonus']} thrown damage")
-                                            if effect_strs:
-                                                st.caption(f"**Effects:** {', '.join(effect_strs)}")
-                                    
-                                    if st.button("Choose Fighting Style", key=f"apply_fighting_style_{i}"):
-                                        result = apply_fighting_style(c, selected_style, style_data)
-                                        if result["success"]:
-                                            st.toast(f"✅ {result['message']}")
-                                            st.rerun()
-                                        else:
-                                            st.error(result["message"])
-                                else:
-                                    st.caption("You already have all available fighting styles.")
-                        
-                        # ===== BONUS FEAT =====
-                        if pending.get("bonus_feat"):
-                            with st.expander(f"🎖️ Bonus Feat ({c.get('pending_bonus_feat', 0)} to choose)", expanded=True):
-                                from src.leveling import get_available_bonus_feats, apply_bonus_feat, check_feat_prerequisites
-                                
-                                feats = load_srd_feats()
-                                available_bonus = get_available_bonus_feats(c, feats)
-                                
-                                # Sort by whether prerequisites are met
-                                available_bonus.sort(key=lambda x: (not x["meets_prerequisites"], x["feat"]["name"]))
-                                
-                                if available_bonus:
-                                    # Show feats with prerequisites met first
-                                    valid_feats = [f for f in available_bonus if f["meets_prerequisites"]]
-                                    invalid_feats = [f for f in available_bonus if not f["meets_prerequisites"]]
-                                    
-                                    st.markdown("**Feats you qualify for:**")
-                                    if valid_feats:
-                                        feat_options = [f["feat"]["name"] for f in valid_feats]
-                                        selected_feat = st.selectbox(
-                                            "Choose a feat:",
-                                            feat_options,
-                                            key=f"bonus_feat_select_{i}"
-                                        )
-                                        
-                                        # Show feat details
-                                        feat_entry = next((f for f in valid_feats if f["feat"]["name"] == selected_feat), None)
-                                        if feat_entry:
-                                            feat_data = feat_entry["feat"]
-                                            st.caption(feat_data.get("description", ""))
-                                            
-                                            # Show prerequisites
-                                            prereqs = feat_data.get("prerequisites", [])
-                                            if prereqs:
-                                                prereq_strs = []
-                                                for p in prereqs:
-                                                    if isinstance(p, dict):
-                                                        for k, v in p.items():
-                                                            prereq_strs.append(f"{k} {v}")
-                                                if prereq_strs:
-                                                    st.caption(f"✅ **Prerequisites:** {', '.join(prereq_strs)}")
-                                            
-                                            # Handle ability choice if needed
-                                            ability_choice = None
-                                            ability_increase = feat_data.get("ability_increase", {})
-                                            if ability_increase and "choice" in ability_increase:
-                                                choices = ability_increase["choice"]
-                                                amount = ability_increase.get("amount", 1)
-                                                char_abilities = c.get("abilities", {})
-                                                ability_choice = st.selectbox(
-                                                    f"Choose ability to increase (+{amount}):",
-                                                    choices,
-                                                    format_func=lambda x: f"{x} ({char_abilities.get(x, 10)} → {min(20, char_abilities.get(x, 10) + amount)})",
-                                                    key=f"bonus_feat_ability_{i}"
-                                                )
-                                            
-                                            if st.button("Take Bonus Feat", key=f"apply_bonus_feat_{i}"):
-                                                result = apply_bonus_feat(c, selected_feat, feat_data, ability_choice)
-                                                if result["success"]:
-                                                    st.toast(f"✅ {result['message']}")
-                                                    st.rerun()
-                                                else:
-                                                    st.error(result["message"])
-                                    else:
-                                        st.caption("No feats available that you qualify for.")
-                                    
-                                    # Show unavailable feats
-                                    if invalid_feats:
-                                        with st.expander("Feats you don't qualify for"):
-                                            for f in invalid_feats[:10]:  # Show first 10
-                                                st.markdown(f"**{f['feat']['name']}** - Missing: {', '.join(f['unmet_prerequisites'])}")
-                                else:
-                                    st.caption("No bonus feats available.")
-                        
-                        # ===== WARLOCK INVOCATIONS =====
-                        if pending.get("invocations"):
-                            with st.expander(f"🌙 Eldritch Invocations ({c.get('pending_invocations', 0)} to choose)", expanded=True):
-                                invocations_to_choose = c.get("pending_invocations", 0)
-                                current_invocations = c.get("warlock_invocations", [])
-                                char_level = c.get("level", 1)
-                                pact_boon = c.get("warlock_pact_boon", "")
-                                
-                                # Get available invocations based on level and prerequisites
-                                available_invocations = []
-                                for inv_name, inv_data in WARLOCK_INVOCATIONS.items():
-                                    # Skip if already known
-                                    if inv_name in current_invocations:
-                                        continue
-                                    
-                                    # Check level requirement
-                                    if char_level < inv_data.get("level", 1):
-                                        continue
-                                    
-                                    # Check prerequisites
-                                    prereq = inv_data.get("prereq")
-                                    if prereq:
-                                        if "Eldritch Blast" in prereq:
-                                            # Check if character has Eldritch Blast
-                                            known_cantrips = c.get("spells", {}).get("cantrips", [])
-                                            if "Eldritch Blast" not in known_cantrips and "Eldritch Blast" not in c.get("spells", []):
-                                                continue
-                                        if "Pact of the Blade" in prereq and pact_boon != "Blade":
-                                            continue
-                                        if "Pact of the Chain" in prereq and pact_boon != "Chain":
-                                            continue
-                                        if "Pact of the Tome" in prereq and pact_boon != "Tome":
-                                            continue
-                                    
-                                    available_invocations.append((inv_name, inv_data))
-                                
-                                if available_invocations:
-                                    inv_names = [inv[0] for inv in available_invocations]
-                                    
-                                    selected_invocations = st.multiselect(
-                                        f"Choose {invocations_to_choose} invocation(s):",
-                                        inv_names,
-                                        max_selections=invocations_to_choose,
-                                        key=f"invocation_select_{i}"
+                                with col2:
+                                    ability2 = st.selectbox(
+                                        "Second +1:",
+                                        [a for a in abilities if a != ability1],
+                                        format_func=plus_one.__getitem__,
+                                        key=f"asi_ability2_{i}"
                                     )
-                                    
-                                    # Show descriptions for selected
-                                    if selected_invocations:
-                                        for inv_name in selected_invocations:
-                                            inv_data = WARLOCK_INVOCATIONS.get(inv_name, {})
-                                            prereq_text = f" *(Requires: {inv_data.get('prereq')})*" if inv_data.get("prereq") else ""
-                                            st.caption(f"**{inv_name}**: {inv_data.get('description', '')}{prereq_text}")
-                                    
-                                    if st.button("Learn Invocations", key=f"learn_invocations_{i}", 
-                                            disabled=len(selected_invocations) != invocations_to_choose):
-                                        # Apply invocations
-                                        current_invocations.extend(selected_invocations)
-                                        c["warlock_invocations"] = current_invocations
-                                        c["pending_invocations"] = 0
-                                        
-                                        # Re-apply invocation effects
-                                        add_level1_class_resources_and_actions(c)
-                                        
-                                        st.toast(f"✅ Learned {len(selected_invocations)} invocation(s)!")
-                                        st.rerun()
-                                else:
-                                    st.caption("No invocations available (check prerequisites or level).")
-                        
-                        # ===== PACT BOON =====
-                        if pending.get("pact_boon"):
-                            with st.expander("📜 Pact Boon (Level 3)", expanded=True):
-                                pact_options = ["Blade", "Chain", "Tome", "Talisman"]
-                                
-                                selected_pact = st.radio(
-                                    "Choose your Pact Boon:",
-                                    pact_options,
-                                    format_func=lambda x: {
-                                        "Blade": "⚔️ Pact of the Blade - Create magical pact weapons",
-                                        "Chain": "🐉 Pact of the Chain - Enhanced familiar (imp, pseudodragon, etc.)",
-                                        "Tome": "📖 Pact of the Tome - Book with 3 cantrips from any class",
-                                        "Talisman": "🔮 Pact of the Talisman - Amulet that aids ability checks"
-                                    }.get(x, x),
-                                    key=f"pact_boon_select_{i}",
-                                    horizontal=False
-                                )
-                                
-                                if st.button("Choose Pact Boon", key=f"apply_pact_boon_{i}"):
-                                    c["warlock_pact_boon"] = selected_pact
-                                    c["pending_pact_boon"] = False
-                                    
-                                    # Apply pact boon effects
-                                    add_level1_class_resources_and_actions(c)
-                                    
-                                    st.toast(f"✅ Chose Pact of the {selected_pact}!")
+
+                            if st.button("Apply ASI", key=f"apply_asi_{i}"):
+                                result = apply_asi(c, ability1, ability2)
+                                if result["success"]:
+                                    st.toast(f"✅ {result['message']}")
                                     st.rerun()
-                        
-                        # ===== FIGHTER MANEUVERS =====
-                        if pending.get("maneuvers"):
-                            with st.expander(f"⚔️ Combat Maneuvers ({c.get('pending_maneuvers', 0)} to choose)", expanded=True):
-                                maneuvers_to_choose = c.get("pending_maneuvers", 0)
-                                current_maneuvers = c.get("fighter_maneuvers", [])
-                                
-                                # Get available maneuvers
-                                available_maneuvers = []
-                                for maneuver_name, maneuver_data in FIGHTER_MANEUVERS.items():
-                                    if maneuver_name not in current_maneuvers:
-                                        available_maneuvers.append((maneuver_name, maneuver_data))
-                                
-                                if available_maneuvers:
-                                    maneuver_names = [m[0] for m in available_maneuvers]
-                                    
-                                    selected_maneuvers = st.multiselect(
-                                        f"Choose {maneuvers_to_choose} maneuver(s):",
-                                        maneuver_names,
-                                        max_selections=maneuvers_to_choose,
-                                        key=f"maneuver_select_{i}"
-                                    )
-                                    
-                                    # Show descriptions for selected
-                                    if selected_maneuvers:
-                                        st.markdown("**Selected Maneuvers:**")
-                                        for m_name in selected_maneuvers:
-                                            m_data = FIGHTER_MANEUVERS.get(m_name, {})
-                                            st.caption(f"• **{m_name}** ({m_data.get('type', 'attack')}): {m_data.get('description', '')}")
-                                    
-                                    if st.button("Learn Maneuvers", key=f"learn_maneuvers_{i}", 
-                                            disabled=len(selected_maneuvers) != maneuvers_to_choose):
-                                        # Apply maneuvers
-                                        current_maneuvers.extend(selected_maneuvers)
-                                        c["fighter_maneuvers"] = current_maneuvers
-                                        c["pending_maneuvers"] = 0
-                                        
-                                        # Re-apply maneuver actions
-                                        add_level1_class_resources_and_actions(c)
-                                        
-                                        st.toast(f"✅ Learned {len(selected_maneuvers)} maneuver(s)!")
-                                        st.rerun()
                                 else:
-                                    st.caption("All maneuvers already learned.")
-                        
-                        # ===== SORCERER METAMAGIC =====
-                        if pending.get("metamagic"):
-                            with st.expander(f"✨ Metamagic ({c.get('pending_metamagic', 0)} to choose)", expanded=True):
-                                metamagic_to_choose = c.get("pending_metamagic", 0)
-                                current_metamagic = c.get("sorcerer_metamagic", [])
-                                
-                                # Get available metamagic
-                                available_metamagic = []
-                                for meta_name, meta_data in SORCERER_METAMAGIC.items():
-                                    if meta_name not in current_metamagic:
-                                        available_metamagic.append((meta_name, meta_data))
-                                
-                                if available_metamagic:
-                                    meta_names = [m[0] for m in available_metamagic]
-                                    
-                                    selected_metamagic = st.multiselect(
-                                        f"Choose {metamagic_to_choose} metamagic option(s):",
-                                        meta_names,
-                                        max_selections=metamagic_to_choose,
-                                        key=f"metamagic_select_{i}"
-                                    )
-                                    
-                                    # Show descriptions for selected
-                                    if selected_metamagic:
-                                        st.markdown("**Selected Metamagic:**")
-                                        for m_name in selected_metamagic:
-                                            m_data = SORCERER_METAMAGIC.get(m_name, {})
-                                            cost = m_data.get("cost", 1)
-                                            cost_str = f"{cost} SP" if isinstance(cost, int) else "Spell level SP"
-                                            st.caption(f"• **{m_name}** ({cost_str}): {m_data.get('description', '')}")
-                                    
-                                    if st.button("Learn Metamagic", key=f"learn_metamagic_{i}", 
-                                            disabled=len(selected_metamagic) != metamagic_to_choose):
-                                        # Apply metamagic
-                                        current_metamagic.extend(selected_metamagic)
-                                        c["sorcerer_metamagic"] = current_metamagic
-                                        c["pending_metamagic"] = 0
-                                        
-                                        # Re-apply metamagic actions
+                                    st.error(result["message"])
+
+                        else:  # Feat
+                            # Feat names, sorted once per load
+                            feat_names = st.session_state.get("_feat_names_sorted", ())
+                            feat_by_name = _index_by_name(feats, "_feat_index")
+                            current_feats = c.get("feats", [])
+
+                            # Filter feats - exclude ones already taken (except repeatable ones)
+                            repeatable_feats = ["Elemental Adept", "Weapon Focus", "Weapon Specialization", 
+                                            "Greater Weapon Focus", "Greater Weapon Specialization"]
+                            available_feats = [f for f in feat_names if f not in current_feats or f in repeatable_feats]
+
+                            # Also check prerequisites (memoized per feat and character state)
+                            prereq_keys = _feat_prereq_keys(feats)
+                            char_spells = c.get("spells", {})
+                            char_state = (
+                                tuple(sorted(char_abilities.items())),
+                                c.get("bab", 0),
+                                frozenset(c.get("feats", [])),
+                                bool(char_spells.get("known") or char_spells.get("cantrips")),
+                            )
+                            valid_feats = [
+                                fname for fname in available_feats
+                                if fname in prereq_keys and meets_prereqs(prereq_keys[fname], *char_state)
+                            ]
+
+                            if valid_feats:
+                                selected_feat = st.selectbox(
+                                    "Choose a feat:",
+                                    valid_feats,
+                                    key=f"feat_select_{i}"
+                                )
+
+                                # Show feat description
+                                feat_data = feat_by_name.get(selected_feat)
+                                if feat_data:
+                                    st.caption(feat_data.get("description", "No description available."))
+
+                                    # Show prerequisites if any
+                                    prereqs = feat_data.get("prerequisites", [])
+                                    if prereqs:
+                                        prereq_strs = []
+                                        for p in prereqs:
+                                            if isinstance(p, dict):
+                                                for k, v in p.items():
+                                                    prereq_strs.append(f"{k} {v}")
+                                        if prereq_strs:
+                                            st.caption(f"**Prerequisites:** {', '.join(prereq_strs)}")
+
+                                    # Show effects
+                                    effects = feat_data.get("effects", {})
+                                    if effects:
+                                        effect_strs = [fmt.format(effects[k]) for k, fmt in FEAT_EFFECT_FORMATS if k in effects]
+                                        if effect_strs:
+                                            st.caption(f"**Effects:** {', '.join(effect_strs)}")
+
+                                    # Handle ability increase choice
+                                    ability_choice = None
+                                    ability_increase = feat_data.get("ability_increase", {})
+                                    if ability_increase and "choice" in ability_increase:
+                                        choices = ability_increase["choice"]
+                                        amount = ability_increase.get("amount", 1)
+                                        ability_choice = st.selectbox(
+                                            f"Choose ability to increase (+{amount}):",
+                                            choices,
+                                            format_func=_ability_preview(choices, char_abilities, amount).__getitem__,
+                                            key=f"feat_ability_choice_{i}"
+                                        )
+                                    elif ability_increase:
+                                        # Show fixed ability increases
+                                        fixed_increases = []
+                                        for ab, amt in ability_increase.items():
+                                            if ab in ["STR", "DEX", "CON", "INT", "WIS", "CHA"]:
+                                                fixed_increases.append(f"+{amt} {ab}")
+                                        if fixed_increases:
+                                            st.caption(f"**Ability Increase:** {', '.join(fixed_increases)}")
+
+                                if st.button("Take Feat", key=f"take_feat_{i}"):
+                                    result = apply_feat(c, selected_feat, feat_data, ability_choice=ability_choice)
+                                    if result["success"]:
                                         add_level1_class_resources_and_actions(c)
-                                        
-                                        st.toast(f"✅ Learned {len(selected_metamagic)} metamagic option(s)!")
+                                        st.toast(f"✅ {result['message']}")
                                         st.rerun()
-                                else:
-                                    st.caption("All metamagic options already learned.")
-                        
-                        # ===== WIZARD SCHOOL =====
-                        if pending.get("wizard_school"):
-                            with st.expander(f"📚 Arcane School (Choose 1)", expanded=True):
-                                st.markdown("**Choose Your School of Magic:**")
-                                
-                                school_names = list(WIZARD_SCHOOLS.keys())
-                                selected_school = st.selectbox(
-                                    "Arcane School:",
-                                    school_names,
-                                    key=f"wizard_school_select_{i}"
-                                )
-                                
-                                # Show school details
-                                school_data = WIZARD_SCHOOLS.get(selected_school, {})
-                                st.caption(school_data.get("description", ""))
-                                
-                                if st.button("Choose School", key=f"choose_school_{i}"):
-                                    c["wizard_school"] = selected_school
-                                    c["pending_wizard_school"] = False
-                                    
-                                    # Re-apply school effects
-                                    add_level1_class_resources_and_actions(c)
-                                    
-                                    st.toast(f"✅ Specialized in {selected_school}!")
-                                    st.rerun()
-                        
-                        # ===== PALADIN DIVINE VOW =====
-                        if pending.get("divine_vow"):
-                            with st.expander(f"⚔️ Divine Vow (Choose 1)", expanded=True):
-                                st.markdown("**Choose Your Sacred Oath:**")
-                                
-                                vow_names = list(PALADIN_DIVINE_VOWS.keys())
-                                selected_vow = st.selectbox(
-                                    "Divine Vow:",
-                                    vow_names,
-                                    key=f"divine_vow_select_{i}"
-                                )
-                                
-                                # Show vow details
-                                vow_data = PALADIN_DIVINE_VOWS.get(selected_vow, {})
-                                st.caption(vow_data.get("description", ""))
-                                
-                                st.markdown("**Features:**")
-                                for feat in vow_data.get("features", []):
-                                    st.caption(f"• {feat}")
-                                
-                                if st.button("Take Vow", key=f"take_vow_{i}"):
-                                    c["paladin_divine_vow"] = selected_vow
-                                    c["pending_divine_vow"] = False
-                                    
-                                    # Re-apply vow effects
+                                    else:
+                                        st.error(result["message"])
+                            else:
+                                st.caption("No feats available (prerequisites not met or all taken).")
+
+            # ===== FIGHTING STYLE =====
+            if pending.get("fighting_style"):
+                with st.expander(f"⚔️ Fighting Style ({c.get('pending_fighting_style', 0)} to choose)", expanded=True, key=f"pending_exp_fighting_style_{i}", on_change="rerun") as section:
+                    if section.open:  # skip the SRD filtering while collapsed
+                        from src.leveling import get_available_fighting_styles, apply_fighting_style
+
+                        available_styles = get_available_fighting_styles(c, feats)
+
+                        if available_styles:
+                            style_by_name = {s["name"]: s for s in available_styles}
+                            style_names = list(style_by_name)
+                            selected_style = st.selectbox(
+                                "Choose a Fighting Style:",
+                                sorted(style_names),
+                                key=f"fighting_style_select_{i}"
+                            )
+
+                            # Show description
+                            style_data = style_by_name.get(selected_style)
+                            if style_data:
+                                st.caption(style_data.get("description", ""))
+
+                                # Show effects
+                                effects = style_data.get("effects", {})
+                                if effects:
+                                    effect_strs = [fmt.format(effects[k]) for k, fmt in STYLE_EFFECT_FORMATS if k in effects]
+                                    if effect_strs:
+                                        st.caption(f"**Effects:** {', '.join(effect_strs)}")
+
+                            if st.button("Choose Fighting Style", key=f"apply_fighting_style_{i}"):
+                                result = apply_fighting_style(c, selected_style, style_data)
+                                if result["success"]:
                                     add_level1_class_resources_and_actions(c)
-                                    
-                                    st.toast(f"✅ Swore the Vow of {selected_vow}!")
+                                    st.toast(f"✅ {result['message']}")
                                     st.rerun()
-                        
-                        # ===== BARBARIAN PRIMAL TALENTS =====
-                        if pending.get("primal_talents"):
-                            with st.expander(f"💪 Primal Talents ({c.get('pending_primal_talents', 0)} to choose)", expanded=True):
-                                talents_to_choose = c.get("pending_primal_talents", 0)
-                                current_talents = c.get("barbarian_primal_talents", [])
-                                
-                                # Get available talents (check prerequisites)
-                                available_talents = []
-                                for talent_name, talent_data in BARBARIAN_PRIMAL_TALENTS.items():
-                                    if talent_name not in current_talents:
-                                        prereq = talent_data.get("prerequisite")
-                                        if prereq is None or prereq in current_talents:
-                                            available_talents.append((talent_name, talent_data))
-                                
-                                if available_talents:
-                                    talent_names = [t[0] for t in available_talents]
-                                    
-                                    selected_talents = st.multiselect(
-                                        f"Choose {talents_to_choose} primal talent(s):",
-                                        talent_names,
-                                        max_selections=talents_to_choose,
-                                        key=f"primal_talent_select_{i}"
-                                    )
-                                    
-                                    # Show descriptions for selected
-                                    if selected_talents:
-                                        st.markdown("**Selected Talents:**")
-                                        for t_name in selected_talents:
-                                            t_data = BARBARIAN_PRIMAL_TALENTS.get(t_name, {})
-                                            prereq = t_data.get("prerequisite")
-                                            prereq_str = f" (Requires: {prereq})" if prereq else ""
-                                            st.caption(f"• **{t_name}**{prereq_str}: {t_data.get('description', '')}")
-                                    
-                                    if st.button("Learn Primal Talents", key=f"learn_talents_{i}", 
-                                            disabled=len(selected_talents) != talents_to_choose):
-                                        # Apply talents
-                                        current_talents.extend(selected_talents)
-                                        c["barbarian_primal_talents"] = current_talents
-                                        c["pending_primal_talents"] = 0
-                                        
-                                        # Re-apply talent effects
-                                        add_level1_class_resources_and_actions(c)
-                                        
-                                        st.toast(f"✅ Learned {len(selected_talents)} primal talent(s)!")
-                                        st.rerun()
-                                else:
-                                    st.caption("All primal talents already learned or prerequisites not met.")
-                        
-                        # ===== MARSHAL MANEUVERS =====
-                        if pending.get("marshal_maneuvers"):
-                            with st.expander(f"🎖️ Marshal Maneuvers ({c.get('pending_marshal_maneuvers', 0)} to choose)", expanded=True):
-                                maneuvers_to_choose = c.get("pending_marshal_maneuvers", 0)
-                                current_maneuvers = c.get("marshal_maneuvers", [])
-                                
-                                # Get available maneuvers
-                                available_maneuvers = []
-                                for maneuver_name, maneuver_data in MARSHAL_MANEUVERS.items():
-                                    if maneuver_name not in current_maneuvers:
-                                        available_maneuvers.append((maneuver_name, maneuver_data))
-                                
-                                if available_maneuvers:
-                                    maneuver_names = [m[0] for m in available_maneuvers]
-                                    
-                                    selected_maneuvers = st.multiselect(
-                                        f"Choose {maneuvers_to_choose} maneuver(s):",
-                                        maneuver_names,
-                                        max_selections=maneuvers_to_choose,
-                                        key=f"marshal_maneuver_select_{i}"
-                                    )
-                                    
-                                    # Show descriptions for selected
-                                    if selected_maneuvers:
-                                        st.markdown("**Selected Maneuvers:**")
-                                        for m_name in selected_maneuvers:
-                                            m_data = MARSHAL_MANEUVERS.get(m_name, {})
-                                            mtype = m_data.get("type", "action").capitalize()
-                                            st.caption(f"• **{m_name}** ({mtype}): {m_data.get('description', '')}")
-                                    
-                                    if st.button("Learn Maneuvers", key=f"learn_marshal_maneuvers_{i}", 
-                                            disabled=len(selected_maneuvers) != maneuvers_to_choose):
-                                        # Apply maneuvers
-                                        current_maneuvers.extend(selected_maneuvers)
-                                        c["marshal_maneuvers"] = current_maneuvers
-                                        c["pending_marshal_maneuvers"] = 0
-                                        
-                                        # Re-apply maneuver effects
-                                        add_level1_class_resources_and_actions(c)
-                                        
-                                        st.toast(f"✅ Learned {len(selected_maneuvers)} maneuver(s)!")
-                                        st.rerun()
-                                else:
-                                    st.caption("All marshal maneuvers already learned.")
-                        
-                        # ===== KNIGHT MANEUVERS =====
-                        if pending.get("knight_maneuvers"):
-                            with st.expander(f"🛡️ Knight Maneuvers ({c.get('pending_knight_maneuvers', 0)} to choose)", expanded=True):
-                                maneuvers_to_choose = c.get("pending_knight_maneuvers", 0)
-                                current_maneuvers = c.get("knight_maneuvers", [])
-                                
-                                # Get available maneuvers
-                                available_maneuvers = []
-                                for maneuver_name, maneuver_data in KNIGHT_MANEUVERS.items():
-                                    if maneuver_name not in current_maneuvers:
-                                        available_maneuvers.append((maneuver_name, maneuver_data))
-                                
-                                if available_maneuvers:
-                                    maneuver_names = [m[0] for m in available_maneuvers]
-                                    
-                                    selected_maneuvers = st.multiselect(
-                                        f"Choose {maneuvers_to_choose} maneuver(s):",
-                                        maneuver_names,
-                                        max_selections=maneuvers_to_choose,
-                                        key=f"knight_maneuver_select_{i}"
-                                    )
-                                    
-                                    # Show descriptions for selected
-                                    if selected_maneuvers:
-                                        st.markdown("**Selected Maneuvers:**")
-                                        for m_name in selected_maneuvers:
-                                            m_data = KNIGHT_MANEUVERS.get(m_name, {})
-                                            requires_mounted = " (Mounted only)" if m_data.get("requires_mounted") else ""
-                                            st.caption(f"• **{m_name}** ({m_data.get('type', 'attack')}){requires_mounted}: {m_data.get('description', '')}")
-                                    
-                                    if st.button("Learn Maneuvers", key=f"learn_knight_maneuvers_{i}", 
-                                            disabled=len(selected_maneuvers) != maneuvers_to_choose):
-                                        # Apply maneuvers
-                                        current_maneuvers.extend(selected_maneuvers)
-                                        c["knight_maneuvers"] = current_maneuvers
-                                        c["pending_knight_maneuvers"] = 0
-                                        
-                                        # Re-apply maneuver effects
-                                        add_level1_class_resources_and_actions(c)
-                                        
-                                        st.toast(f"✅ Learned {len(selected_maneuvers)} knight maneuver(s)!")
-                                        st.rerun()
                                 else:
-                                    st.caption("All knight maneuvers already learned.")
-                        
-                        # ===== WEAPON EXPERTISE (Fighter Level 6) =====
-                        if pending.get("weapon_expertise"):
-                            with st.expander("⚔️ Weapon Expertise (Choose 1 Weapon)", expanded=True):
-                                st.markdown("**Choose a weapon for Weapon Expertise:**")
-                                st.caption("You gain +1 to attack rolls and can reroll 1s on damage dice with this weapon.")
-                                
-                                # Get weapons from equipment
-                                equipment = c.get("equipment", [])
-                                attacks = c.get("attacks", [])
-                                
-                                # Collect weapon names from attacks that are from weapons
-                                weapon_names = []
-                                for atk in attacks:
-                                    if atk.get("source") == "weapon":
-                                        weapon_names.append(atk.get("name", "Unknown"))
-                                
-                                # Also add common martial weapons if no weapons equipped
-                                if not weapon_names:
-                                    weapon_names = [
-                                        "Longsword", "Greatsword", "Battleaxe", "Greataxe",
-                                        "Warhammer", "Maul", "Rapier", "Scimitar", "Shortsword",
-                                        "Longbow", "Shortbow", "Crossbow", "Halberd", "Glaive",
-                                        "Pike", "Lance", "Flail", "Morningstar", "Trident"
-                                    ]
-                                
-                                selected_weapon = st.selectbox(
-                                    "Weapon:",
-                                    weapon_names,
-                                    key=f"weapon_expertise_select_{i}"
+                                    st.error(result["message"])
+                        else:
+                            st.caption("You already have all available fighting styles.")
+
+            # ===== BONUS FEAT =====
+            if pending.get("bonus_feat"):
+                with st.expander(f"🎖️ Bonus Feat ({c.get('pending_bonus_feat', 0)} to choose)", expanded=True, key=f"pending_exp_bonus_feat_{i}", on_change="rerun") as section:
+                    if section.open:  # skip the SRD filtering while collapsed
+                        from src.leveling import get_available_bonus_feats, apply_bonus_feat, check_feat_prerequisites
+
+                        available_bonus = get_available_bonus_feats(c, feats)
+
+                        # Sort by whether prerequisites are met
+                        available_bonus.sort(key=lambda x: (not x["meets_prerequisites"], x["feat"]["name"]))
+
+                        if available_bonus:
+                            # Show feats with prerequisites met first
+                            valid_feats = [f for f in available_bonus if f["meets_prerequisites"]]
+                            invalid_feats = [f for f in available_bonus if not f["meets_prerequisites"]]
+
+                            st.markdown("**Feats you qualify for:**")
+                            if valid_feats:
+                                entry_by_name = {f["feat"]["name"]: f for f in valid_feats}
+                                feat_options = list(entry_by_name)
+                                selected_feat = st.selectbox(
+                                    "Choose a feat:",
+                                    feat_options,
+                                    key=f"bonus_feat_select_{i}"
                                 )
-                                
-                                if selected_weapon:
-                                    st.success(f"✅ **{selected_weapon}**: +1 attack, reroll 1s on damage")
-                                    
-                                    if st.button("Confirm Weapon Expertise", key=f"confirm_expertise_{i}"):
-                                        c["weapon_expertise"] = selected_weapon
-                                        c["pending_weapon_expertise"] = False
-                                        
-                                        # Re-apply class features to update bonuses
-                                        add_level1_class_resources_and_actions(c)
-                                        
-                                        # Refresh attacks to apply expertise bonus
-                                        refresh_attacks_from_equipment(c)
-                                        
-                                        st.toast(f"✅ Gained Weapon Expertise with {selected_weapon}!")
-                                        st.rerun()
-                
-                # ========== COMPANIONS & WILD SHAPE SECTION ==========
-                companions = c.get("companions", [])
-                wild_shape_active = c.get("wild_shape_active", False)
-                
-                # Show companions section if character has any or can have them
-                char_class = c.get("class", "").lower()
-                char_classes_list = [cc.get("class_id", "").lower() for cc in c.get("classes", [])]
-                has_companion_class = "ranger" in char_classes_list or "wizard" in char_classes_list or char_class in ["ranger", "wizard"]
-                has_wild_shape = "druid" in char_classes_list or char_class == "druid"
-                
-                if companions or has_companion_class or has_wild_shape:
-                    with box.expander("🐾 Companions & Wild Shape"):
-                        
-                        # ===== WILD SHAPE (Druid) =====
-                        if has_wild_shape:
-                            st.markdown("#### 🌿 Wild Shape")
-                            
-                            if wild_shape_active:
-                                # Currently in Wild Shape
-                                form_name = c.get("wild_shape_form", "Unknown")
-                                ws_hp = c.get("wild_shape_hp", c.get("hp", 1))
-                                ws_max_hp = c.get("wild_shape_max_hp", ws_hp)
-                                
-                                st.success(f"**Currently transformed into: {form_name}**")
-                                
-                                ws_col1, ws_col2, ws_col3 = st.columns([2, 2, 2])
-                                with ws_col1:
-                                    st.metric("Beast HP", f"{ws_hp}/{ws_max_hp}")
-                                with ws_col2:
-                                    st.metric("AC", c.get("ac", 10))
-                                with ws_col3:
-                                    st.metric("Speed", f"{c.get('speed_ft', 30)} ft")
-                                
-                                # Show beast attacks
-                                beast_attacks = c.get("attacks", [])
-                                if beast_attacks:
-                                    st.markdown("**Beast Attacks:**")
-                                    for atk in beast_attacks:
-                                        st.caption(f"• {atk.get('name', 'Attack')}: +{atk.get('to_hit', 0)} to hit, {atk.get('damage', '1d4')} {atk.get('damage_type', '')}")
-                                
-                                if st.button("🔄 Revert to Normal Form", key=f"revert_ws_{i}"):
-                                    revert_wild_shape(c)
-                                    st.toast(f"{c.get('name', 'Character')} reverts to their normal form!")
-                                    st.rerun()
-                            else:
-                                # Can transform
-                                ws_uses = c.get("resources", {}).get("Wild Shape", {}).get("current", 0)
-                                max_cr = c.get("wild_shape_max_cr", 0.25)
-                                druid_level = c.get("level", 1)
-                                
-                                # Determine restrictions
-                                allow_fly = druid_level >= 8
-                                allow_swim = druid_level >= 3
-                                
-                                st.caption(f"Uses: {ws_uses} | Max CR: {max_cr} | {'Fly allowed' if allow_fly else 'No fly'} | {'Swim allowed' if allow_swim else 'No swim'}")
-                                
-                                if ws_uses > 0:
-                                    # Get available beasts
-                                    available_beasts = get_beasts_by_cr(max_cr, allow_fly, allow_swim)
-                                    beast_names = [b.get("name", "") for b in available_beasts]
-                                    
-                                    if beast_names:
-                                        selected_beast = st.selectbox(
-                                            "Transform into:",
-                                            beast_names,
-                                            key=f"ws_beast_select_{i}"
-                                        )
-                                        
-                                        # Show preview
-                                        selected_beast_data = next((b for b in available_beasts if b.get("name") == selected_beast), None)
-                                        if selected_beast_data:
-                                            preview_col1, preview_col2 = st.columns(2)
-                                            with preview_col1:
-                                                hp_str = selected_beast_data.get("Hit Points", selected_beast_data.get("hp", "10"))
-                                                hp_match = re.match(r"(\d+)", str(hp_str))
-                                                preview_hp = int(hp_match.group(1)) if hp_match else 10
-                                                st.caption(f"HP: {preview_hp}")
-                                                
-                                                ac_str = selected_beast_data.get("Armor Class", selected_beast_data.get("ac", "10"))
-                                                ac_match = re.match(r"(\d+)", str(ac_str))
-                                                preview_ac = int(ac_match.group(1)) if ac_match else 10
-                                                st.caption(f"AC: {preview_ac}")
-                                            with preview_col2:
-                                                st.caption(f"Speed: {selected_beast_data.get('Speed', selected_beast_data.get('speed', '30 ft.'))}")
-                                                st.caption(f"STR: {selected_beast_data.get('STR', 10)} DEX: {selected_beast_data.get('DEX', 10)}")
-                                        
-                                        if st.button("🐻 Transform!", key=f"transform_ws_{i}"):
-                                            apply_wild_shape(c, selected_beast)
-                                            # Use a Wild Shape resource
-                                            c.setdefault("resources", {}).setdefault("Wild Shape", {})["current"] = ws_uses - 1
-                                            st.toast(f"{c.get('name', 'Character')} transforms into a {selected_beast}!")
-                                            st.rerun()
-                                    else:
-                                        st.caption("No valid beast forms available.")
-                                else:
-                                    st.warning("No Wild Shape uses remaining. Rest to regain uses.")
-                            
-                            st.markdown("---")
-                        
-                        # ===== COMPANIONS (Ranger/Wizard) =====
-                        if companions:
-                            st.markdown("#### 🐺 Active Companions")
-                            
-                            for comp_idx, comp in enumerate(companions):
-                                comp_type = comp.get("companion_type", "companion")
-                                comp_name = comp.get("name", "Unknown")
-                                comp_hp = comp.get("hp", 1)
-                                comp_max_hp = comp.get("max_hp", comp_hp)
-                                
-                                comp_box = st.container(border=True)
-                                with comp_box:
-                                    comp_col1, comp_col2, comp_col3, comp_col4 = st.columns([3, 2, 2, 1])
-                                    
-                                    with comp_col1:
-                                        icon = "🦉" if comp_type == "familiar" else "🐺"
-                                        st.markdown(f"{icon} **{comp_name}**")
-                                        st.caption(f"({comp.get('base_creature', 'Unknown')})")
-                                    
-                                    with comp_col2:
-                                        new_hp = st.number_input(
-                                            "HP",
-                                            min_value=0,
-                                            max_value=comp_max_hp,
-                                            value=comp_hp,
-                                            key=f"comp_hp_{i}_{comp_idx}"
+
+                                # Show feat details
+                                feat_entry = entry_by_name.get(selected_feat)
+                                if feat_entry:
+                                    feat_data = feat_entry["feat"]
+                                    st.caption(feat_data.get("description", ""))
+
+                                    # Show prerequisites
+                                    prereqs = feat_data.get("prerequisites", [])
+                                    if prereqs:
+                                        prereq_strs = []
+                                        for p in prereqs:
+                                            if isinstance(p, dict):
+                                                for k, v in p.items():
+                                                    prereq_strs.append(f"{k} {v}")
+                                        if prereq_strs:
+                                            st.caption(f"✅ **Prerequisites:** {', '.join(prereq_strs)}")
+
+                                    # Handle ability choice if needed
+                                    ability_choice = None
+                                    ability_increase = feat_data.get("ability_increase", {})
+                                    if ability_increase and "choice" in ability_increase:
+                                        choices = ability_increase["choice"]
+                                        amount = ability_increase.get("amount", 1)
+                                        ability_choice = st.selectbox(
+                                            f"Choose ability to increase (+{amount}):",
+                                            choices,
+                                            format_func=_ability_preview(choices, char_abilities, amount).__getitem__,
+                                            key=f"bonus_feat_ability_{i}"
                                         )
-                                        comp["hp"] = new_hp
-                                    
-                                    with comp_col3:
-                                        st.metric("AC", comp.get("ac", 10))
-                                    
-                                    with comp_col4:
-                                        if st.button("❌", key=f"rm_comp_{i}_{comp_idx}"):
-                                            c["companions"].remove(comp)
-                                            st.rerun()
-                                    
-                                    # Show companion attacks
-                                    comp_attacks = comp.get("attacks", [])
-                                    if comp_attacks:
-                                        st.markdown("**Attacks:**")
-                                        for atk in comp_attacks:
-                                            st.caption(f"• {atk.get('name', 'Attack')}: +{atk.get('to_hit', 0)} to hit, {atk.get('damage', '1d4')} {atk.get('damage_type', '')}")
-                        
-                        # ===== ADD COMPANION (if eligible) =====
-                        if has_companion_class and not any(comp.get("companion_type") in ["animal_companion", "familiar"] for comp in companions):
-                            st.markdown("#### ➕ Summon Companion")
-                            
-                            if "ranger" in char_classes_list or char_class == "ranger":
-                                # Ranger Animal Companion selection
-                                ranger_level = next((cc.get("level", 0) for cc in c.get("classes", []) if cc.get("class_id", "").lower() == "ranger"), c.get("level", 1))
-                                if ranger_level >= 3:
-                                    max_cr = max(1, ranger_level // 3)
-                                    available_beasts = get_beasts_by_cr(max_cr, allow_fly=True, allow_swim=True)
-                                    beast_names = [b.get("name", "") for b in available_beasts]
-                                    
-                                    selected_companion = st.selectbox(
-                                        "Choose Animal Companion:",
-                                        beast_names,
-                                        key=f"select_animal_comp_{i}"
-                                    )
-                                    
-                                    if st.button("🐺 Summon Companion", key=f"summon_comp_{i}"):
-                                        new_comp = create_animal_companion(c, selected_companion)
-                                        if new_comp:
-                                            c.setdefault("companions", []).append(new_comp)
-                                            c["ranger_companion_type"] = selected_companion
-                                            st.toast(f"Summoned {new_comp.get('name', 'companion')}!")
+
+                                    if st.button("Take Bonus Feat", key=f"apply_bonus_feat_{i}"):
+                                        result = apply_bonus_feat(c, selected_feat, feat_data, ability_choice)
+                                        if result["success"]:
+                                            add_level1_class_resources_and_actions(c)
+                                            st.toast(f"✅ {result['message']}")
                                             st.rerun()
-                                else:
-                                    st.caption("Reach Ranger level 3 to gain an Animal Companion.")
-                            
-                            if "wizard" in char_classes_list or char_class == "wizard":
-                                # Wizard Familiar selection
-                                familiar_options = get_familiar_options()
-                                familiar_names = [f.get("name", "") for f in familiar_options]
-                                
-                                selected_familiar = st.selectbox(
-                                    "Choose Familiar:",
-                                    familiar_names,
-                                    key=f"select_familiar_{i}"
-                                )
-                                
-                                if st.button("🦉 Summon Familiar", key=f"summon_fam_{i}"):
-                                    new_fam = create_familiar(c, selected_familiar)
-                                    if new_fam:
-                                        c.setdefault("companions", []).append(new_fam)
-                                        c["wizard_familiar_type"] = selected_familiar
-                                        st.toast(f"Summoned {new_fam.get('name', 'familiar')}!")
-                                        st.rerun()
-                    
-                    # ========== AWARD XP SECTION ==========
-                    st.markdown("---")
-                    st.markdown("#### 🎁 Award XP")
-                    
-                    # XP Amount
-                    xp_amount = st.number_input(
-                        "XP Amount",
-                        min_value=0,
-                        value=0,
-                        step=50,
-                        key=f"award_xp_amt_{i}",
-                        help="Amount of experience points to award"
-                    )
-                    
-                    # Source dropdown and reason
-                    xp_src_col, xp_reason_col = st.columns([1, 2])
-                    with xp_src_col:
-                        xp_source = st.selectbox(
-                            "Source",
-                            ["combat", "quest", "milestone", "roleplay", "manual"],
-                            format_func=lambda x: {
-                                "combat": "⚔️ Combat",
-                                "quest": "📜 Quest",
-                                "milestone": "🏆 Milestone",
-                                "roleplay": "🎭 Roleplay",
-                                "manual": "✏️ Manual"
-                            }.get(x, x),
-                            key=f"award_xp_src_{i}"
+                                        else:
+                                            st.error(result["message"])
+                            else:
+                                st.caption("No feats available that you qualify for.")
+
+                            # Show unavailable feats
+                            if invalid_feats:
+                                with st.expander("Feats you don't qualify for"):
+                                    # First 10, rendered as one markdown block
+                                    st.markdown("\n\n".join(
+                                        f"**{f['feat']['name']}** - Missing: {', '.join(f['unmet_prerequisites'])}"
+                                        for f in invalid_feats[:10]
+                                    ))
+                        else:
+                            st.caption("No bonus feats available.")
+
+            # ===== WARLOCK INVOCATIONS =====
+            if pending.get("invocations"):
+                invocations_to_choose = c.get("pending_invocations", 0)
+                with st.expander(f"🌙 Eldritch Invocations ({invocations_to_choose} to choose)", expanded=True):
+                    current_invocations = c.get("warlock_invocations", [])
+                    char_level = c.get("level", 1)
+                    pact_boon = c.get("warlock_pact_boon", "")
+
+                    # Get available invocations based on level and prerequisites
+                    char_spells = c.get("spells", {})
+                    has_eldritch_blast = "Eldritch Blast" in char_spells.get("cantrips", []) or "Eldritch Blast" in char_spells
+                    inv_names = []
+                    for inv_name in _unlearned(_WARLOCK_INVOCATION_NAMES, current_invocations):
+                        inv_data = WARLOCK_INVOCATIONS[inv_name]
+
+                        # Check level requirement
+                        if char_level < inv_data.get("level", 1):
+                            continue
+
+                        # Check prerequisites
+                        prereq = inv_data.get("prereq")
+                        if prereq:
+                            required_pact = _INVOCATION_PACT_PREREQS.get(prereq)
+                            if required_pact:
+                                if pact_boon != required_pact:
+                                    continue
+                            elif "Eldritch Blast" in prereq and not has_eldritch_blast:
+                                continue
+
+                        inv_names.append(inv_name)
+
+                    if inv_names:
+                        selected_invocations = st.multiselect(
+                            f"Choose {invocations_to_choose} invocation(s):",
+                            _picker_options(inv_names, f"invocation_filter_{i}"),
+                            max_selections=invocations_to_choose,
+                            key=f"invocation_select_{i}"
                         )
-                    with xp_reason_col:
-                        xp_reason = st.text_input(
-                            "Reason/Description",
-                            placeholder="e.g., Defeated goblin ambush",
-                            key=f"award_xp_reason_{i}",
-                            label_visibility="collapsed"
+
+                        # Show descriptions for selected
+                        if selected_invocations:
+                            for inv_name in selected_invocations:
+                                st.caption(_INVOCATION_CAPTIONS[inv_name])
+
+                        if st.button("Learn Invocations", key=f"learn_invocations_{i}", 
+                                disabled=len(selected_invocations) != invocations_to_choose):
+                            # Apply invocations
+                            c["warlock_invocations"] = current_invocations + selected_invocations
+                            c["pending_invocations"] = 0
+
+                            # Re-apply invocation effects
+                            add_level1_class_resources_and_actions(c)
+
+                            st.toast(f"✅ Learned {len(selected_invocations)} invocation(s)!")
+                            st.rerun()
+                    else:
+                        st.caption("No invocations available (check prerequisites or level).")
+
+            # ===== PACT BOON =====
+            if pending.get("pact_boon"):
+                with st.expander("📜 Pact Boon (Level 3)", expanded=True):
+                    # Labels carry the descriptions, so the pick can wait for submit
+                    with st.form(f"pact_boon_form_{i}"):
+                        selected_pact = st.radio(
+                            "Choose your Pact Boon:",
+                            _PACTS,
+                            format_func=_PACT_BOON_LABELS.__getitem__,
+                            key=f"pact_boon_select_{i}",
+                            horizontal=False
                         )
-                    
-                    # Award button
-                    if st.button("Award XP", key=f"award_xp_btn_{i}", disabled=xp_amount <= 0, use_container_width=True):
-                        result = award_xp(c, xp_amount, reason=xp_reason or xp_source.capitalize(), source=xp_source)
-                        if result["leveled_up"]:
-                            st.toast(f"🎉 {c.get('name', 'Character')} gained {xp_amount:,} XP and can now level up!")
-                        else:
-                            st.toast(f"✨ {c.get('name', 'Character')} gained {xp_amount:,} XP!")
+                        choose_pact = st.form_submit_button("Choose Pact Boon")
+
+                    if choose_pact:
+                        c["warlock_pact_boon"] = selected_pact
+                        c["pending_pact_boon"] = False
+
+                        # Apply pact boon effects
+                        add_level1_class_resources_and_actions(c)
+
+                        st.toast(f"✅ Chose Pact of the {selected_pact}!")
                         st.rerun()
-                    
-                    # ========== XP HISTORY ==========
-                    xp_log = c.get("xp_log", [])
-                    if xp_log:
-                        with st.expander("📜 XP History", expanded=False):
-                            for entry in reversed(xp_log[-10:]):
-                                ts = entry.get("timestamp", "")[:10]
-                                amt = entry.get("amount", 0)
-                                reason = entry.get("reason", "")
-                                source = entry.get("source", "")
-                                sign = "+" if amt >= 0 else ""
-                                
-                                source_icon = {
-                                    "combat": "⚔️",
-                                    "quest": "📜",
-                                    "milestone": "🏆",
-                                    "roleplay": "🎭",
-                                    "manual": "✏️",
-                                    "dm_award": "👑"
-                                }.get(source, "•")
-                                
-                                st.caption(f"{source_icon} {ts}: {sign}{amt:,} XP — {reason}")
 
-        # ========== ENEMIES SECTION (still in left_col) ==========
-    st.markdown("### 👹 Enemies")
-    with st.container(height=320, border=True):  
-        if not st.session_state.enemies:
-            st.info("🕊️ No enemies in encounter. Add enemies from Setup or use the controls below.")
-            # reminder: if this grows large, consider paging or filters by type/CR.
-        else:
-            for i, e in enumerate(st.session_state.enemies):
-                card = st.container(border=True)
-                h1, h2, h3, h4, h5 = card.columns([3,2,2,2,2])
-                with h1: st.markdown(f"**{e.get('name','')}**")
-                with h2: e["ac"] = int(st.number_input("AC", 0, 40, int(e.get("ac",10)), key=f"e_ac_{i}"))
-                with h3: e["hp"] = int(st.number_input("HP", 0, 500, int(e.get("hp",10)), key=f"e_hp_{i}"))
-                with h4:
-                    # Position band dropdown (only during combat)
-                    if st.session_state.in_combat:
-                        current_band = ensure_position_band(e)
-                        band_idx = POSITION_BANDS.index(current_band) if current_band in POSITION_BANDS else 1
-                        new_band = st.selectbox(
-                            "Pos",
-                            POSITION_BANDS,
-                            index=band_idx,
-                            key=f"e_band_{i}",
-                            format_func=lambda b: get_band_display(b)
+            # ===== FIGHTER MANEUVERS =====
+            if pending.get("maneuvers"):
+                _render_maneuver_learning(c, i, "maneuvers")
+
+            # ===== SORCERER METAMAGIC =====
+            if pending.get("metamagic"):
+                metamagic_to_choose = c.get("pending_metamagic", 0)
+                with st.expander(f"✨ Metamagic ({metamagic_to_choose} to choose)", expanded=True):
+                    current_metamagic = c.get("sorcerer_metamagic", [])
+
+                    # Get available metamagic
+                    meta_names = _unlearned(_SORCERER_METAMAGIC_NAMES, current_metamagic)
+
+                    if meta_names:
+                        selected_metamagic = st.multiselect(
+                            f"Choose {metamagic_to_choose} metamagic option(s):",
+                            _picker_options(meta_names, f"metamagic_filter_{i}"),
+                            max_selections=metamagic_to_choose,
+                            key=f"metamagic_select_{i}"
                         )
-                        e["position_band"] = new_band
+
+                        # Show descriptions for selected
+                        if selected_metamagic:
+                            st.markdown("**Selected Metamagic:**")
+                            for m_name in selected_metamagic:
+                                st.caption(_METAMAGIC_CAPTIONS[m_name])
+
+                        if st.button("Learn Metamagic", key=f"learn_metamagic_{i}", 
+                                disabled=len(selected_metamagic) != metamagic_to_choose):
+                            # Apply metamagic
+                            c["sorcerer_metamagic"] = current_metamagic + selected_metamagic
+                            c["pending_metamagic"] = 0
+
+                            # Re-apply metamagic actions
+                            add_level1_class_resources_and_actions(c)
+
+                            st.toast(f"✅ Learned {len(selected_metamagic)} metamagic option(s)!")
+                            st.rerun()
                     else:
-                        st.caption("—")
-                with h5:
-                    if st.button("Remove", key=f"e_rm_{i}"):
-                        # Track defeated enemy for XP calculation
-                        if st.session_state.in_combat:
-                            if "combat_defeated_enemies" not in st.session_state:
-                                st.session_state.combat_defeated_enemies = []
-                            st.session_state.combat_defeated_enemies.append(e.copy())
-                        del st.session_state.enemies[i]
+                        st.caption("All metamagic options already learned.")
+
+            # ===== WIZARD SCHOOL =====
+            if pending.get("wizard_school"):
+                with st.expander(f"📚 Arcane School (Choose 1)", expanded=True):
+                    st.markdown("**Choose Your School of Magic:**")
+
+                    selected_school = st.selectbox(
+                        "Arcane School:",
+                        _WIZARD_SCHOOL_NAMES,
+                        key=f"wizard_school_select_{i}"
+                    )
+
+                    # Show school details
+                    school_data = WIZARD_SCHOOLS.get(selected_school, {})
+                    st.caption(school_data.get("description", ""))
+
+                    if st.button("Choose School", key=f"choose_school_{i}"):
+                        c["wizard_school"] = selected_school
+                        c["pending_wizard_school"] = False
+
+                        # Re-apply school effects
+                        add_level1_class_resources_and_actions(c)
+
+                        st.toast(f"✅ Specialized in {selected_school}!")
                         st.rerun()
-                with card.expander("Stat & Actions"):
-                    name = e.get("name", "Enemy")
-                    ac = e.get("ac", 10)
-                    hp = e.get("hp", 10)
-                    st.write(f"{name}: AC {ac}, HP {hp}")
-
-                    # Check if already hydrated - avoids expensive SRD lookup every render
-                    is_hydrated = e.get("_hydrated", False)
-                    
-                    # Show Sync button if not hydrated
-                    if not is_hydrated:
-                        # Look up SRD entry (by name or src)
-                        base_name = str(name).split("#")[0].strip()
-                        srd = next(
-                            (
-                                m for m in st.session_state.get("srd_enemies", [])
-                                if m.get("name") == name
-                                or m.get("name") == e.get("src")
-                                or m.get("name") == base_name
-                            ),
-                            None,
+
+            # ===== PALADIN DIVINE VOW =====
+            if pending.get("divine_vow"):
+                with st.expander(f"⚔️ Divine Vow (Choose 1)", expanded=True):
+                    st.markdown("**Choose Your Sacred Oath:**")
+
+                    selected_vow = st.selectbox(
+                        "Divine Vow:",
+                        _DIVINE_VOW_NAMES,
+                        key=f"divine_vow_select_{i}"
+                    )
+
+                    # Show vow details
+                    vow_data = PALADIN_DIVINE_VOWS.get(selected_vow, {})
+                    st.caption(vow_data.get("description", ""))
+
+                    st.markdown("**Features:**")
+                    for feat in vow_data.get("features", []):
+                        st.caption(f"• {feat}")
+
+                    if st.button("Take Vow", key=f"take_vow_{i}"):
+                        c["paladin_divine_vow"] = selected_vow
+                        c["pending_divine_vow"] = False
+
+                        # Re-apply vow effects
+                        add_level1_class_resources_and_actions(c)
+
+                        st.toast(f"✅ Swore the Vow of {selected_vow}!")
+                        st.rerun()
+
+            # ===== BARBARIAN PRIMAL TALENTS =====
+            if pending.get("primal_talents"):
+                talents_to_choose = c.get("pending_primal_talents", 0)
+                with st.expander(f"💪 Primal Talents ({talents_to_choose} to choose)", expanded=True):
+                    current_talents = c.get("barbarian_primal_talents", [])
+
+                    # Get available talents (check prerequisites)
+                    talent_names = _unlocked_talents(set(current_talents))
+
+                    if talent_names:
+                        selected_talents = st.multiselect(
+                            f"Choose {talents_to_choose} primal talent(s):",
+                            _picker_options(talent_names, f"primal_talent_filter_{i}"),
+                            max_selections=talents_to_choose,
+                            key=f"primal_talent_select_{i}"
                         )
 
-                        if srd:
-                            if st.button("🔄 Sync From SRD", key=f"sync_srd_{i}"):
-                                # Hydrate this encounter enemy from SRD
-                                keep_name = e.get("name", srd.get("name", "Enemy"))
-                                keep_conditions = e.get("conditions", [])
-                                keep_position = e.get("position_band", "near")
-                                st.session_state.enemies[i] = {
-                                    **srd,
-                                    "name": keep_name,
-                                    "hp": int(e.get("hp", srd.get("hp", 10))),
-                                    "max_hp": int(e.get("max_hp", srd.get("max_hp", srd.get("hp", 10)))),
-                                    "ac": int(e.get("ac", srd.get("ac", 10))),
-                                    "conditions": keep_conditions,
-                                    "position_band": keep_position,
-                                    "_hydrated": True,  # Mark as hydrated
-                                }
-                                st.toast(f"Synced {keep_name} from SRD")
+                        # Show descriptions for selected
+                        if selected_talents:
+                            st.markdown("**Selected Talents:**")
+                            for t_name in selected_talents:
+                                st.caption(_PRIMAL_TALENT_CAPTIONS[t_name])
+
+                        if st.button("Learn Primal Talents", key=f"learn_talents_{i}", 
+                                disabled=len(selected_talents) != talents_to_choose):
+                            # Apply talents
+                            c["barbarian_primal_talents"] = current_talents + selected_talents
+                            c["pending_primal_talents"] = 0
+
+                            # Re-apply talent effects
+                            add_level1_class_resources_and_actions(c)
+
+                            st.toast(f"✅ Learned {len(selected_talents)} primal talent(s)!")
+                            st.rerun()
+                    else:
+                        st.caption("All primal talents already learned or prerequisites not met.")
+
+            # ===== MARSHAL MANEUVERS =====
+            if pending.get("marshal_maneuvers"):
+                _render_maneuver_learning(c, i, "marshal_maneuvers")
+
+            # ===== KNIGHT MANEUVERS =====
+            if pending.get("knight_maneuvers"):
+                _render_maneuver_learning(c, i, "knight_maneuvers")
+
+            # ===== WEAPON EXPERTISE (Fighter Level 6) =====
+            if pending.get("weapon_expertise"):
+                with st.expander("⚔️ Weapon Expertise (Choose 1 Weapon)", expanded=True):
+                    st.markdown("**Choose a weapon for Weapon Expertise:**")
+                    st.caption("You gain +1 to attack rolls and can reroll 1s on damage dice with this weapon.")
+
+                    # Get weapons from equipment
+                    equipment = c.get("equipment", [])
+                    attacks = c.get("attacks", [])
+
+                    # Weapon attacks, or common martial weapons if none are equipped
+                    weapon_names = [
+                        atk.get("name", "Unknown") for atk in attacks if atk.get("source") == "weapon"
+                    ] or _DEFAULT_EXPERTISE_WEAPONS
+
+                    selected_weapon = st.selectbox(
+                        "Weapon:",
+                        weapon_names,
+                        key=f"weapon_expertise_select_{i}"
+                    )
+
+                    if selected_weapon:
+                        st.success(f"✅ **{selected_weapon}**: +1 attack, reroll 1s on damage")
+
+                        if st.button("Confirm Weapon Expertise", key=f"confirm_expertise_{i}"):
+                            c["weapon_expertise"] = selected_weapon
+                            c["pending_weapon_expertise"] = False
+
+                            # Re-apply class features to update bonuses
+                            add_level1_class_resources_and_actions(c)
+
+                            # Refresh attacks to apply expertise bonus
+                            refresh_attacks_from_equipment(c)
+
+                            st.toast(f"✅ Gained Weapon Expertise with {selected_weapon}!")
+                            st.rerun()
+
+    # ========== COMPANIONS & WILD SHAPE SECTION ==========
+    companions = c.get("companions", [])
+    wild_shape_active = c.get("wild_shape_active", False)
+
+    # Show companions section if character has any or can have them
+    char_class = c.get("class", "").lower()
+    char_classes_list = [cc.get("class_id", "").lower() for cc in c.get("classes", [])]
+    has_companion_class = "ranger" in char_classes_list or "wizard" in char_classes_list or char_class in ["ranger", "wizard"]
+    has_wild_shape = "druid" in char_classes_list or char_class == "druid"
+
+    if companions or has_companion_class or has_wild_shape:
+        with box.expander("🐾 Companions & Wild Shape"):
+
+            # ===== WILD SHAPE (Druid) =====
+            if has_wild_shape:
+                st.markdown("#### 🌿 Wild Shape")
+
+                if wild_shape_active:
+                    # Currently in Wild Shape
+                    form_name = c.get("wild_shape_form", "Unknown")
+                    ws_hp = c.get("wild_shape_hp", c.get("hp", 1))
+                    ws_max_hp = c.get("wild_shape_max_hp", ws_hp)
+
+                    st.success(f"**Currently transformed into: {form_name}**")
+
+                    ws_col1, ws_col2, ws_col3 = st.columns([2, 2, 2])
+                    with ws_col1:
+                        st.metric("Beast HP", f"{ws_hp}/{ws_max_hp}")
+                    with ws_col2:
+                        st.metric("AC", c.get("ac", 10))
+                    with ws_col3:
+                        st.metric("Speed", f"{c.get('speed_ft', 30)} ft")
+
+                    # Show beast attacks
+                    beast_attacks = c.get("attacks", [])
+                    if beast_attacks:
+                        st.markdown("**Beast Attacks:**")
+                        for atk in beast_attacks:
+                            st.caption(f"• {atk.get('name', 'Attack')}: +{atk.get('to_hit', 0)} to hit, {atk.get('damage', '1d4')} {atk.get('damage_type', '')}")
+
+                    if st.button("🔄 Revert to Normal Form", key=f"revert_ws_{i}"):
+                        revert_wild_shape(c)
+                        st.toast(f"{c.get('name', 'Character')} reverts to their normal form!")
+                        st.rerun()
+                else:
+                    # Can transform
+                    ws_uses = c.get("resources", {}).get("Wild Shape", {}).get("current", 0)
+                    max_cr = c.get("wild_shape_max_cr", 0.25)
+                    druid_level = c.get("level", 1)
+
+                    # Determine restrictions
+                    allow_fly = druid_level >= 8
+                    allow_swim = druid_level >= 3
+
+                    st.caption(f"Uses: {ws_uses} | Max CR: {max_cr} | {'Fly allowed' if allow_fly else 'No fly'} | {'Swim allowed' if allow_swim else 'No swim'}")
+
+                    if ws_uses > 0:
+                        # Get available beasts
+                        available_beasts = get_beasts_by_cr(max_cr, allow_fly, allow_swim)
+                        beast_names = [b.get("name", "") for b in available_beasts]
+
+                        if beast_names:
+                            selected_beast = st.selectbox(
+                                "Transform into:",
+                                beast_names,
+                                key=f"ws_beast_select_{i}"
+                            )
+
+                            # Show preview
+                            selected_beast_data = next((b for b in available_beasts if b.get("name") == selected_beast), None)
+                            if selected_beast_data:
+                                preview_col1, preview_col2 = st.columns(2)
+                                with preview_col1:
+                                    hp_str = selected_beast_data.get("Hit Points", selected_beast_data.get("hp", "10"))
+                                    hp_match = _LEADING_INT_RE.match(str(hp_str))
+                                    preview_hp = int(hp_match.group(1)) if hp_match else 10
+                                    st.caption(f"HP: {preview_hp}")
+
+                                    ac_str = selected_beast_data.get("Armor Class", selected_beast_data.get("ac", "10"))
+                                    ac_match = _LEADING_INT_RE.match(str(ac_str))
+                                    preview_ac = int(ac_match.group(1)) if ac_match else 10
+                                    st.caption(f"AC: {preview_ac}")
+                                with preview_col2:
+                                    st.caption(f"Speed: {selected_beast_data.get('Speed', selected_beast_data.get('speed', '30 ft.'))}")
+                                    st.caption(f"STR: {selected_beast_data.get('STR', 10)} DEX: {selected_beast_data.get('DEX', 10)}")
+
+                            if st.button("🐻 Transform!", key=f"transform_ws_{i}"):
+                                apply_wild_shape(c, selected_beast)
+                                # Use a Wild Shape resource
+                                c.setdefault("resources", {}).setdefault("Wild Shape", {})["current"] = ws_uses - 1
+                                st.toast(f"{c.get('name', 'Character')} transforms into a {selected_beast}!")
                                 st.rerun()
-                            st.caption("Click to load full stats from SRD")
                         else:
-                            st.caption("No SRD data found for this monster.")
-                    
-                    # Display actions/attacks if available (whether hydrated or not)
-                    actions = e.get("actions", []) or []
-                    attacks = e.get("attacks", []) or []
+                            st.caption("No valid beast forms available.")
+                    else:
+                        st.warning("No Wild Shape uses remaining. Rest to regain uses.")
+
+                st.markdown("---")
+
+            # ===== COMPANIONS (Ranger/Wizard) =====
+            if companions:
+                st.markdown("#### 🐺 Active Companions")
+
+                for comp_idx, comp in enumerate(companions):
+                    comp_type = comp.get("companion_type", "companion")
+                    comp_name = comp.get("name", "Unknown")
+                    comp_hp = comp.get("hp", 1)
+                    comp_max_hp = comp.get("max_hp", comp_hp)
+
+                    comp_box = st.container(border=True)
+                    with comp_box:
+                        comp_col1, comp_col2, comp_col3, comp_col4 = st.columns([3, 2, 2, 1])
+
+                        with comp_col1:
+                            icon = "🦉" if comp_type == "familiar" else "🐺"
+                            st.markdown(f"{icon} **{comp_name}**")
+                            st.caption(f"({comp.get('base_creature', 'Unknown')})")
+
+                        with comp_col2:
+                            new_hp = st.number_input(
+                                "HP",
+                                min_value=0,
+                                max_value=comp_max_hp,
+                                value=comp_hp,
+                                key=f"comp_hp_{i}_{comp_idx}"
+                            )
+                            comp["hp"] = new_hp
 
-                    if actions:
-                        st.markdown("**Actions**")
-                        for a in actions:
-                            nm = a.get("name", "Action")
-                            desc = a.get("description", a.get("desc", ""))
-                            if desc:
-                                st.markdown(f"- **{nm}**: {desc}")
-                            else:
-                                st.markdown(f"- **{nm}**")
+                        with comp_col3:
+                            st.metric("AC", comp.get("ac", 10))
 
-                    if attacks:
-                        st.markdown("**Attacks**")
-                        for a in attacks:
-                            nm = a.get("name", "Attack")
-                            th = get_attack_to_hit(a)
-                            dmg = get_attack_damage(a)
-                            dt = get_attack_damage_type(a)
-                            line = f"- **{nm}** (+{th} to hit) — {dmg}"
-                            if dt:
-                                line += f" {dt}"
-                            st.markdown(line)
-
-                    specials = e.get("special_abilities", []) or []
-                    if specials:
-                        st.markdown("**Special Abilities**")
-                        for sa in specials:
-                            st.markdown(f"- **{sa.get('name','')}**: {sa.get('desc','')}")
-                
-                # --- Conditions panel for this enemy ---
-                with card.expander("Conditions"):
-                    conditions = ensure_conditions(e)
-                    
-                    if not conditions:
-                        st.caption("No active conditions.")
-                    else:
-                        for ci, cond in enumerate(conditions):
-                            cond_col1, cond_col2 = st.columns([4, 1])
-                            with cond_col1:
-                                st.write(get_condition_display(cond))
-                            with cond_col2:
-                                if st.button("✖", key=f"rm_cond_e_{i}_{ci}"):
-                                    conditions.pop(ci)
-                                    st.rerun()
-                    
-                    # Add condition form
-                    st.markdown("**Add Condition**")
-                    srd_cond_names = get_srd_condition_names()
-                    cond_options = srd_cond_names + ["(Custom)"]
-                    
-                    add_cond_col1, add_cond_col2 = st.columns([2, 1])
-                    with add_cond_col1:
-                        selected_cond = st.selectbox(
-                            "Condition",
-                            cond_options,
-                            key=f"add_cond_sel_e_{i}",
-                            label_visibility="collapsed"
-                        )
-                    with add_cond_col2:
-                        cond_duration = st.number_input(
-                            "Rounds",
-                            min_value=0,
-                            value=0,
-                            key=f"add_cond_dur_e_{i}",
-                            help="0 = indefinite"
-                        )
-                    
-                    if selected_cond == "(Custom)":
-                        custom_cond_name = st.text_input(
-                            "Custom Condition Name",
-                            key=f"add_cond_custom_e_{i}"
+                        with comp_col4:
+                            if st.button("❌", key=f"rm_comp_{i}_{comp_idx}"):
+                                c["companions"].remove(comp)
+                                add_level1_class_resources_and_actions(c)
+                                st.rerun()
+
+                        # Show companion attacks
+                        comp_attacks = comp.get("attacks", [])
+                        if comp_attacks:
+                            st.markdown("**Attacks:**")
+                            for atk in comp_attacks:
+                                st.caption(f"• {atk.get('name', 'Attack')}: +{atk.get('to_hit', 0)} to hit, {atk.get('damage', '1d4')} {atk.get('damage_type', '')}")
+
+            # ===== ADD COMPANION (if eligible) =====
+            if has_companion_class and not any(comp.get("companion_type") in ["animal_companion", "familiar"] for comp in companions):
+                st.markdown("#### ➕ Summon Companion")
+
+                if "ranger" in char_classes_list or char_class == "ranger":
+                    # Ranger Animal Companion selection
+                    ranger_level = next((cc.get("level", 0) for cc in c.get("classes", []) if cc.get("class_id", "").lower() == "ranger"), c.get("level", 1))
+                    if ranger_level >= 3:
+                        max_cr = max(1, ranger_level // 3)
+                        available_beasts = get_beasts_by_cr(max_cr, allow_fly=True, allow_swim=True)
+                        beast_names = [b.get("name", "") for b in available_beasts]
+
+                        selected_companion = st.selectbox(
+                            "Choose Animal Companion:",
+                            beast_names,
+                            key=f"select_animal_comp_{i}"
                         )
+
+                        if st.button("🐺 Summon Companion", key=f"summon_comp_{i}"):
+                            new_comp = create_animal_companion(c, selected_companion)
+                            if new_comp:
+                                c.setdefault("companions", []).append(new_comp)
+                                c["ranger_companion_type"] = selected_companion
+                                add_level1_class_resources_and_actions(c)
+                                st.toast(f"Summoned {new_comp.get('name', 'companion')}!")
+                                st.rerun()
                     else:
-                        custom_cond_name = None
-                    
-                    if st.button("Add Condition", key=f"add_cond_btn_e_{i}"):
-                        cond_name = custom_cond_name if selected_cond == "(Custom)" else selected_cond
-                        if cond_name:
-                            dur = cond_duration if cond_duration > 0 else None
-                            add_condition(e, cond_name, duration_rounds=dur)
-                            st.toast(f"Added {cond_name} to {e.get('name', 'enemy')}")
+                        st.caption("Reach Ranger level 3 to gain an Animal Companion.")
+
+                if "wizard" in char_classes_list or char_class == "wizard":
+                    # Wizard Familiar selection
+                    familiar_options = get_familiar_options()
+                    familiar_names = [f.get("name", "") for f in familiar_options]
+
+                    selected_familiar = st.selectbox(
+                        "Choose Familiar:",
+                        familiar_names,
+                        key=f"select_familiar_{i}"
+                    )
+
+                    if st.button("🦉 Summon Familiar", key=f"summon_fam_{i}"):
+                        new_fam = create_familiar(c, selected_familiar)
+                        if new_fam:
+                            c.setdefault("companions", []).append(new_fam)
+                            c["wizard_familiar_type"] = selected_familiar
+                            add_level1_class_resources_and_actions(c)
+                            st.toast(f"Summoned {new_fam.get('name', 'familiar')}!")
                             st.rerun()
-                        else:
-                            st.warning("Please enter a condition name.")
+
+        # ========== AWARD XP SECTION ==========
+        st.markdown("---")
+        st.markdown("#### 🎁 Award XP")
+
+        # XP Amount
+        xp_amount = st.number_input(
+            "XP Amount",
+            min_value=0,
+            value=0,
+            step=50,
+            key=f"award_xp_amt_{i}",
+            help="Amount of experience points to award"
+        )
+
+        # Source dropdown and reason
+        xp_src_col, xp_reason_col = st.columns([1, 2])
+        with xp_src_col:
+            xp_source = st.selectbox(
+                "Source",
+                ["combat", "quest", "milestone", "roleplay", "manual"],
+                format_func=lambda x: {
+                    "combat": "⚔️ Combat",
+                    "quest": "📜 Quest",
+                    "milestone": "🏆 Milestone",
+                    "roleplay": "🎭 Roleplay",
+                    "manual": "✏️ Manual"
+                }.get(x, x),
+                key=f"award_xp_src_{i}"
+            )
+        with xp_reason_col:
+            xp_reason = st.text_input(
+                "Reason/Description",
+                placeholder="e.g., Defeated goblin ambush",
+                key=f"award_xp_reason_{i}",
+                label_visibility="collapsed"
+            )
+
+        # Award button
+        if st.button("Award XP", key=f"award_xp_btn_{i}", disabled=xp_amount <= 0, use_container_width=True):
+            result = award_xp(c, xp_amount, reason=xp_reason or xp_source.capitalize(), source=xp_source)
+            if result["leveled_up"]:
+                st.toast(f"🎉 {c.get('name', 'Character')} gained {xp_amount:,} XP and can now level up!")
+            else:
+                st.toast(f"✨ {c.get('name', 'Character')} gained {xp_amount:,} XP!")
+            st.rerun()
+
+        # ========== XP HISTORY ==========
+        xp_log = c.get("xp_log", [])
+        if xp_log:
+            with st.expander("📜 XP History", expanded=False):
+                for entry in reversed(xp_log[-10:]):
+                    ts = entry.get("timestamp", "")[:10]
+                    amt = entry.get("amount", 0)
+                    reason = entry.get("reason", "")
+                    source = entry.get("source", "")
+                    sign = "+" if amt >= 0 else ""
+
+                    source_icon = {
+                        "combat": "⚔️",
+                        "quest": "📜",
+                        "milestone": "🏆",
+                        "roleplay": "🎭",
+                        "manual": "✏️",
+                        "dm_award": "👑"
+                    }.get(source, "•")
+
+                    st.caption(f"{source_icon} {ts}: {sign}{amt:,} XP — {reason}")
+
+@st.fragment
+def _render_enemy_card(i):
+    """Running-session card for enemy i; a fragment, so edits rerun only this card."""
+    enemies = st.session_state.enemies
+    if i >= len(enemies):
+        return
+    e = enemies[i]
+    keys = _card_keys("e", i)
+    card = st.container(border=True)
+    h1, h2, h3, h4, h5 = card.columns([3,2,2,2,2])
+    with h1: st.markdown(f"**{e.get('name','')}**")
+    with h2: e["ac"] = int(st.number_input("AC", 0, 40, int(e.get("ac",10)), key=keys["ac"]))
+    with h3: e["hp"] = int(st.number_input("HP", 0, 500, int(e.get("hp",10)), key=keys["hp"]))
+    with h4:
+        # Position band dropdown (only during combat)
+        if st.session_state.in_combat:
+            current_band = ensure_position_band(e)
+            band_idx = BAND_ORDER.get(current_band, 1)
+            new_band = st.selectbox(
+                "Pos",
+                POSITION_BANDS,
+                index=band_idx,
+                key=keys["band"],
+                format_func=lambda b: get_band_display(b)
+            )
+            e["position_band"] = new_band
+        else:
+            st.caption("—")
+    with h5:
+        if st.button("Remove", key=keys["rm"]):
+            # Track defeated enemy for XP calculation
+            if st.session_state.in_combat:
+                if "combat_defeated_enemies" not in st.session_state:
+                    st.session_state.combat_defeated_enemies = []
+                st.session_state.combat_defeated_enemies.append(e.copy())
+            del st.session_state.enemies[i]
+            st.rerun()
+    with card.expander("Stat & Actions"):
+        name = e.get("name", "Enemy")
+        ac = e.get("ac", 10)
+        hp = e.get("hp", 10)
+        st.write(f"{name}: AC {ac}, HP {hp}")
+
+        # Check if already hydrated - avoids expensive SRD lookup every render
+        is_hydrated = e.get("_hydrated", False)
+
+        # Show Sync button if not hydrated
+        if not is_hydrated:
+            # Look up SRD entry (by name or src)
+            base_name = str(name).split("#")[0].strip()
+            srd_by_name = st.session_state.get("srd_enemy_by_name", {})
+            srd = srd_by_name.get(name) or srd_by_name.get(e.get("src")) or srd_by_name.get(base_name)
+
+            if srd:
+                if st.button("🔄 Sync From SRD", key=f"sync_srd_{i}"):
+                    # Hydrate this encounter enemy from SRD
+                    keep_name = e.get("name", srd.get("name", "Enemy"))
+                    keep_conditions = e.get("conditions", [])
+                    keep_position = e.get("position_band", "near")
+                    st.session_state.enemies[i] = {
+                        **copy.deepcopy(srd),  # srd is the shared cached record
+                        "name": keep_name,
+                        "hp": int(e.get("hp", srd.get("hp", 10))),
+                        "max_hp": int(e.get("max_hp", srd.get("max_hp", srd.get("hp", 10)))),
+                        "ac": int(e.get("ac", srd.get("ac", 10))),
+                        "conditions": keep_conditions,
+                        "position_band": keep_position,
+                        "_hydrated": True,  # Mark as hydrated
+                    }
+                    st.toast(f"Synced {keep_name} from SRD")
+                    st.rerun()
+                st.caption("Click to load full stats from SRD")
+            else:
+                st.caption("No SRD data found for this monster.")
+
+        # Display actions/attacks if available (whether hydrated or not)
+        actions = e.get("actions", []) or []
+        attacks = e.get("attacks", []) or []
+
+        if actions:
+            st.markdown("**Actions**")
+            for a in actions:
+                nm = a.get("name", "Action")
+                desc = a.get("description", a.get("desc", ""))
+                if desc:
+                    st.markdown(f"- **{nm}**: {desc}")
+                else:
+                    st.markdown(f"- **{nm}**")
+
+        if attacks:
+            st.markdown("**Attacks**")
+            for a in attacks:
+                nm = a.get("name", "Attack")
+                th = get_attack_to_hit(a)
+                dmg = get_attack_damage(a)
+                dt = get_attack_damage_type(a)
+                line = f"- **{nm}** (+{th} to hit) — {dmg}"
+                if dt:
+                    line += f" {dt}"
+                st.markdown(line)
+
+        specials = e.get("special_abilities", []) or []
+        if specials:
+            st.markdown("**Special Abilities**")
+            for sa in specials:
+                st.markdown(f"- **{sa.get('name','')}**: {sa.get('desc','')}")
+
+    # --- Conditions panel for this enemy ---
+    with card.expander("Conditions"):
+        conditions = ensure_conditions(e)
+
+        if not conditions:
+            st.caption("No active conditions.")
+        else:
+            for ci, cond in enumerate(conditions):
+                cond_col1, cond_col2 = st.columns([4, 1])
+                with cond_col1:
+                    st.write(get_condition_display(cond))
+                with cond_col2:
+                    if st.button("✖", key=f"rm_cond_e_{i}_{ci}"):
+                        conditions.pop(ci)
+                        st.rerun()
+
+        # Add condition form
+        st.markdown("**Add Condition**")
+        cond_options = get_condition_options()
+
+        add_cond_col1, add_cond_col2 = st.columns([2, 1])
+        with add_cond_col1:
+            selected_cond = st.selectbox(
+                "Condition",
+                cond_options,
+                key=keys["cond_sel"],
+                label_visibility="collapsed"
+            )
+        with add_cond_col2:
+            cond_duration = st.number_input(
+                "Rounds",
+                min_value=0,
+                value=0,
+                key=keys["cond_dur"],
+                help="0 = indefinite"
+            )
+
+        if selected_cond == "(Custom)":
+            custom_cond_name = st.text_input(
+                "Custom Condition Name",
+                key=keys["cond_custom"]
+            )
+        else:
+            custom_cond_name = None
+
+        if st.button("Add Condition", key=f"add_cond_btn_e_{i}"):
+            cond_name = custom_cond_name if selected_cond == "(Custom)" else selected_cond
+            if cond_name:
+                dur = cond_duration if cond_duration > 0 else None
+                add_condition(e, cond_name, duration_rounds=dur)
+                st.toast(f"Added {cond_name} to {e.get('name', 'enemy')}")
+                st.rerun()
+            else:
+                st.warning("Please enter a condition name.")
+
+
+# ===== LEFT COLUMN: Party + Enemies =====
+with left_col:
+    # ========== PARTY SECTION ==========
+    st.markdown("### 👥 Party")
+    with st.container(height=320, border=False):
+        if not st.session_state.party:
+            st.info("🧙 No party members yet. Go to **Setup** to add characters.")
+        else:
+            for i in range(len(st.session_state.party)):
+                _render_party_member(i)
+
+        # ========== ENEMIES SECTION (still in left_col) ==========
+    st.markdown("### 👹 Enemies")
+    with st.container(height=320, border=True):  
+        if not st.session_state.enemies:
+            st.info("🕊️ No enemies in encounter. Add enemies from Setup or use the controls below.")
+            # reminder: if this grows large, consider paging or filters by type/CR.
+        else:
+            for i in range(len(st.session_state.enemies)):
+                _render_enemy_card(i)
         
 # ===== RIGHT COLUMN: Combat Tracker + Attack Roller =====
 with tracker_col:
@@ -18475,11 +18450,10 @@ with tools_col:
             if not st.session_state.get("srd_enemies"):
                 st.warning("SRD bestiary not loaded.")
             else:
-                srd_names = [m["name"] for m in st.session_state.srd_enemies]
-                srd_pick = st.selectbox("Monster", srd_names, key="left_srd_pick")
+                srd_pick = st.selectbox("Monster", st.session_state.srd_enemy_names, key="left_srd_pick")
                 srd_qty = st.number_input("Quantity", 1, 10, 1, key="left_srd_qty")
                 if st.button("Add", key="left_add_srd_btn"):
-                    src = next((m for m in st.session_state.srd_enemies if m["name"] == srd_pick), None)
+                    src = st.session_state.srd_enemy_by_name.get(srd_pick)
                     if src:
                         for i in range(int(srd_qty)):
                             blob = json.loads(json.dumps(src))
@@ -18674,9 +18648,8 @@ with refs_col:
         if not st.session_state.get("srd_enemies"):
             st.info("📚 SRD Bestiary not loaded. Check that SRD_Monsters.json exists in the data folder.")
         else:
-            names = [m["name"] for m in st.session_state.srd_enemies]
-            pick = st.selectbox("View statblock", names, key="bestiary_pick")
-            sb = next((m for m in st.session_state.srd_enemies if m["name"] == pick), None)
+            pick = st.selectbox("View statblock", st.session_state.srd_enemy_names, key="bestiary_pick")
+            sb = st.session_state.srd_enemy_by_name.get(pick)
             if sb:
                     # Tolerant full stat renderer
                     name = sb.get("name","Unknown")
@@ -0,0 +1,448 @@
+"""
+Class feature catalogs for Virtual DM
+
+Static option tables for the class choices made at level-up:
+- Warlock invocations, Sorcerer metamagic, Wizard schools
+- Fighter, Marshal and Knight maneuvers
+- Paladin divine vows and Barbarian primal talents
+
+Kept out of the Streamlit script so the literals are built once per
+process instead of on every rerun.
+"""
+
+
+# ============================================================
+# WARLOCK ELDRITCH INVOCATIONS
+# ============================================================
+
+WARLOCK_INVOCATIONS = {
+    "Agonizing Blast": {"prereq": "Eldritch Blast cantrip", "level": 1, "description": "Add CHA mod to Eldritch Blast damage."},
+    "Armor of Shadows": {"prereq": None, "level": 1, "description": "Cast Mage Armor on yourself at will without slot."},
+    "Beast Speech": {"prereq": None, "level": 1, "description": "Cast Speak with Animals at will."},
+    "Beguiling Influence": {"prereq": None, "level": 1, "description": "Gain proficiency in Deception and Persuasion."},
+    "Devil's Sight": {"prereq": None, "level": 1, "description": "See normally in darkness (magical/nonmagical) to 120 feet."},
+    "Eldritch Sight": {"prereq": None, "level": 1, "description": "Cast Detect Magic at will."},
+    "Eldritch Spear": {"prereq": "Eldritch Blast cantrip", "level": 1, "description": "Eldritch Blast range becomes 300 feet."},
+    "Eyes of the Rune Keeper": {"prereq": None, "level": 1, "description": "Read all writing."},
+    "Fiendish Vigor": {"prereq": None, "level": 1, "description": "Cast False Life on yourself at will as 1st-level."},
+    "Mask of Many Faces": {"prereq": None, "level": 1, "description": "Cast Disguise Self at will."},
+    "Misty Visions": {"prereq": None, "level": 1, "description": "Cast Silent Image at will."},
+    "Repelling Blast": {"prereq": "Eldritch Blast cantrip", "level": 1, "description": "Eldritch Blast hits push target 10 feet."},
+    "Thief of Five Fates": {"prereq": None, "level": 1, "description": "Cast Bane once using a warlock spell slot; regain after long rest."},
+    "Mire the Mind": {"prereq": None, "level": 5, "description": "Cast Slow once using a warlock spell slot; regain after long rest."},
+    "One with Shadows": {"prereq": None, "level": 5, "description": "In dim light/darkness, become invisible until you move/act."},
+    "Sign of Ill Omen": {"prereq": None, "level": 5, "description": "Cast Bestow Curse once using a warlock spell slot; regain after long rest."},
+    "Thirsting Blade": {"prereq": "Pact of the Blade", "level": 5, "description": "Attack twice with pact weapon when you take Attack action."},
+    "Bewitching Whispers": {"prereq": None, "level": 7, "description": "Cast Compulsion once using a warlock spell slot; regain after long rest."},
+    "Dreadful Word": {"prereq": None, "level": 7, "description": "Cast Confusion once using a warlock spell slot; regain after long rest."},
+    "Sculptor of Flesh": {"prereq": None, "level": 7, "description": "Cast Polymorph once using a warlock spell slot; regain after long rest."},
+    "Ascendant Step": {"prereq": None, "level": 9, "description": "Cast Levitate on yourself at will without slot."},
+    "Minions of Chaos": {"prereq": None, "level": 9, "description": "Cast Conjure Elemental once using a warlock spell slot; regain after long rest."},
+    "Otherworldly Leap": {"prereq": None, "level": 9, "description": "Cast Jump on yourself at will."},
+    "Whispers of the Grave": {"prereq": None, "level": 9, "description": "Cast Speak with Dead at will."},
+    "Lifedrinker": {"prereq": "Pact of the Blade", "level": 12, "description": "Pact weapon hits deal extra necrotic damage equal to CHA mod."},
+    "Chains of Carceri": {"prereq": "Pact of the Chain", "level": 15, "description": "Cast Hold Monster at will on celestials, fiends, or elementals."},
+    "Master of Myriad Forms": {"prereq": None, "level": 15, "description": "Cast Alter Self at will."},
+    "Visions of Distant Realms": {"prereq": None, "level": 15, "description": "Cast Arcane Eye at will."},
+    "Witch Sight": {"prereq": None, "level": 15, "description": "See true form of shapechangers/illusioned creatures within 30 feet."},
+}
+
+# ============================================================
+# WIZARD SCHOOLS
+# ============================================================
+
+WIZARD_SCHOOLS = {
+    "General": {"description": "Broad magical study. Learn extra spells."},
+    "Abjuration": {"description": "Protective magic. Boost AC from abjuration spells."},
+    "Conjuration": {"description": "Summoning and teleportation. Reaction teleport."},
+    "Divination": {"description": "Knowledge and foresight. Fate-twisting dice."},
+    "Enchantment": {"description": "Mind control. Daze attackers."},
+    "Evocation": {"description": "Elemental destruction. Force attacks."},
+    "Illusion": {"description": "Deception and trickery. Bonus illusion cantrips."},
+    "Necromancy": {"description": "Death magic. Undead familiar."},
+    "Transmutation": {"description": "Transformation. Gain temp HP."},
+}
+
+# ============================================================
+# MARSHAL MANEUVERS
+# ============================================================
+
+MARSHAL_MANEUVERS = {
+    "Covering Advance": {
+        "type": "bonus",
+        "effect": "ally_movement",
+        "targets": "all_allies",
+        "description": "Allies in aura move 10 ft without provoking OA."
+    },
+    "Strike in Formation": {
+        "type": "reaction",
+        "timing": "on_hit",
+        "effect": "ally_attack",
+        "targets": "single_ally",
+        "description": "Ally makes reaction attack on your hit target. Add martial die to their damage."
+    },
+    "Banner of Defiance": {
+        "type": "bonus",
+        "effect": "temp_hp",
+        "targets": "all_allies",
+        "description": "Allies in aura gain temp HP = CHA mod + martial die."
+    },
+    "Shield the Line": {
+        "type": "reaction",
+        "timing": "ally_attacked",
+        "effect": "attack_penalty",
+        "targets": "single_ally",
+        "description": "Impose -CHA mod penalty on attack vs ally in aura."
+    },
+    "Break the Line": {
+        "type": "action",
+        "effect": "charge_and_prone",
+        "targets": "multiple_allies",
+        "save": "STR",
+        "description": "Allies move in straight line. Enemies adjacent at end must STR save or prone."
+    },
+    "Phalanx Reposition": {
+        "type": "reaction",
+        "timing": "enemy_approach",
+        "effect": "ally_shift",
+        "targets": "single_ally",
+        "description": "When enemy moves near ally, shift ally 5 ft without provoking."
+    },
+    "Mobile Defense": {
+        "type": "reaction",
+        "timing": "ally_moves",
+        "effect": "ac_bonus",
+        "targets": "single_ally",
+        "description": "Ally gains +martial die AC while moving."
+    },
+    "Suppressive Volley": {
+        "type": "action",
+        "effect": "no_reactions",
+        "targets": "single_enemy",
+        "save": "WIS",
+        "description": "Target WIS save or can't take Reactions until next turn."
+    },
+    "Inspiring Rally": {
+        "type": "bonus",
+        "effect": "save_reroll",
+        "targets": "single_ally",
+        "description": "Ally can reroll a failed saving throw, adding martial die to the new roll."
+    },
+    "Coordinated Strike": {
+        "type": "reaction",
+        "timing": "ally_hits",
+        "effect": "bonus_damage",
+        "targets": "single_ally",
+        "description": "When ally hits, add martial die to their damage."
+    },
+}
+
+# ============================================================
+# PALADIN DIVINE VOWS
+# ============================================================
+
+PALADIN_DIVINE_VOWS = {
+    "Conservation": {
+        "description": "Sworn to preserve the natural world and uphold the natural order.",
+        "features": [
+            "Lay on Hands heals plants and fey.",
+            "Speak with Animals at will.",
+            "Divine Smite works on aberrations.",
+        ],
+    },
+    "Protection": {
+        "description": "Sworn to safeguard others, especially the weak and vulnerable.",
+        "features": [
+            "Reaction: Reduce ally damage within 30 ft by CHA mod + level (uses Divine Smite).",
+            "+1 AC bonus.",
+            "Divine Smite works on any creature that harmed an ally in the last minute.",
+        ],
+    },
+    "Devotion": {
+        "description": "Sworn to purity, justice, and protection of the innocent.",
+        "features": [
+            "Bonus to saves vs Illusion and Enchantment.",
+            "Resistance to necrotic damage.",
+            "Divine Smite works on chaotic creatures.",
+        ],
+    },
+    "Vengeance": {
+        "description": "Sworn to retribution and swift justice against evildoers.",
+        "features": [
+            "+CHA mod to attack rolls against evil creatures.",
+            "Heal CHA mod HP when killing an evil creature.",
+            "Divine Smite works on any creature that harms you.",
+        ],
+    },
+}
+
+# ============================================================
+# BARBARIAN PRIMAL TALENTS
+# ============================================================
+
+BARBARIAN_PRIMAL_TALENTS = {
+    "Savage Leap": {"description": "Long jump without running start. +2 attack after 10 ft jump toward target."},
+    "Beast Strike": {"description": "While raging, Shove attempt as part of melee attack."},
+    "Ferocious Tenacity": {"description": "1/day while raging, CON save (DC 10 + half damage) to drop to 1 HP instead of 0."},
+    "Brutal Roar": {"description": "1/day, bonus action roar. Enemies within 10 ft WIS save or Frightened until end of next turn."},
+    "Scent": {"description": "Detect creatures within 30 ft by smell. Know direction of hidden creatures."},
+    "Resilient Hide": {"description": "While raging and unarmored, add CON mod to AC."},
+    "Deadly Momentum": {"description": "On kill, move half speed and make one attack. 1/turn."},
+    "Quick Temper": {"description": "Enter rage as immediate action CON mod times per day."},
+    "Improved Beast Strike": {"prerequisite": "Beast Strike", "description": "Beast Strike can knock prone AND push 5 ft."},
+    "Steel Gut": {"description": "Eat spoiled/toxic food safely. +CON mod to saves vs ingested poison."},
+    "Wound Rend": {"description": "While raging, crits cause bleeding (CON mod damage/turn until healed)."},
+    "Terrifying Glare": {"description": "1/day while raging, action to frighten one creature for 1 minute."},
+    "Raging Vitality": {"description": "While raging, gain level temp HP at start of each turn."},
+    "Grasping Strike": {"description": "While raging, bonus action grapple after melee hit."},
+}
+
+# ============================================================
+# SORCERER METAMAGIC
+# ============================================================
+
+SORCERER_METAMAGIC = {
+    "Quickened Spell": {"cost": 2, "description": "Cast a spell with casting time of 1 action as a bonus action instead."},
+    "Twinned Spell": {"cost": "spell_level", "description": "Target a second creature with a single-target spell. Cost = spell level (1 SP for cantrips)."},
+    "Empowered Spell": {"cost": 1, "description": "Reroll up to CHA mod damage dice. Must use new rolls."},
+    "Subtle Spell": {"cost": 1, "description": "Cast without verbal or somatic components."},
+    "Distant Spell": {"cost": 1, "description": "Double the range of a spell (touch becomes 30 ft)."},
+    "Extended Spell": {"cost": 1, "description": "Double the duration of a spell (max 24 hours)."},
+    "Heightened Spell": {"cost": 3, "description": "One target has -2 penalty on first save against the spell."},
+    "Careful Spell": {"cost": 1, "description": "Choose CHA mod creatures to auto-succeed on the spell's save."},
+}
+
+# ============================================================
+# FIGHTER MANEUVERS
+# ============================================================
+
+FIGHTER_MANEUVERS = {
+    "Focused Strike": {
+        "type": "attack_modifier",
+        "timing": "before_attack",
+        "effect": "to_hit_bonus",
+        "description": "Add martial die to an attack roll."
+    },
+    "Ambusher's Edge": {
+        "type": "utility",
+        "timing": "check",
+        "skills": ["Stealth", "Initiative"],
+        "description": "Add martial die to Stealth or Initiative check."
+    },
+    "Guarded Step": {
+        "type": "defensive",
+        "timing": "action",
+        "effect": "swap_and_ac",
+        "description": "Switch places with ally within 5ft. One gains AC = martial die until next turn."
+    },
+    "Brace for Impact": {
+        "type": "reaction",
+        "timing": "enemy_approach",
+        "effect": "opportunity_attack_bonus",
+        "description": "When creature moves into reach, attack and add die to damage."
+    },
+    "Tactical Command": {
+        "type": "bonus",
+        "timing": "bonus_action",
+        "effect": "ally_attack",
+        "description": "Direct ally to attack using reaction. Add die to their damage."
+    },
+    "Forceful Disarm": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_disarm",
+        "save": "STR",
+        "description": "Add die to damage. Target drops item on failed STR save."
+    },
+    "Trip Technique": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_prone",
+        "save": "STR",
+        "description": "Add die to damage. Large or smaller creature prone on failed STR save."
+    },
+    "Distracting Blow": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_debuff",
+        "description": "Add die to damage. Next attacker gains +2 vs target."
+    },
+    "Sweeping Motion": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "cleave",
+        "description": "On hit, deal martial die to another creature within 5ft if roll would hit."
+    },
+    "Lunging Attack": {
+        "type": "attack_modifier",
+        "timing": "before_attack",
+        "effect": "reach_and_damage",
+        "reach_bonus": 5,
+        "description": "Extend reach 5ft for one attack. Add die to damage."
+    },
+    "Parry Response": {
+        "type": "reaction",
+        "timing": "when_hit_melee",
+        "effect": "damage_reduction",
+        "description": "When hit by melee, reduce damage by die + DEX mod."
+    },
+    "Riposte Counter": {
+        "type": "reaction",
+        "timing": "when_missed_melee",
+        "effect": "counterattack",
+        "description": "When missed by melee, make attack and add die to damage."
+    },
+    "Commanding Presence": {
+        "type": "utility",
+        "timing": "check",
+        "skills": ["Intimidation", "Persuasion", "Performance"],
+        "description": "Add martial die to Intimidation, Persuasion, or Performance."
+    },
+    "Rallying Shout": {
+        "type": "bonus",
+        "timing": "bonus_action",
+        "effect": "temp_hp",
+        "description": "Give ally temp HP = die + CHA mod."
+    },
+    "Tactical Insight": {
+        "type": "utility",
+        "timing": "check",
+        "skills": ["History", "Investigation", "Insight"],
+        "description": "Add martial die to History, Investigation, or Insight check."
+    },
+    "Grappling Strike": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "grapple_bonus",
+        "description": "After melee hit, add die to Athletics check to grapple target."
+    },
+    "Precision Attack": {
+        "type": "attack_modifier",
+        "timing": "after_roll",
+        "effect": "reroll_to_hit",
+        "description": "After missing, add martial die to the attack roll (may turn miss into hit)."
+    },
+    "Menacing Attack": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_frighten",
+        "save": "WIS",
+        "description": "Add die to damage. Target frightened on failed WIS save until end of next turn."
+    },
+    "Pushing Attack": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_push",
+        "save": "STR",
+        "push_distance": 15,
+        "description": "Add die to damage. Large or smaller pushed 15ft on failed STR save."
+    },
+}
+
+# ============================================================
+# KNIGHT MANEUVERS
+# ============================================================
+
+KNIGHT_MANEUVERS = {
+    "Stalwart Wall": {
+        "type": "attack_modifier",
+        "timing": "on_opportunity_attack",
+        "effect": "prevent_movement",
+        "description": "On opportunity attack hit, target can't move until start of their next turn."
+    },
+    "Shield Bash": {
+        "type": "bonus",
+        "timing": "after_melee_attack",
+        "effect": "shove_and_damage",
+        "save": "STR",
+        "extra_damage": "1d6",
+        "damage_type": "bludgeoning",
+        "description": "Bonus action after melee attack: shove creature within 5ft, deal 1d6 bludgeoning. STR save or prone."
+    },
+    "Zone of Defense": {
+        "type": "action",
+        "timing": "action",
+        "effect": "difficult_terrain_aura",
+        "area": 10,
+        "description": "10ft radius around you becomes difficult terrain. Enemies provoke OA when leaving until your next turn."
+    },
+    "Brace": {
+        "type": "reaction",
+        "timing": "enemy_approach",
+        "effect": "opportunity_attack_bonus",
+        "description": "When creature moves into reach, make attack and add martial die to damage."
+    },
+    "Commander's Strike": {
+        "type": "bonus",
+        "timing": "on_attack_action",
+        "effect": "ally_attack",
+        "description": "Forgo one attack. Ally uses reaction to attack, adding martial die to damage."
+    },
+    "Commanding Presence": {
+        "type": "utility",
+        "timing": "check",
+        "skills": ["Intimidation", "Performance", "Persuasion"],
+        "description": "Add martial die to Intimidation, Performance, or Persuasion check."
+    },
+    "Jousting Charge": {
+        "type": "attack_modifier",
+        "timing": "on_charge",
+        "effect": "damage_and_prone",
+        "save": "STR",
+        "requires_mounted": True,
+        "min_move": 20,
+        "description": "While mounted, move 20ft+ and hit: add martial die to damage. STR save or prone."
+    },
+    "Spirited Leap": {
+        "type": "free",
+        "timing": "on_mount_jump",
+        "effect": "avoid_opportunity_attacks",
+        "requires_mounted": True,
+        "description": "When mount jumps/moves over obstacle, you and mount avoid OA for the turn."
+    },
+    "Trample the Fallen": {
+        "type": "free",
+        "timing": "on_knock_prone",
+        "effect": "mount_attack",
+        "requires_mounted": True,
+        "description": "When you knock a creature prone while mounted, mount makes hoof attack adding martial die."
+    },
+    "Goading Attack": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_goad",
+        "save": "WIS",
+        "description": "Add martial die to damage. WIS save or target has -2 penalty vs others until your next turn."
+    },
+    "Lunging Attack": {
+        "type": "attack_modifier",
+        "timing": "before_attack",
+        "effect": "reach_and_damage",
+        "reach_bonus": 5,
+        "description": "Extend reach 5ft for one attack. Add martial die to damage."
+    },
+    "Maneuvering Attack": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "damage_and_ally_move",
+        "description": "Add martial die to damage. Ally can use reaction to move half speed without OA."
+    },
+    "Rally": {
+        "type": "bonus",
+        "timing": "bonus_action",
+        "effect": "temp_hp",
+        "description": "Give ally temp HP = martial die + CHA mod."
+    },
+    "Sweeping Attack": {
+        "type": "attack_modifier",
+        "timing": "on_hit",
+        "effect": "cleave",
+        "description": "On hit, deal martial die to another creature within 5ft if roll would hit."
+    },
+    "Tactical Assessment": {
+        "type": "utility",
+        "timing": "check",
+        "skills": ["Investigation", "History", "Insight"],
+        "description": "Add martial die to Investigation, History, or Insight check."
+    },
+}
@@ -7,11 +7,13 @@ This module handles:
 - Level-up operations (HP increase, BAB updates, skill ranks, spells, features, ASI/feats)
 """
 
+import copy
 import json
 import os
 import random
 import re
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple, List
 
 # ============================================================
@@ -307,6 +309,7 @@ def _ability_mod(score: int) -> int:
     return (score - 10) // 2
 
 
+@lru_cache(maxsize=None)
 def get_hit_die_for_class(class_name: str) -> int:
     """Get hit die size for a class."""
     return HIT_DIE_BY_CLASS.get(class_name.lower(), 8)
@@ -319,6 +322,7 @@ def get_bab_for_level(class_name: str, level: int) -> int:
     return calc(level)
 
 
+@lru_cache(maxsize=None)
 def get_skill_points_for_level(class_name: str, int_mod: int) -> int:
     """
     Calculate skill points gained at a level for a class.
@@ -1459,6 +1463,51 @@ def check_feat_prerequisites(character: Dict[str, Any], feat_data: Dict[str, Any
     return {"met": len(unmet) == 0, "reasons": unmet}
 
 
+def feat_prereq_key(feat_data: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Hashable (key, value) pairs of the feat prerequisites that meets_prereqs() checks.
+    """
+    return tuple(
+        (key, value)
+        for prereq in feat_data.get("prerequisites", []) or []
+        if isinstance(prereq, dict)
+        for key, value in prereq.items()
+        if key in ("STR", "DEX", "CON", "INT", "WIS", "CHA", "BAB", "feat", "spellcasting")
+    )
+
+
+@lru_cache(maxsize=4096)
+def meets_prereqs(prereq_key: Tuple[Tuple[str, Any], ...], abilities_key: Tuple[Tuple[str, int], ...],
+                  bab: int, feats_key: frozenset, has_spells: bool) -> bool:
+    """
+    Quick pass/fail feat prerequisite check for the level-up feat picker.
+    
+    Args:
+        prereq_key: Output of feat_prereq_key() for the feat
+        abilities_key: Sorted (ability, score) pairs of the character
+        bab: Character's base attack bonus
+        feats_key: Feats the character already has
+        has_spells: Whether the character knows any spells or cantrips
+        
+    Returns:
+        True if every ability, BAB, feat and spellcasting prerequisite is met
+    """
+    abilities = dict(abilities_key)
+    for key, value in prereq_key:
+        if key == "BAB":
+            if bab < value:
+                return False
+        elif key == "feat":
+            if value not in feats_key:
+                return False
+        elif key == "spellcasting":
+            if value and not has_spells:
+                return False
+        elif abilities.get(key, 10) < value:
+            return False
+    return True
+
+
 def get_available_fighting_styles(character: Dict[str, Any], all_feats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Get fighting style feats available to a character (ones they don't already have).
@@ -1627,7 +1676,8 @@ def apply_class_features(character: Dict[str, Any], features: List[Dict[str, Any
         existing_names = [f.get("name") if isinstance(f, dict) else str(f) for f in char_features]
         if feat_name not in existing_names:
             if isinstance(feat, dict):
-                char_features.append(feat)
+                # Feature dicts may come from the shared SRD class cache
+                char_features.append(copy.deepcopy(feat))
             else:
                 char_features.append({"name": feat_name, "description": ""})
             added.append(feat_name)
@@ -1756,7 +1806,7 @@ def has_pending_choices(character: Dict[str, Any]) -> Dict[str, bool]:
     Returns:
         Dict with pending choice flags
     """
-    return {
+    flags = {
         "skill_points": character.get("pending_skill_points", 0) > 0,
         "cantrips": character.get("pending_cantrips", 0) > 0,
         "spells": character.get("pending_spells", 0) > 0,
@@ -1773,25 +1823,9 @@ def has_pending_choices(character: Dict[str, Any]) -> Dict[str, bool]:
         "marshal_maneuvers": character.get("pending_marshal_maneuvers", 0) > 0,
         "knight_maneuvers": character.get("pending_knight_maneuvers", 0) > 0,
         "weapon_expertise": character.get("pending_weapon_expertise", False),
-        "any": any([
-            character.get("pending_skill_points", 0) > 0,
-            character.get("pending_cantrips", 0) > 0,
-            character.get("pending_spells", 0) > 0,
-            character.get("pending_asi", 0) > 0,
-            character.get("pending_fighting_style", 0) > 0,
-            character.get("pending_bonus_feat", 0) > 0,
-            character.get("pending_invocations", 0) > 0,
-            character.get("pending_pact_boon", False),
-            character.get("pending_metamagic", 0) > 0,
-            character.get("pending_primal_talents", 0) > 0,
-            character.get("pending_maneuvers", 0) > 0,
-            character.get("pending_wizard_school", False),
-            character.get("pending_divine_vow", False),
-            character.get("pending_marshal_maneuvers", 0) > 0,
-            character.get("pending_knight_maneuvers", 0) > 0,
-            character.get("pending_weapon_expertise", False),
-        ])
     }
+    flags["any"] = any(flags.values())
+    return flags
 
 
 def get_pending_summary(character: Dict[str, Any]) -> str:
@@ -11,6 +11,7 @@ This module handles:
 
 import json
 import os
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple
 from math import floor
 
@@ -478,6 +479,7 @@ def check_multiclass_prerequisites(character: Dict[str, Any], target_class: str)
     return True, "Prerequisites met"
 
 
+@lru_cache(maxsize=None)
 def get_multiclass_proficiencies(class_id: str) -> Dict[str, Any]:
     """
     Get proficiencies gained when multiclassing INTO a class.
@@ -563,6 +565,7 @@ HIT_DIE_BY_CLASS = {
 }
 
 
+@lru_cache(maxsize=None)
 def get_hit_die_for_class(class_id: str) -> int:
     """Get hit die size for a class."""
     return HIT_DIE_BY_CLASS.get(class_id.lower(), 8)